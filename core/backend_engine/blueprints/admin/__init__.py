@@ -19,6 +19,7 @@ from datetime import datetime
 
 from core.backend_engine.factory import db
 from core.backend_engine.models import Content, Category, User, Tag, Comment, Setting
+from core.backend_engine.services.stats import DashboardStatsService
 
 bp = Blueprint('admin', __name__)
 
@@ -50,14 +51,7 @@ def editor_required(f):
 @editor_required
 def dashboard():
     """Admin dashboard"""
-    stats = {
-        'total_contents': Content.query.count(),
-        'published_contents': Content.query.filter_by(status='published').count(),
-        'draft_contents': Content.query.filter_by(status='draft').count(),
-        'total_users': User.query.count(),
-        'pending_comments': Comment.query.filter_by(status='pending').count(),
-        'total_categories': Category.query.count()
-    }
+    stats = DashboardStatsService.get_stats()
 
     recent_contents = Content.query.order_by(Content.created_at.desc()).limit(5).all()
     recent_comments = Comment.query.order_by(Comment.created_at.desc()).limit(10).all()
@@ -11,6 +11,8 @@ This blueprint provides RESTful API endpoints for:
 - Orders
 - Settings
 - E-commerce
+- Dashboard statistics
+- Streaming admin exports
 
 Note: Media API has been moved to packages/media_lib (mounted at /api/v1/media-lib)
 """
@@ -31,4 +33,6 @@ from core.backend_engine.blueprints.api import (
     orders,
     products,
     rbac_admin,
+    dashboard,
+    exports,
 )
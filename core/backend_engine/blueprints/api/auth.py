@@ -16,16 +16,17 @@ from flask_jwt_extended import (
 )
 from datetime import datetime
 
-from core.backend_engine.factory import db, limiter
+from core.backend_engine.factory import db
 from core.backend_engine.blueprints.api import bp
 from core.backend_engine.models import User
 from core.backend_engine.schemas.user import UserSchema
+from core.backend_engine.services.rate_limit import rate_limit
 
 user_schema = UserSchema()
 
 
 @bp.route('/auth/login', methods=['POST'])
-@limiter.limit("10/minute")
+@rate_limit('auth.login', '10/minute')
 def api_login():
     """API Login endpoint - Returns JWT via httpOnly cookies"""
     data = request.get_json()
@@ -30,7 +30,7 @@ from core.backend_engine.factory import db, cache
 from core.backend_engine.blueprints.api import bp
 from core.backend_engine.blueprints.api.utils import (
     is_authenticated, is_i18n_enabled, get_i18n_setting,
-    get_localized_slug, parse_tw_datetime, now_tw, utc_to_tw
+    get_localized_slug, parse_tw_datetime, now_tw, utc_to_tw, get_image_crops
 )
 from core.backend_engine.models import Content, Category, Tag, User, Comment
 from core.backend_engine.schemas.content import ContentSchema
@@ -47,11 +47,20 @@ tag_schema = TagSchema()
 tags_schema = TagSchema(many=True)
 
 
-def _decorate_content(content, data):
-    """Private helper: Add extra fields and localization info expected by frontend"""
+def _decorate_content(content, data, image_crops=None):
+    """Private helper: Add extra fields and localization info expected by frontend
+
+    image_crops: result of get_image_crops() for a whole page of contents (looked up here when omitted)
+    """
     # Compatibility patch: frontend expects post_type
     data['post_type'] = content.content_type
 
+    # Art-directed crops from the media library: featured_image is shown 16:9, cover_image 1:1
+    if image_crops is None:
+        image_crops = get_image_crops([content.featured_image, content.cover_image])
+    data['featured_image_crop'] = image_crops.get(content.featured_image, {}).get('16x9')
+    data['cover_image_crop'] = image_crops.get(content.cover_image, {}).get('1x1')
+
     # Handle category display name and slug (frontend expects category.name)
     if content.category:
         if not data.get('category'):
@@ -169,8 +178,11 @@ def api_contents():
     # Serialize with Marshmallow and decorate
     contents_data = []
     dumped_data = contents_schema.dump(contents_pagination.items)
+    image_crops = get_image_crops(
+        url for content in contents_pagination.items for url in (content.featured_image, content.cover_image)
+    )
     for idx, content in enumerate(contents_pagination.items):
-        contents_data.append(_decorate_content(content, dumped_data[idx]))
+        contents_data.append(_decorate_content(content, dumped_data[idx], image_crops))
 
     return jsonify({
         'contents': contents_data,
@@ -0,0 +1,32 @@
+"""
+Dashboard API Routes
+
+Provides admin dashboard data for the SPA admin panel:
+- GET /admin/dashboard/stats - Dashboard counters (editor)
+- GET /admin/dashboard/rate-limits - Rate limit config and hit counts (settings.read)
+"""
+
+from flask import jsonify, request
+from flask_jwt_extended import jwt_required
+
+from core.backend_engine.blueprints.api import bp
+from core.backend_engine.services.rbac import require_permission
+from core.backend_engine.services.stats import DashboardStatsService
+from core.backend_engine.services.rate_limit import RateLimitService
+
+
+@bp.route('/admin/dashboard/stats', methods=['GET'])
+@jwt_required()
+@require_permission('contents.update')
+def api_dashboard_stats():
+    """Get dashboard counters (requires contents.update); ?refresh=true bypasses the cache"""
+    use_cache = request.args.get('refresh') != 'true'
+    return jsonify(DashboardStatsService.get_stats(use_cache=use_cache)), 200
+
+
+@bp.route('/admin/dashboard/rate-limits', methods=['GET'])
+@jwt_required()
+@require_permission('settings.read')
+def api_dashboard_rate_limits():
+    """Get active rate limits and breach counts shared across workers (requires settings.read)"""
+    return jsonify(RateLimitService.get_metrics()), 200
@@ -0,0 +1,168 @@
+"""
+Exports API Routes
+
+Streaming CSV / NDJSON exports for the admin panel:
+- GET /admin/exports/submissions - Export submissions (submissions.read)
+- GET /admin/exports/orders - Export orders (orders.read)
+- GET /admin/exports/users - Export users (users.read)
+
+Query args:
+- format: csv (default) | ndjson
+- the same filters as the corresponding list endpoint
+
+Rows are read through a server-side cursor (yield_per) and written to the
+response as they arrive, so memory stays flat regardless of export size.
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import Response, jsonify, request, stream_with_context
+from flask_jwt_extended import jwt_required
+from sqlalchemy import select
+
+from core.backend_engine.factory import db
+from core.backend_engine.blueprints.api import bp
+from core.backend_engine.blueprints.api.orders import _filter_orders
+from core.backend_engine.blueprints.api.submissions import _filter_submissions
+from core.backend_engine.blueprints.api.users import _filter_users
+from core.backend_engine.models import Order, Submission, User
+from core.backend_engine.services.rbac import require_permission
+
+
+# Rows fetched per server-side cursor round trip / written per response chunk
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+SUBMISSION_COLUMNS = [
+    Submission.id, Submission.submission_type, Submission.status,
+    Submission.character_name, Submission.birth_year, Submission.birth_month,
+    Submission.birth_day, Submission.birth_time, Submission.birth_place,
+    Submission.question, Submission.admin_notes, Submission.attributes,
+    Submission.ip_address, Submission.created_at, Submission.updated_at,
+]
+
+ORDER_COLUMNS = [
+    Order.id, Order.order_no, Order.user_id, Order.amount, Order.currency,
+    Order.status, Order.payment_method, Order.language, Order.items,
+    Order.attributes, Order.created_at, Order.paid_at,
+]
+
+# password_hash is never exported
+USER_COLUMNS = [
+    User.id, User.username, User.email, User.role, User.is_active,
+    User.created_at, User.updated_at, User.last_login,
+]
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return str(value)
+
+
+def _csv_cell(value):
+    """Format a value for CSV; neutralise spreadsheet formulas in text cells."""
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=_json_default)
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@', '\t', '\r'):
+        return "'" + value
+    return value
+
+
+def _iter_csv(rows, header):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # UTF-8 BOM so Excel detects the encoding (Chinese text)
+    buffer.write('\ufeff')
+    writer.writerow(header)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_csv_cell(value) for value in row])
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _iter_ndjson(rows, header):
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(dict(zip(header, row)), ensure_ascii=False, default=_json_default))
+        if len(chunk) >= EXPORT_BATCH_SIZE:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
+
+
+def _stream_export(name, columns, filter_func):
+    """Build a streaming response for a column select filtered like its list endpoint."""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'message': f"Unsupported format: {export_format} (use csv or ndjson)"}), 400
+
+    stmt = filter_func(select(*columns), request.args).order_by(columns[0])
+    header = [column.key for column in columns]
+
+    def generate():
+        # yield_per streams from a server-side cursor instead of buffering all rows
+        result = db.session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        try:
+            rows = (tuple(row) for row in result)
+            if export_format == 'csv':
+                yield from _iter_csv(rows, header)
+            else:
+                yield from _iter_ndjson(rows, header)
+        finally:
+            result.close()
+
+    filename = f"{name}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+    return Response(
+        stream_with_context(generate()),
+        mimetype=EXPORT_FORMATS[export_format].split(';')[0],
+        content_type=EXPORT_FORMATS[export_format],
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Cache-Control': 'no-store',
+            'X-Accel-Buffering': 'no',
+        },
+    )
+
+
+@bp.route('/admin/exports/submissions', methods=['GET'])
+@jwt_required()
+@require_permission('submissions.read')
+def api_export_submissions():
+    """Export submissions as CSV/NDJSON (requires submissions.read; filters: status, type)"""
+    return _stream_export('submissions', SUBMISSION_COLUMNS, _filter_submissions)
+
+
+@bp.route('/admin/exports/orders', methods=['GET'])
+@jwt_required()
+@require_permission('orders.read')
+def api_export_orders():
+    """Export orders as CSV/NDJSON (requires orders.read;
+    filters: status, currency, payment_method, user_id, date_from, date_to)"""
+    return _stream_export('orders', ORDER_COLUMNS, _filter_orders)
+
+
+@bp.route('/admin/exports/users', methods=['GET'])
+@jwt_required()
+@require_permission('users.read')
+def api_export_users():
+    """Export users as CSV/NDJSON (requires users.read; filters: role, search)"""
+    return _stream_export('users', USER_COLUMNS, _filter_users)
@@ -3,13 +3,13 @@ Orders API Routes
 
 Provides endpoints for order management:
 - POST /orders - Create new order
-- GET /orders - List user's orders
+- GET /orders - List user's orders (filters: status, currency, payment_method, date_from, date_to)
 - POST /webhooks/mock-payment - Mock payment webhook (dev mode)
 """
 
 from flask import jsonify, request, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime
+from datetime import datetime, timedelta
 import uuid
 
 from core.backend_engine.factory import db
@@ -23,6 +23,43 @@ orders_schema = OrderSchema(many=True)
 
 # ==================== Orders ====================
 
+def _parse_date(value, end=False):
+    """Parse an ISO date/datetime query arg; None if missing or invalid.
+
+    With end=True a plain date (YYYY-MM-DD) means the end of that day.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def _filter_orders(query, args):
+    """Apply the order filters (status, currency, payment_method, user_id,
+    date_from/date_to on created_at) shared by listing and export."""
+    for field in ('status', 'currency', 'payment_method'):
+        value = args.get(field)
+        if value:
+            query = query.filter(getattr(Order, field) == value)
+
+    user_id = args.get('user_id', type=int)
+    if user_id:
+        query = query.filter(Order.user_id == user_id)
+
+    date_from = _parse_date(args.get('date_from'))
+    date_to = _parse_date(args.get('date_to'), end=True)
+    if date_from:
+        query = query.filter(Order.created_at >= date_from)
+    if date_to:
+        query = query.filter(Order.created_at < date_to)
+    return query
+
+
 @bp.route('/orders', methods=['POST'])
 @jwt_required()
 def create_order():
@@ -122,7 +159,8 @@ def list_orders():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
 
-    orders_query = Order.query.filter_by(user_id=user_id).order_by(Order.created_at.desc())
+    orders_query = _filter_orders(Order.query.filter_by(user_id=user_id), request.args)
+    orders_query = orders_query.order_by(Order.created_at.desc())
     orders = orders_query.paginate(page=page, per_page=per_page, error_out=False)
 
     return jsonify({
@@ -16,7 +16,7 @@ from datetime import datetime
 
 from core.backend_engine.factory import db
 from core.backend_engine.blueprints.api import bp
-from core.backend_engine.blueprints.api.utils import get_i18n_setting
+from core.backend_engine.blueprints.api.utils import get_i18n_setting, get_image_crops
 from core.backend_engine.models import Setting, User, HomepageSlide, HomepageSettings
 from core.backend_engine.services.rbac import require_permission
 
@@ -101,6 +101,9 @@ def api_add_language():
 
 # ==================== Homepage Settings ====================
 
+DEFAULT_SLIDE_FOCAL_POINT = 'center center'
+
+
 @bp.route('/settings/homepage', methods=['GET'])
 def api_get_homepage_settings():
     """Get homepage slideshow settings (public API, no login required)"""
@@ -134,8 +137,24 @@ def api_get_homepage_settings():
     latest_slide = HomepageSlide.query.order_by(HomepageSlide.updated_at.desc()).first()
     updated_at = latest_slide.updated_at.isoformat() if latest_slide else datetime.utcnow().isoformat()
 
+    # Slides are 16:9; attach the media library crop cut around the image's focal point.
+    # The slide's own focal_point (CSS object-position set in the homepage editor) wins:
+    # the crop is only returned for slides left at the default 'center center', otherwise
+    # image_crop is None and the frontend positions the full image itself.
+    image_crops = get_image_crops(
+        s.image_url for s in slides if (s.focal_point or DEFAULT_SLIDE_FOCAL_POINT) == DEFAULT_SLIDE_FOCAL_POINT
+    )
+    slides_data = []
+    for s in slides:
+        slide = s.to_dict()
+        slide['image_crop'] = (
+            image_crops.get(s.image_url, {}).get('16x9')
+            if slide['focal_point'] == DEFAULT_SLIDE_FOCAL_POINT else None
+        )
+        slides_data.append(slide)
+
     return jsonify({
-        'slides': [s.to_dict() for s in slides],
+        'slides': slides_data,
         'button_text': button_text,
         'about_section': about_section,
         'pause_on_hover': pause_on_hover,
@@ -212,7 +231,7 @@ def api_update_homepage_settings():
             slide.video_url = slide_data.get('video_url', '')
             slide.media_type = slide_data.get('media_type', 'image')
             # Feature 4: focal point
-            slide.focal_point = slide_data.get('focal_point', 'center center')
+            slide.focal_point = slide_data.get('focal_point', DEFAULT_SLIDE_FOCAL_POINT)
             # Feature 5: overlay opacity
             slide.overlay_opacity = slide_data.get('overlay_opacity', 40)
             # Feature 6: per-slide title
@@ -234,7 +253,7 @@ def api_update_homepage_settings():
                 autoplay_delay=slide_data.get('autoplay_delay'),
                 video_url=slide_data.get('video_url', ''),
                 media_type=slide_data.get('media_type', 'image'),
-                focal_point=slide_data.get('focal_point', 'center center'),
+                focal_point=slide_data.get('focal_point', DEFAULT_SLIDE_FOCAL_POINT),
                 overlay_opacity=slide_data.get('overlay_opacity', 40),
                 titles=slide_data.get('titles', {}),
                 start_date=_parse_datetime(slide_data.get('start_date')),
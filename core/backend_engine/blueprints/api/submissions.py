@@ -12,11 +12,12 @@ from flask import jsonify, request, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow import fields
 
-from core.backend_engine.factory import db, limiter
+from core.backend_engine.factory import db
 from core.backend_engine.blueprints.api import bp
 from core.backend_engine.models import User, Submission
 from core.backend_engine.schemas.base import BaseSchema
 from core.backend_engine.services.rbac import require_permission
+from core.backend_engine.services.rate_limit import rate_limit
 
 
 class SubmissionSchema(BaseSchema):
@@ -32,8 +33,20 @@ submission_schema = SubmissionSchema()
 submissions_schema = SubmissionSchema(many=True)
 
 
+def _filter_submissions(query, args):
+    """Apply the submission list filters (status, type) shared by listing and export."""
+    status = args.get('status')
+    submission_type = args.get('type')
+
+    if status:
+        query = query.filter(Submission.status == status)
+    if submission_type:
+        query = query.filter(Submission.submission_type == submission_type)
+    return query
+
+
 @bp.route('/submissions', methods=['POST'])
-@limiter.limit("5/minute")
+@rate_limit('submissions.create', '5/minute')
 def api_create_submission():
     """Receive anonymous submission form"""
     data = request.get_json()
@@ -60,7 +73,7 @@ def api_create_submission():
 
 
 @bp.route('/submissions/contact', methods=['POST'])
-@limiter.limit("5/minute")
+@rate_limit('submissions.contact', '5/minute')
 def api_create_contact():
     """Receive contact form submission"""
     data = request.get_json()
@@ -105,15 +118,8 @@ def api_admin_submissions():
     """Admin view submission list (requires submissions.read)"""
     page = request.args.get('page', 1, type=int)
     per_page = min(request.args.get('per_page', 20, type=int), 100)
-    status = request.args.get('status')
-    submission_type = request.args.get('type')
-
-    query = Submission.query
-    if status:
-        query = query.filter_by(status=status)
-    if submission_type:
-        query = query.filter_by(submission_type=submission_type)
 
+    query = _filter_submissions(Submission.query, request.args)
     pagination = query.order_by(Submission.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
 
     return jsonify({
@@ -11,15 +11,33 @@ Provides admin endpoints for user management:
 from flask import jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
+from sqlalchemy import func, select
 
 from core.backend_engine.factory import db
 from core.backend_engine.blueprints.api import bp
-from core.backend_engine.models import User
+from core.backend_engine.models import User, Content, Role, UserRole
 from core.backend_engine.schemas.user import UserSchema
 from core.backend_engine.services.rbac import require_permission
 
 user_schema = UserSchema()
-users_schema = UserSchema(many=True)
+# Listing: effective permissions are resolved per user via RBAC, too costly per row
+users_schema = UserSchema(many=True, exclude=('permissions',))
+
+
+def _filter_users(query, args):
+    """Apply the user list filters (role, search) shared by listing and export.
+
+    Search uses ILIKE on username/email, served by the pg_trgm GIN indexes.
+    """
+    role = args.get('role')
+    search = (args.get('search') or '').strip()
+
+    if role:
+        query = query.filter(User.role == role)
+    if search:
+        pattern = f'%{search}%'
+        query = query.filter((User.username.ilike(pattern)) | (User.email.ilike(pattern)))
+    return query
 
 
 @bp.route('/users', methods=['GET'])
@@ -29,20 +47,33 @@ def api_users():
     """Get user list (requires users.read)"""
     page = request.args.get('page', 1, type=int)
     per_page = min(request.args.get('per_page', 20, type=int), 100)
-    role = request.args.get('role')
-    search = request.args.get('search')
-
-    query = User.query
-    if role:
-        query = query.filter_by(role=role)
-    if search:
-        query = query.filter((User.username.ilike(f'%{search}%')) | (User.email.ilike(f'%{search}%')))
 
+    # Correlated aggregates are evaluated only for the rows of the requested page,
+    # so the listing is a single query regardless of page size.
+    content_count = (
+        select(func.count(Content.id))
+        .where(Content.author_id == User.id)
+        .correlate(User)
+        .scalar_subquery()
+    )
+    role_codes = (
+        select(func.array_agg(Role.code))
+        .join(UserRole, UserRole.role_id == Role.id)
+        .where(UserRole.user_id == User.id)
+        .correlate(User)
+        .scalar_subquery()
+    )
+
+    query = _filter_users(User.query, request.args).add_columns(
+        content_count.label('content_count'),
+        role_codes.label('role_codes'),
+    )
     pagination = query.order_by(User.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
 
-    users_data = users_schema.dump(pagination.items)
-    for idx, u in enumerate(pagination.items):
-        users_data[idx]['content_count'] = u.contents.count()
+    users_data = users_schema.dump([row[0] for row in pagination.items])
+    for idx, (_, count, codes) in enumerate(pagination.items):
+        users_data[idx]['content_count'] = count or 0
+        users_data[idx]['roles'] = sorted(codes or [])
 
     return jsonify({
         'users': users_data,
@@ -6,13 +6,14 @@ Provides common utility functions for API routes including:
 - Authentication checks
 - i18n settings
 - JSON validation decorator
+- Media library image crop lookup
 - Role-based access control decorator
 """
 
 import pytz
 from functools import wraps
 from datetime import datetime
-from flask import request as flask_request, jsonify
+from flask import request as flask_request, jsonify, current_app
 from marshmallow import ValidationError
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
 from flask_jwt_extended.exceptions import JWTExtendedException
@@ -109,6 +110,19 @@ def get_localized_slug(entity, language):
     return entity.code
 
 
+def get_image_crops(urls):
+    """Look up focal-point crops (16x9 / 1x1) for image URLs via the media library
+
+    Returns {url: {'16x9': {'url', 'width', 'height', 'srcset'}, '1x1': {...}}};
+    empty when the media library is not registered or the images have no crops yet.
+    """
+    media_lib = current_app.extensions.get('media_lib')
+    urls = [url for url in urls if url]
+    if not media_lib or not urls:
+        return {}
+    return media_lib['image_crops'](urls)
+
+
 def validate_json(schema_class, partial=False):
     """Request JSON body validation decorator
 
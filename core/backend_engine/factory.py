@@ -120,6 +120,9 @@ def create_app(
     # Configure rate limiting
     _configure_rate_limiter(app)
 
+    # Configure audit log pipeline
+    _configure_audit_log(app)
+
     # Configure login manager
     _configure_login_manager(app)
 
@@ -206,11 +209,36 @@ def _configure_cache(app: Flask) -> None:
 
 
 def _configure_rate_limiter(app: Flask) -> None:
-    """Configure rate limiter with Redis backend if available."""
+    """
+    Configure rate limiter with Redis backend if available.
+
+    Storage must be configured before init_app: Flask-Limiter builds its
+    storage from app.config during init_app. Redis is shared by all workers;
+    if it becomes unreachable, limits fall back to per-process memory until
+    it recovers.
+    """
     redis_url = app.config.get('REDIS_URL')
-    limiter.init_app(app)
+    app.config.setdefault('RATELIMIT_STORAGE_URI', redis_url or 'memory://')
+    app.config.setdefault('RATELIMIT_STRATEGY', 'moving-window')
+    app.config.setdefault('RATELIMIT_IN_MEMORY_FALLBACK_ENABLED', True)
+    app.config.setdefault('RATELIMIT_HEADERS_ENABLED', True)
     if redis_url:
-        limiter._storage_uri = redis_url
+        # Fail fast so a Redis outage switches to the memory fallback quickly
+        app.config.setdefault('RATELIMIT_STORAGE_OPTIONS', {
+            'socket_connect_timeout': 1,
+            'socket_timeout': 1,
+        })
+    limiter.init_app(app)
+    app.logger.info(
+        f"Rate limiter initialized with {app.config['RATELIMIT_STORAGE_URI'].split(':', 1)[0]} "
+        f"storage ({app.config['RATELIMIT_STRATEGY']})"
+    )
+
+
+def _configure_audit_log(app: Flask) -> None:
+    """Capture audited model changes and write them to activity_logs in the background."""
+    from core.backend_engine.services.audit import AuditService
+    AuditService.init_app(app)
 
 
 def _configure_login_manager(app: Flask) -> None:
@@ -360,7 +388,7 @@ def _configure_error_handlers(app: Flask) -> None:
 # =============================================================================
 
 def _register_core_cli(app: Flask) -> None:
-    """Register RBAC-related CLI commands available to every site."""
+    """Register RBAC and maintenance CLI commands available to every site."""
     import click
 
     @app.cli.command('seed-rbac')
@@ -392,6 +420,25 @@ def _register_core_cli(app: Flask) -> None:
         except ValueError as e:
             click.echo(f"Error: {e}")
 
+    @app.cli.command('audit-partitions')
+    @click.option('--months-ahead', default=3, show_default=True, help='Future monthly partitions to create.')
+    @click.option('--prune', is_flag=True, help='Drop partitions older than AUDIT_LOG_RETENTION_MONTHS.')
+    def audit_partitions_command(months_ahead, prune):
+        """Create upcoming activity_logs partitions (and optionally drop expired ones)."""
+        from core.backend_engine.services.audit import (
+            ensure_partitions, drop_partitions, DEFAULT_RETENTION_MONTHS,
+        )
+
+        with db.engine.begin() as connection:
+            created = ensure_partitions(connection, months_ahead=months_ahead)
+            dropped = []
+            if prune:
+                retain = int(app.config.get('AUDIT_LOG_RETENTION_MONTHS', DEFAULT_RETENTION_MONTHS))
+                dropped = drop_partitions(connection, retain_months=retain)
+        click.echo(
+            f"activity_logs partitions: created {created or 'none'}, dropped {dropped or 'none'}."
+        )
+
 
 # =============================================================================
 # Static File Serving
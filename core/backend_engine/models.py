@@ -152,6 +152,14 @@ class User(UserMixin, db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     last_login = db.Column(db.DateTime)
 
+    # Trigram GIN indexes serve the admin ILIKE '%term%' search (requires pg_trgm)
+    __table_args__ = (
+        db.Index('ix_users_username_trgm', 'username',
+                 postgresql_using='gin', postgresql_ops={'username': 'gin_trgm_ops'}),
+        db.Index('ix_users_email_trgm', 'email',
+                 postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'}),
+    )
+
     # Relationships
     contents = db.relationship('Content', backref='author', lazy='dynamic')
     comments = db.relationship('Comment', backref='user', lazy='dynamic')
@@ -523,11 +531,22 @@ class HomepageSettings(db.Model):
 # =============================================================================
 
 class ActivityLog(db.Model):
-    """Activity log for audit trail."""
+    """
+    Activity log for audit trail.
+
+    Range-partitioned by month on created_at (partitions are managed by the
+    `flask audit-partitions` command), so the primary key includes created_at.
+    Rows are written in batches by services.audit, not through the ORM session.
+    """
     __tablename__ = 'activity_logs'
+    __table_args__ = (
+        db.Index('ix_activity_logs_table_record', 'table_name', 'record_id'),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
 
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    created_at = db.Column(db.DateTime, primary_key=True, default=datetime.utcnow, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'))
     action = db.Column(db.String(100), nullable=False)
     table_name = db.Column(db.String(50))
     record_id = db.Column(db.Integer)
@@ -535,7 +554,6 @@ class ActivityLog(db.Model):
     new_values = db.Column(JSONB)
     ip_address = db.Column(db.String(45))
     user_agent = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     def __repr__(self):
         return f'<ActivityLog {self.action}>'
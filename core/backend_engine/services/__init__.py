@@ -4,6 +4,9 @@ OWS Core Engine - Services Package
 This package provides shared services for all sites:
 - StorageService: File storage abstraction (LOCAL/GCS)
 - RBACService: Role-based access control
+- DashboardStatsService: Cached admin dashboard statistics
+- RateLimitService: Named route limits and limit-hit metrics
+- AuditService: Batched activity/audit log pipeline
 """
 
 from core.backend_engine.services.storage import (
@@ -20,6 +23,19 @@ from core.backend_engine.services.rbac import (
     require_permission,
 )
 
+from core.backend_engine.services.stats import (
+    DashboardStatsService,
+)
+
+from core.backend_engine.services.rate_limit import (
+    RateLimitService,
+    rate_limit,
+)
+
+from core.backend_engine.services.audit import (
+    AuditService,
+)
+
 __all__ = [
     'StorageService',
     'StorageBackend',
@@ -29,4 +45,8 @@ __all__ = [
     'delete_file',
     'RBACService',
     'require_permission',
+    'DashboardStatsService',
+    'RateLimitService',
+    'rate_limit',
+    'AuditService',
 ]
@@ -0,0 +1,441 @@
+"""
+OWS Core Engine - Audit Log Service
+
+Asynchronous, batched audit trail written to ``activity_logs``.
+
+Changes are captured from SQLAlchemy session events, so routes do not have
+to call anything:
+
+1. ``after_flush`` collects inserts/updates/deletes of audited tables
+   (with request user, IP and user agent) on ``session.info``.
+2. ``after_commit`` hands them to a queue; a rollback discards them.
+3. A background flusher thread (one per worker process) drains the queue
+   and writes each batch with a single multi-row INSERT.
+
+The queue is in-process memory by default, or a Redis list shared by all
+workers when ``AUDIT_LOG_QUEUE = 'redis'``. Bulk ``query.update()`` /
+``query.delete()`` statements bypass the session unit of work and are not
+captured.
+
+``activity_logs`` is range-partitioned by month; ``ensure_partitions`` and
+``drop_partitions`` back the ``flask audit-partitions`` command.
+
+Config:
+    AUDIT_LOG_ENABLED         (default True)
+    AUDIT_LOG_TABLES          audited table names (default AUDITED_TABLES)
+    AUDIT_LOG_QUEUE           'memory' | 'redis' (default 'memory')
+    AUDIT_LOG_BATCH_SIZE      rows per INSERT (default 500)
+    AUDIT_LOG_FLUSH_INTERVAL  seconds between flushes (default 2)
+    AUDIT_LOG_RETENTION_MONTHS  months kept by audit-partitions --prune (default 12)
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from flask import Flask, has_request_context, request
+from sqlalchemy import event, inspect, insert, text
+
+from core.backend_engine.factory import db
+
+
+AUDITED_TABLES = frozenset({
+    'contents', 'categories', 'tags',
+    'products', 'product_prices', 'orders', 'payment_methods',
+    'roles', 'permissions', 'role_permissions', 'user_roles',
+    'settings', 'homepage_slides', 'homepage_settings',
+})
+
+# Never copied into old_values / new_values
+EXCLUDED_COLUMNS = frozenset({'password_hash'})
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 2.0
+DEFAULT_RETENTION_MONTHS = 12
+MAX_PENDING_ROWS = 50_000
+
+REDIS_QUEUE_KEY = 'audit:activity_logs'
+PARTITION_PREFIX = 'activity_logs_y'
+
+_SESSION_KEY = 'audit_pending'
+
+
+# =============================================================================
+# Partition Management
+# =============================================================================
+
+def _month_start(year: int, month: int) -> date:
+    year += (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    return date(year, month, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f"{PARTITION_PREFIX}{month.year:04d}m{month.month:02d}"
+
+
+def ensure_partitions(connection, months_ahead: int = 3, start: Optional[date] = None) -> List[str]:
+    """
+    Create monthly partitions (plus the default partition) if missing.
+
+    Args:
+        connection: SQLAlchemy connection (PostgreSQL)
+        months_ahead: Number of months after ``start`` to create
+        start: First month to create (default: current month)
+
+    Returns:
+        Names of the partitions that were created
+    """
+    start = start or date.today().replace(day=1)
+    existing = {
+        row[0] for row in connection.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'activity_logs' "
+            "AND p.relnamespace = to_regnamespace(current_schema())"
+        ))
+    }
+
+    created = []
+    if 'activity_logs_default' not in existing:
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS activity_logs_default PARTITION OF activity_logs DEFAULT"
+        ))
+        created.append('activity_logs_default')
+
+    for offset in range(months_ahead + 1):
+        lower = _month_start(start.year, start.month + offset)
+        upper = _month_start(lower.year, lower.month + 1)
+        name = _partition_name(lower)
+        if name in existing:
+            continue
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF activity_logs "
+            f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+        ))
+        created.append(name)
+    return created
+
+
+def drop_partitions(connection, retain_months: int) -> List[str]:
+    """
+    Drop monthly partitions that end before the retention window.
+
+    Args:
+        connection: SQLAlchemy connection (PostgreSQL)
+        retain_months: Months to keep, counting the current month
+
+    Returns:
+        Names of the dropped partitions
+    """
+    today = date.today()
+    cutoff = _month_start(today.year, today.month - retain_months + 1)
+    rows = connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'activity_logs' "
+        "AND p.relnamespace = to_regnamespace(current_schema()) "
+        "AND c.relname LIKE :pattern"
+    ), {'pattern': PARTITION_PREFIX + '%'}).all()
+
+    dropped = []
+    for (name,) in rows:
+        try:
+            month = date(int(name[len(PARTITION_PREFIX):][:4]), int(name[-2:]), 1)
+        except ValueError:
+            continue
+        if month < cutoff:
+            connection.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            dropped.append(name)
+    return sorted(dropped)
+
+
+# =============================================================================
+# Audit Service
+# =============================================================================
+
+class AuditService:
+    """Capture ORM changes and write them to activity_logs in batches."""
+
+    _app: Optional[Flask] = None
+    _tables = AUDITED_TABLES
+    _queue: 'queue.Queue' = queue.Queue()
+    _redis = None
+    _flusher: Optional[threading.Thread] = None
+    _flusher_pid: Optional[int] = None
+    _lock = threading.Lock()
+    _stop = threading.Event()
+    _partition_month: Optional[date] = None
+
+    @classmethod
+    def init_app(cls, app: Flask) -> None:
+        """Register session listeners (no-op when AUDIT_LOG_ENABLED is False)."""
+        if not app.config.get('AUDIT_LOG_ENABLED', True):
+            return
+
+        cls._app = app
+        cls._tables = frozenset(app.config.get('AUDIT_LOG_TABLES') or AUDITED_TABLES)
+
+        redis_url = app.config.get('REDIS_URL')
+        if app.config.get('AUDIT_LOG_QUEUE', 'memory') == 'redis' and redis_url:
+            import redis
+            cls._redis = redis.Redis.from_url(redis_url, socket_timeout=2)
+
+        if not event.contains(db.session, 'after_flush', cls._after_flush):
+            event.listen(db.session, 'after_flush', cls._after_flush)
+            event.listen(db.session, 'after_commit', cls._after_commit)
+            event.listen(db.session, 'after_rollback', cls._after_rollback)
+            atexit.register(cls.flush)
+
+    # -------------------------------------------------------------------------
+    # Session events
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def _after_flush(cls, session, flush_context) -> None:
+        changes = (
+            [('create', obj) for obj in session.new]
+            + [('update', obj) for obj in session.dirty]
+            + [('delete', obj) for obj in session.deleted]
+        )
+        records = []
+        for action, obj in changes:
+            table = getattr(obj, '__tablename__', None)
+            if table not in cls._tables:
+                continue
+            record = cls._build_record(action, table, obj)
+            if record is not None:
+                records.append(record)
+
+        if records:
+            actor = cls._request_actor()
+            for record in records:
+                record.update(actor)
+            session.info.setdefault(_SESSION_KEY, []).extend(records)
+
+    @classmethod
+    def _after_commit(cls, session) -> None:
+        records = session.info.pop(_SESSION_KEY, None)
+        if records:
+            cls.enqueue(records)
+
+    @classmethod
+    def _after_rollback(cls, session) -> None:
+        session.info.pop(_SESSION_KEY, None)
+
+    @classmethod
+    def _build_record(cls, action: str, table: str, obj) -> Optional[Dict[str, Any]]:
+        state = inspect(obj)
+        old_values, new_values = {}, {}
+
+        for attr in state.mapper.column_attrs:
+            key = attr.key
+            if key in EXCLUDED_COLUMNS:
+                continue
+            if action == 'update':
+                history = state.attrs[key].history
+                if not history.has_changes():
+                    continue
+                # The old value is only known if the attribute was loaded before the change
+                if history.deleted:
+                    old_values[key] = _json_value(history.deleted[0])
+                new_values[key] = _json_value(history.added[0] if history.added else None)
+            elif action == 'create':
+                # state.dict: only loaded values, never triggers a lazy load mid-flush
+                new_values[key] = _json_value(state.dict.get(key))
+            else:
+                old_values[key] = _json_value(state.dict.get(key))
+
+        if action == 'update' and not new_values:
+            return None
+
+        # Identity keys are assigned after the flush completes; read the PK from state
+        pk_values = [
+            state.dict.get(state.mapper.get_property_by_column(column).key)
+            for column in state.mapper.primary_key
+        ]
+        record_id = pk_values[0] if len(pk_values) == 1 and isinstance(pk_values[0], int) else None
+        return {
+            'action': action,
+            'table_name': table,
+            'record_id': record_id,
+            'old_values': old_values or None,
+            'new_values': new_values or None,
+            'created_at': datetime.utcnow(),
+        }
+
+    @staticmethod
+    def _request_actor() -> Dict[str, Any]:
+        """User id, IP and user agent of the current request (if any)."""
+        if not has_request_context():
+            return {'user_id': None, 'ip_address': None, 'user_agent': None}
+
+        user_id = None
+        try:
+            from flask_jwt_extended import get_jwt_identity
+            identity = get_jwt_identity()
+            user_id = int(identity) if identity is not None else None
+        except Exception:
+            pass
+        if user_id is None:
+            from flask_login import current_user
+            if getattr(current_user, 'is_authenticated', False):
+                user_id = current_user.id
+
+        forwarded = request.headers.get('X-Forwarded-For', '')
+        ip_address = forwarded.split(',')[0].strip() or request.remote_addr
+        return {
+            'user_id': user_id,
+            'ip_address': (ip_address or '')[:45] or None,
+            'user_agent': request.user_agent.string or None,
+        }
+
+    # -------------------------------------------------------------------------
+    # Queue & flusher
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def enqueue(cls, records: List[Dict[str, Any]]) -> None:
+        """Queue audit records for the background flusher."""
+        cls._ensure_flusher()
+        if cls._redis is not None:
+            try:
+                cls._redis.rpush(REDIS_QUEUE_KEY, *[
+                    json.dumps(r, default=_json_value) for r in records
+                ])
+            except Exception as e:
+                cls._log_error(f"Audit queue (Redis) unavailable, buffering in memory: {e}")
+                cls._put_local(records)
+        else:
+            cls._put_local(records)
+
+    @classmethod
+    def _put_local(cls, records: List[Dict[str, Any]]) -> None:
+        if cls._queue.qsize() + len(records) > MAX_PENDING_ROWS:
+            cls._log_error(f"Audit queue full, dropping {len(records)} records")
+            return
+        for record in records:
+            cls._queue.put(record)
+
+    @classmethod
+    def _ensure_flusher(cls) -> None:
+        """Start the flusher thread once per process (gunicorn forks after import)."""
+        pid = os.getpid()
+        if cls._flusher_pid == pid and cls._flusher is not None and cls._flusher.is_alive():
+            return
+        with cls._lock:
+            if cls._flusher_pid == pid and cls._flusher is not None and cls._flusher.is_alive():
+                return
+            if cls._flusher_pid != pid:
+                # Queue/lock state inherited from the parent is not valid after fork
+                cls._queue = queue.Queue()
+            cls._stop.clear()
+            cls._flusher = threading.Thread(target=cls._run, name='audit-log-flusher', daemon=True)
+            cls._flusher_pid = pid
+            cls._flusher.start()
+
+    @classmethod
+    def _run(cls) -> None:
+        interval = float(cls._app.config.get('AUDIT_LOG_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL))
+        while not cls._stop.wait(interval):
+            try:
+                cls.flush()
+            except Exception as e:
+                cls._log_error(f"Audit log flush failed: {e}")
+
+    @classmethod
+    def flush(cls) -> int:
+        """
+        Write all queued records now.
+
+        Returns:
+            Number of rows inserted
+        """
+        if cls._app is None:
+            return 0
+        batch_size = int(cls._app.config.get('AUDIT_LOG_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+        total = 0
+        while True:
+            batch = cls._drain(batch_size)
+            if not batch:
+                return total
+            try:
+                cls._write(batch)
+            except Exception:
+                # Put the batch back so it is retried on the next tick
+                cls._put_local(batch)
+                raise
+            total += len(batch)
+
+    @classmethod
+    def _drain(cls, limit: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(cls._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        if cls._redis is not None and len(batch) < limit:
+            try:
+                pipe = cls._redis.pipeline(transaction=True)
+                pipe.lrange(REDIS_QUEUE_KEY, 0, limit - len(batch) - 1)
+                pipe.ltrim(REDIS_QUEUE_KEY, limit - len(batch), -1)
+                raw, _ = pipe.execute()
+                for item in raw:
+                    record = json.loads(item)
+                    record['created_at'] = datetime.fromisoformat(record['created_at'])
+                    batch.append(record)
+            except Exception as e:
+                cls._log_error(f"Audit queue (Redis) read failed: {e}")
+        return batch
+
+    @classmethod
+    def _write(cls, batch: List[Dict[str, Any]]) -> None:
+        from core.backend_engine.models import ActivityLog
+
+        with cls._app.app_context():
+            with db.engine.begin() as connection:
+                if connection.dialect.name == 'postgresql':
+                    cls._ensure_current_partition(connection)
+                # executemany -> batched multi-row INSERT ... VALUES (insertmanyvalues)
+                connection.execute(insert(ActivityLog.__table__), batch)
+
+    @classmethod
+    def _ensure_current_partition(cls, connection) -> None:
+        """Create this and next month's partitions once per process per month."""
+        month = date.today().replace(day=1)
+        if cls._partition_month != month:
+            ensure_partitions(connection, months_ahead=1, start=month)
+            cls._partition_month = month
+
+    @classmethod
+    def _log_error(cls, message: str) -> None:
+        if cls._app is not None:
+            cls._app.logger.error(message)
+
+
+def _json_value(value: Any) -> Any:
+    """Convert column values to JSON-serializable primitives."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return None
+    return value
+
+
+__all__ = [
+    'AuditService',
+    'AUDITED_TABLES',
+    'ensure_partitions',
+    'drop_partitions',
+]
@@ -0,0 +1,148 @@
+"""
+OWS Core Engine - Rate Limit Service
+
+Per-route rate limits and limit-hit metrics on top of the shared
+Flask-Limiter instance.
+
+Limits are looked up by name in the site's ``RATE_LIMITS`` config on every
+request, so a site can tighten or relax a route without touching core code.
+Breaches are counted in hourly buckets in the limiter's own storage (Redis
+in production), so the numbers are shared by all gunicorn workers. If the
+storage is unreachable the count is kept in-process instead.
+
+Usage:
+    from core.backend_engine.services.rate_limit import rate_limit
+
+    @bp.route('/auth/login', methods=['POST'])
+    @rate_limit('auth.login', '10/minute')
+    def api_login():
+        ...
+
+Site config:
+    RATE_LIMITS = {'auth.login': '20/minute'}
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import partial
+from threading import Lock
+from typing import Any, Callable, Dict
+
+from flask import current_app, request
+from flask_limiter import RequestLimit
+
+from core.backend_engine.factory import limiter
+
+
+# Breach counter buckets (hourly) and how long they are kept (seconds)
+METRICS_KEY_PREFIX = 'ratelimit-metrics'
+METRICS_BUCKET_FORMAT = '%Y%m%d%H'
+METRICS_RETENTION = 48 * 3600
+METRICS_WINDOW_HOURS = 24
+
+# name -> default limit string, filled in by @rate_limit
+_registry: Dict[str, str] = {}
+
+# Process-local counters used while the shared storage is down
+_local_breaches: Counter = Counter()
+_local_lock = Lock()
+
+
+class RateLimitService:
+    """Route limit lookup and breach metrics."""
+
+    @classmethod
+    def get_limit(cls, name: str) -> str:
+        """Resolve the limit string for a named route (site config overrides the default)."""
+        overrides = current_app.config.get('RATE_LIMITS') or {}
+        return overrides.get(name) or _registry.get(name, '')
+
+    @classmethod
+    def record_breach(cls, name: str, request_limit: RequestLimit) -> None:
+        """
+        on_breach callback: count and log a limit hit.
+
+        Returns None so Flask-Limiter still answers with its regular 429.
+        """
+        current_app.logger.warning(
+            f"Rate limit exceeded: {name} ({request_limit.limit}) "
+            f"key={request_limit.key} endpoint={request.endpoint}"
+        )
+        key = cls._bucket_key(name, datetime.utcnow())
+        try:
+            limiter.storage.incr(key, METRICS_RETENTION)
+        except Exception:
+            with _local_lock:
+                _local_breaches[key] += 1
+
+    @classmethod
+    def get_metrics(cls) -> Dict[str, Any]:
+        """
+        Summarise limit configuration and breach counts.
+
+        Returns:
+            dict with storage info and, per named limit, the active limit
+            string plus breach counts for the current hour and last 24 hours.
+        """
+        now = datetime.utcnow()
+        buckets = [now - timedelta(hours=h) for h in range(METRICS_WINDOW_HOURS)]
+
+        storage_healthy = cls._storage_healthy()
+        limits = {}
+        for name in sorted(_registry):
+            counts = [cls._read_bucket(cls._bucket_key(name, b), storage_healthy) for b in buckets]
+            limits[name] = {
+                'limit': cls.get_limit(name),
+                'breaches_last_hour': counts[0],
+                'breaches_24h': sum(counts),
+            }
+
+        return {
+            'storage': limiter.storage.__class__.__name__,
+            'storage_healthy': storage_healthy,
+            'strategy': current_app.config.get('RATELIMIT_STRATEGY'),
+            'limits': limits,
+            'generated_at': now.isoformat(),
+        }
+
+    @staticmethod
+    def _bucket_key(name: str, at: datetime) -> str:
+        return f"{METRICS_KEY_PREFIX}/{name}/{at.strftime(METRICS_BUCKET_FORMAT)}"
+
+    @staticmethod
+    def _read_bucket(key: str, storage_healthy: bool) -> int:
+        count = _local_breaches.get(key, 0)
+        if storage_healthy:
+            try:
+                count += limiter.storage.get(key)
+            except Exception:
+                pass
+        return count
+
+    @staticmethod
+    def _storage_healthy() -> bool:
+        try:
+            return bool(limiter.storage.check())
+        except Exception:
+            return False
+
+
+def rate_limit(name: str, default: str) -> Callable:
+    """
+    Decorator: apply a named, config-overridable limit to a route.
+
+    Args:
+        name: Limit name used in ``RATE_LIMITS`` and in metrics
+        default: Limit string used when the site does not override it
+    """
+    _registry[name] = default
+    return limiter.limit(
+        partial(RateLimitService.get_limit, name),
+        on_breach=partial(RateLimitService.record_breach, name),
+    )
+
+
+__all__ = [
+    'RateLimitService',
+    'rate_limit',
+]
@@ -0,0 +1,150 @@
+"""
+OWS Core Engine - Dashboard Statistics Service
+
+Computes admin dashboard counters in a single statement.
+
+All counters come from one SELECT that joins a single-row aggregate per
+table; contents uses ``COUNT(*) FILTER (WHERE ...)`` so it is scanned once
+for all of its counters. For very large tables the unfiltered totals are
+taken from the planner's ``pg_class.reltuples`` estimate (a cheap catalog
+lookup) instead of an exact COUNT(*); those keys are listed in the
+``estimated`` field of the result.
+
+Results are cached briefly via Flask-Caching (Redis in production).
+
+Usage:
+    from core.backend_engine.services.stats import DashboardStatsService
+
+    stats = DashboardStatsService.get_stats()
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Set
+
+from flask import current_app
+from sqlalchemy import func, select, text, true
+
+from core.backend_engine.factory import db, cache
+
+
+# Cache key / TTL (seconds)
+STATS_CACHE_KEY = 'admin_dashboard_stats'
+DEFAULT_CACHE_TIMEOUT = 30
+
+# Tables with more estimated rows than this use reltuples for their totals
+DEFAULT_ESTIMATE_THRESHOLD = 1_000_000
+
+
+class DashboardStatsService:
+    """Admin dashboard statistics."""
+
+    # stat key -> table whose unfiltered total it represents
+    TOTAL_KEYS = {
+        'total_contents': 'contents',
+        'total_users': 'users',
+        'total_categories': 'categories',
+    }
+
+    @classmethod
+    def get_stats(cls, use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Get dashboard statistics.
+
+        Args:
+            use_cache: Whether to return a cached result when available
+
+        Returns:
+            dict with the counters, plus ``estimated`` (keys served from
+            planner estimates) and ``generated_at``.
+        """
+        if use_cache:
+            cached = cache.get(STATS_CACHE_KEY)
+            if cached is not None:
+                return cached
+
+        stats = cls._compute()
+        timeout = current_app.config.get('DASHBOARD_STATS_CACHE_TIMEOUT', DEFAULT_CACHE_TIMEOUT)
+        cache.set(STATS_CACHE_KEY, stats, timeout=timeout)
+        return stats
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """Drop the cached statistics."""
+        cache.delete(STATS_CACHE_KEY)
+
+    @classmethod
+    def _compute(cls) -> Dict[str, Any]:
+        from core.backend_engine.models import Content, User, Comment, Category
+
+        estimates = cls._table_estimates()
+        threshold = current_app.config.get('DASHBOARD_STATS_ESTIMATE_THRESHOLD', DEFAULT_ESTIMATE_THRESHOLD)
+        estimated: Set[str] = {
+            key for key, table in cls.TOTAL_KEYS.items()
+            if estimates.get(table, 0) > threshold
+        }
+
+        # One derived row per table; contents is scanned once for all three counters
+        contents_columns = [
+            func.count().filter(Content.status == 'published').label('published_contents'),
+            func.count().filter(Content.status == 'draft').label('draft_contents'),
+        ]
+        if 'total_contents' not in estimated:
+            contents_columns.append(func.count().label('total_contents'))
+        aggregates = [
+            select(*contents_columns).select_from(Content).subquery('contents_agg'),
+            select(func.count().label('pending_comments'))
+            .select_from(Comment).where(Comment.status == 'pending').subquery('comments_agg'),
+        ]
+        if 'total_users' not in estimated:
+            aggregates.append(
+                select(func.count().label('total_users')).select_from(User).subquery('users_agg')
+            )
+        if 'total_categories' not in estimated:
+            aggregates.append(
+                select(func.count().label('total_categories')).select_from(Category).subquery('categories_agg')
+            )
+
+        from_clause = aggregates[0]
+        for aggregate in aggregates[1:]:
+            from_clause = from_clause.join(aggregate, true())
+        stmt = select(*[column for aggregate in aggregates for column in aggregate.c]).select_from(from_clause)
+
+        row = db.session.execute(stmt).mappings().one()
+
+        stats = {key: int(value or 0) for key, value in row.items()}
+        for key in estimated:
+            stats[key] = estimates[cls.TOTAL_KEYS[key]]
+
+        # Published + draft never exceeds the (possibly estimated) total
+        if 'total_contents' in estimated:
+            stats['total_contents'] = max(
+                stats['total_contents'],
+                stats['published_contents'] + stats['draft_contents'],
+            )
+
+        stats['estimated'] = sorted(estimated)
+        stats['generated_at'] = datetime.utcnow().isoformat()
+        return stats
+
+    @classmethod
+    def _table_estimates(cls) -> Dict[str, int]:
+        """Read planner row estimates for the counted tables (PostgreSQL only)."""
+        if db.engine.name != 'postgresql':
+            return {}
+
+        rows = db.session.execute(
+            text(
+                "SELECT c.relname, c.reltuples::bigint "
+                "FROM pg_class c "
+                "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE n.nspname = current_schema() AND c.relname = ANY(:tables)"
+            ),
+            {'tables': list(set(cls.TOTAL_KEYS.values()))},
+        ).all()
+        # reltuples is -1 for tables that were never vacuumed/analyzed
+        return {name: int(count) for name, count in rows if count is not None and count >= 0}
+
+
+__all__ = [
+    'DashboardStatsService',
+]
@@ -2,7 +2,8 @@
 Media Library Package
 
 輕量化媒體庫，支援 Local 本地儲存和 GCS 雲端儲存。
-自動產生多尺寸圖片變體（thumbnail, small, medium, large, hero）。
+自動產生多尺寸圖片變體（thumbnail, small, medium, large, hero），
+變體由背景工作佇列（media_lib.jobs）處理，上傳請求不需等待。
 可作為 Flask Blueprint 掛載到任何子專案。
 
 Storage backend 透過 Flask config 自動選擇：
@@ -33,6 +34,25 @@ def register_media_lib(app, db):
     app.register_blueprint(media_lib_bp, url_prefix='/api/v1/media-lib')
     app.logger.info('Registered media-lib blueprint at /api/v1/media-lib')
 
+    # 提供給 core 的查詢介面（core 不直接 import media_lib，未安裝時 API 照常運作）：
+    #   image_crops(urls) → {url: {'16x9': {...}, '1x1': {...}}}，依焦點產生的裁切圖
+    from packages.media_lib.crops import image_crops
+    app.extensions['media_lib'] = {'image_crops': image_crops}
+
+    # 背景工作：註冊處理函式與 CLI（flask media-lib worker）
+    import packages.media_lib.tasks  # noqa: F401
+    from packages.media_lib.cli import media_lib_cli
+    app.cli.add_command(media_lib_cli)
+
+    # 內嵌 worker：每個 gunicorn process 在第一個 request 時啟動背景執行緒。
+    # 未設定時只在開發環境開啟；正式環境以獨立的 flask media-lib worker 處理（見 jobs.py）
+    if app.config.get('MEDIA_JOBS_EMBEDDED_WORKER', app.debug and not app.testing):
+        from packages.media_lib.jobs import ensure_embedded_worker
+
+        @app.before_request
+        def _start_media_job_worker():
+            ensure_embedded_worker(app)
+
     # 註：Local 模式的 /uploads/<path> serve 路由由 core factory 的
     # _configure_static_serving() 統一註冊，這裡不再重複註冊以免路由衝突。
 
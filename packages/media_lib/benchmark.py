@@ -0,0 +1,208 @@
+"""
+Media Library - 變體產生效能基準
+
+以固定的合成圖片集量測 generate_variants 的 wall time（中位數）與峰值 RSS
+增量（執行前重設 VmHWM，扣除 import 等基礎用量）。每張圖片在獨立子行程中執行。
+
+Usage:
+    python -m packages.media_lib.benchmark
+    python -m packages.media_lib.benchmark --runs 5
+    # 與其他版本比較（例如 git show HEAD~1:packages/media_lib/image_processor.py > /tmp/old.py）
+    python -m packages.media_lib.benchmark --compare /tmp/old.py
+    # 以 process pool 產生（encoder.py）；另量測整批圖片的總時間
+    python -m packages.media_lib.benchmark --workers 4
+
+使用 --workers 時，峰值 RSS 只含主行程（子行程的記憶體不計入）。
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+# 圖片集：(檔名, 尺寸, 模式, 格式, MIME type)
+CORPUS = [
+    ('photo_24mp.jpg', (6000, 4000), 'RGB', 'JPEG', 'image/jpeg'),
+    ('photo_12mp_portrait.jpg', (3000, 4000), 'RGB', 'JPEG', 'image/jpeg'),
+    ('photo_2mp.jpg', (1600, 1200), 'RGB', 'JPEG', 'image/jpeg'),
+    ('graphic_8mp.png', (3264, 2448), 'RGB', 'PNG', 'image/png'),
+    ('alpha_4mp.png', (2048, 2048), 'RGBA', 'PNG', 'image/png'),
+    ('palette.gif', (1200, 900), 'P', 'GIF', 'image/gif'),
+]
+
+
+def build_corpus(directory: str) -> list:
+    """產生合成圖片（漸層 + 雜訊，模擬照片的高頻內容）。"""
+    paths = []
+    for name, size, mode, fmt, mime in CORPUS:
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            gradient = Image.linear_gradient('L').resize(size)
+            mirrored = gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+            # 照片（JPEG）加入雜訊；圖像類（PNG/GIF）維持平滑以貼近實際壓縮率
+            detail = Image.effect_noise(size, 40) if fmt == 'JPEG' else Image.radial_gradient('L').resize(size)
+            img = Image.merge('RGB', (gradient, detail, mirrored))
+            if mode == 'RGBA':
+                img.putalpha(Image.radial_gradient('L').resize(size))
+            elif mode == 'P':
+                img = img.quantize(colors=128)
+            save_kwargs = {'quality': 90} if fmt == 'JPEG' else {}
+            img.save(path, format=fmt, **save_kwargs)
+        paths.append((path, mime))
+    return paths
+
+
+def _load_processor(module_path: str):
+    if not module_path:
+        from packages.media_lib import image_processor
+        return image_processor
+    spec = importlib.util.spec_from_file_location('bench_image_processor', module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _rss_kb(field: str) -> int:
+    """讀取 /proc/self/status 的 VmRSS / VmHWM（KB）；非 Linux 退回 ru_maxrss。"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _reset_peak_rss() -> None:
+    """重設 VmHWM（Linux 4.0+），讓峰值只反映 generate_variants 本身。"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def _worker(module_path: str, image_path: str, mime_type: str, runs: int, workers: int = 0) -> dict:
+    """子行程：執行 generate_variants 並回報時間與 RSS（KB）。"""
+    processor = _load_processor(module_path)
+    with open(image_path, 'rb') as f:
+        data = f.read()
+
+    encoder = None
+    if workers:
+        from packages.media_lib.encoder import VariantEncoder
+        encoder = VariantEncoder(workers)
+        encoder.generate_variants(data, mime_type)  # 預先啟動子行程，不計入時間
+
+    baseline = _rss_kb('VmRSS')
+    _reset_peak_rss()
+    timings = []
+    variants = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        if encoder is not None:
+            variants = len(encoder.generate_variants(data, mime_type))
+        else:
+            variants = len(processor.generate_variants(data, mime_type))
+        timings.append(time.perf_counter() - start)
+    peak = _rss_kb('VmHWM')
+    if encoder is not None:
+        encoder.shutdown()
+
+    return {
+        'median_s': statistics.median(timings),
+        'rss_kb': baseline,
+        'delta_rss_kb': max(0, peak - baseline),
+        'variants': variants,
+    }
+
+
+def run(module_path: str, paths: list, runs: int, workers: int = 0) -> dict:
+    results = {}
+    for image_path, mime in paths:
+        out = subprocess.run(
+            [sys.executable, '-m', 'packages.media_lib.benchmark', '--worker',
+             module_path or '', image_path, mime, str(runs), str(workers)],
+            check=True, capture_output=True, text=True,
+        )
+        results[os.path.basename(image_path)] = json.loads(out.stdout)
+    return results
+
+
+def run_batch(paths: list, workers: int, copies: int) -> tuple:
+    """整批圖片（corpus 重複 copies 次）的總時間：逐張在行程內 vs encode_many。"""
+    from packages.media_lib.encoder import VariantEncoder
+    from packages.media_lib.image_processor import generate_variants
+
+    items = []
+    for image_path, mime in paths:
+        with open(image_path, 'rb') as f:
+            data = f.read()
+        items.extend((f'{image_path}#{i}', data, mime) for i in range(copies))
+
+    start = time.perf_counter()
+    for _, data, mime in items:
+        generate_variants(data, mime)
+    serial = time.perf_counter() - start
+
+    encoder = VariantEncoder(workers)
+    list(encoder.encode_many(items[:workers]))  # 預先啟動子行程
+    start = time.perf_counter()
+    list(encoder.encode_many(items))
+    pooled = time.perf_counter() - start
+    encoder.shutdown()
+    return len(items), serial, pooled
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3, help='每張圖片重複次數（取中位數）')
+    parser.add_argument('--corpus-dir', default=os.path.join(tempfile.gettempdir(), 'media_lib_bench'))
+    parser.add_argument('--compare', default=None, help='另一個 image_processor.py 的路徑')
+    parser.add_argument('--workers', type=int, default=0, help='以 N 個子行程的 encoder pool 產生')
+    parser.add_argument('--batch-copies', type=int, default=3, help='批次量測時 corpus 重複次數')
+    parser.add_argument('--worker', nargs=5, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        module_path, image_path, mime, runs, workers = args.worker
+        print(json.dumps(_worker(module_path, image_path, mime, int(runs), int(workers))))
+        return
+
+    os.makedirs(args.corpus_dir, exist_ok=True)
+    paths = build_corpus(args.corpus_dir)
+
+    current = run('', paths, args.runs, args.workers)
+    other = run(args.compare, paths, args.runs) if args.compare else None
+
+    header = f"{'image':<26}{'variants':>9}{'time (s)':>11}{'RSS (MB)':>10}{'peak +RSS (MB)':>16}"
+    if other:
+        header += f"{'base time':>11}{'base peak +RSS':>16}"
+    print(header)
+    for name, r in current.items():
+        line = (
+            f"{name:<26}{r['variants']:>9}{r['median_s']:>11.3f}"
+            f"{r['rss_kb'] / 1024:>10.1f}{r['delta_rss_kb'] / 1024:>16.1f}"
+        )
+        if other:
+            o = other[name]
+            line += f"{o['median_s']:>11.3f}{o['delta_rss_kb'] / 1024:>16.1f}"
+        print(line)
+
+    if args.workers:
+        count, serial, pooled = run_batch(paths, args.workers, args.batch_copies)
+        print(f'\nbatch of {count} images: {serial:.2f}s in-process, '
+              f'{pooled:.2f}s with {args.workers} encoder worker(s)')
+
+
+if __name__ == '__main__':
+    main()
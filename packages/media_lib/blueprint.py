@@ -10,9 +10,29 @@ Media Library - Flask Blueprint (API Routes)
     PUT    /files/<id>     更新 metadata
     DELETE /files/<id>     刪除檔案
     POST   /files/move     批次移動檔案
+    GET    /files/<id>/status     變體處理狀態（processing / ready / failed）
+    POST   /files/<id>/reprocess  重新產生變體
+    PUT    /files/<id>/focal-point   設定焦點並重新產生 16:9 / 1:1 裁切圖（DELETE 回到中心）
+    GET    /files/<id>/render-url?w=&h=&fit=&fmt=   取得已簽章的即時衍生圖網址
+
+即時衍生圖:
+    GET    /render/<id>?w=&h=&fit=&fmt=&v=&s=   任意尺寸 / 格式（簽章參數，磁碟 LRU 快取；
+                                          v 為原檔版本，原檔被覆寫後舊網址轉址到新版本）
+
+可續傳上傳（tus 風格，大型影片 / 文件）:
+    POST   /uploads        建立上傳（Upload-Length, Upload-Metadata）
+    HEAD   /uploads/<id>   查詢續傳 offset
+    PATCH  /uploads/<id>   續寫一段資料（最後一段完成後建立檔案）
+    DELETE /uploads/<id>   取消上傳
+
+直接上傳（檔案不經過 Flask worker）:
+    POST   /uploads/signed            取得上傳 URL（GCS V4 signed URL / Local HMAC URL）
+    PUT    /uploads/signed/<token>    Local 模式的上傳端點（token 授權）
+    POST   /uploads/signed/finalize   驗證物件並建立檔案記錄
 
 資料夾管理:
     GET    /folders        列出資料夾
+    GET    /folders/tree   所有資料夾與檔案數 / 位元組數（直接與含子資料夾，快取）
     POST   /folders        建立資料夾
     PUT    /folders/<id>   更新資料夾
     DELETE /folders/<id>   刪除資料夾
@@ -25,28 +45,61 @@ Media Library - Flask Blueprint (API Routes)
 Metadata:
     PUT    /files/<id>/metadata     更新 metadata
 
+GCS 匯入:
+    GET    /import/scan?prefix=&format=ndjson&full=&restart=   列出尚未匯入的物件（NDJSON 串流，
+                                                             增量掃描，逾時由檢查點續掃）
+    POST   /import/execute   匯入指定的物件（背景工作，回傳 202）
+    GET    /import/jobs/<id> 匯入工作的進度與個別檔案的錯誤
+
 公開查詢:
-    GET    /public/lookup?chart_id=xxx   透過命盤ID查圖片
+    GET    /public/lookup?chart_id=xxx   透過命盤ID查圖片（lookup / search 短暫快取，支援 ETag / 304）
     GET    /public/search?status=...     搜尋
+    GET    /public/files/<id>/<variant>  依 Accept 轉址到最小的可用格式（AVIF / WebP / 原圖格式；
+                                          動畫 GIF 的 original 可轉為原尺寸的動畫 WebP）
 """
 
+import base64
+import binascii
+import json
 import os
 import mimetypes
-from flask import Blueprint, jsonify, request, current_app
+from datetime import datetime, timezone
+from typing import Optional
+
+from flask import (
+    Blueprint, Response, jsonify, redirect, request, current_app, send_file, stream_with_context, url_for,
+)
+from werkzeug.http import http_date
+from werkzeug.wsgi import get_input_stream
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.orm import joinedload, selectinload
 
 from core.backend_engine.factory import db
 from core.backend_engine.models import User
 from core.backend_engine.services.rbac import RBACService
-from packages.media_lib.models import MLFile, MLFileVariant, MLFolder, MLTag, MLFileMetadata
+from packages.media_lib.models import MLFile, MLFolder, MLTag, MLFileMetadata, MLJob, MLUploadSession
 from packages.media_lib.schemas import MLFileSchema, MLFolderSchema, MLTagSchema, MLFileMetadataSchema
-from packages.media_lib.storage import MediaStorage
-from packages.media_lib.image_processor import is_image, get_image_dimensions, generate_variants
-from packages.media_lib.utils import slugify
+from packages.media_lib.storage import FileTooLargeError, MediaStorage
+from packages.media_lib.image_processor import OUTPUT_FORMATS, is_image, get_image_dimensions
+from packages.media_lib.jobs import notify_workers, retry_job
+from packages.media_lib import (
+    bulk_import, crops, dedup, folders, gcs_import, public_queries, render, resumable, signed_uploads,
+)
+from packages.media_lib.render import RenderBusy, RenderParamsError
+from packages.media_lib.resumable import UploadChunkError
+from packages.media_lib.signed_uploads import InvalidUploadToken
+from packages.media_lib.tasks import JOB_VARIANTS, enqueue_crops, enqueue_variants
+from packages.media_lib.utils import SNIFF_BYTES, slugify, sniff_mime_type
 from packages.media_lib.config import (
     ALLOWED_EXTENSIONS,
+    ANIMATED_ORIGINAL,
     ALLOWED_MIME_TYPES,
+    IMPORT_SCAN_MAX_SECONDS,
     MAX_FILE_SIZE,
+    MAX_RESUMABLE_FILE_SIZE,
+    RENDER_CACHE_MAX_AGE,
+    VARIANT_REDIRECT_MAX_AGE,
+    SNIFFED_MIME_EQUIVALENTS,
 )
 
 media_lib_bp = Blueprint('media_lib', __name__)
@@ -83,18 +136,25 @@ def _require_media_delete():
     return _require_media('media.delete')
 
 
-def _validate_upload(filename: str, mime_type: str, file_size: int):
+def _max_file_size() -> int:
+    """單檔大小上限（各站以 MEDIA_MAX_FILE_SIZE 設定）。"""
+    return int(current_app.config.get('MEDIA_MAX_FILE_SIZE', MAX_FILE_SIZE))
+
+
+def _validate_upload(filename: str, mime_type: str, file_size: Optional[int] = None):
     """
     驗證上傳檔案的副檔名、MIME 與大小（雙重防線：副檔名 allowlist + MIME 對照）。
+    串流上傳時大小在 spool 過程中檢查，file_size 傳 None。
 
     Returns:
         (None, None) if valid.
         (response, status_code) tuple if invalid.
     """
     # 大小
-    if file_size > MAX_FILE_SIZE:
+    max_size = _max_file_size()
+    if file_size is not None and file_size > max_size:
         return jsonify({
-            'error': f'File too large: {file_size} bytes (max {MAX_FILE_SIZE}).'
+            'error': f'File too large: {file_size} bytes (max {max_size}).'
         }), 413
 
     # 副檔名 allowlist
@@ -123,10 +183,78 @@ def _validate_upload(filename: str, mime_type: str, file_size: int):
     return None, None
 
 
+def _validate_content(filename: str, head: bytes):
+    """
+    第三道防線：以檔頭 magic bytes 確認實際內容與副檔名相符（擋掉改副檔名的檔案）。
+
+    Returns:
+        (None, None) if valid.
+        (response, status_code) tuple if invalid.
+    """
+    ext = os.path.splitext(filename)[1].lstrip('.').lower()
+    expected = ALLOWED_MIME_TYPES.get(ext, set()) | SNIFFED_MIME_EQUIVALENTS.get(ext, set())
+    sniffed = sniff_mime_type(head)
+    if expected and sniffed not in expected:
+        return jsonify({
+            'error': f"File content ({sniffed or 'unknown'}) does not match extension '.{ext}'."
+        }), 400
+    return None, None
+
+
+def _create_file_record(user, original_filename: str, unique_name: str, gcs_path: str,
+                        public_url: str, file_size: int, mime_type: str,
+                        folder_id: Optional[int] = None, width: Optional[int] = None,
+                        height: Optional[int] = None, content_hash: Optional[str] = None) -> MLFile:
+    """
+    建立已上傳檔案的 MLFile 與 metadata 記錄；圖片排入變體背景工作（不 commit）。
+    有 content_hash 時，若同時有相同內容的上傳先完成，此記錄標記為其重複記錄。
+    """
+    ml_file = MLFile(
+        filename=unique_name,
+        original_filename=original_filename,
+        gcs_path=gcs_path,
+        public_url=public_url,
+        file_size=file_size,
+        mime_type=mime_type,
+        width=width,
+        height=height,
+        folder_id=folder_id,
+        uploaded_by=user.id,
+        attributes={},
+        content_hash=content_hash,
+    )
+    if content_hash:
+        dedup.flush_with_hash(ml_file)
+    else:
+        db.session.add(ml_file)
+        db.session.flush()  # 取得 ml_file.id
+
+    # 自動建立 metadata 記錄
+    db.session.add(MLFileMetadata(file_id=ml_file.id))
+
+    # 圖片變體交由背景工作產生（formats 於完成後補上，processing_status 變為 ready）
+    if is_image(mime_type):
+        enqueue_variants(ml_file)
+    return ml_file
+
+
 # =============================================================================
 # 檔案管理
 # =============================================================================
 
+def _listing_options():
+    """
+    檔案列表的載入計畫（MLFileSchema 會讀取 variants / tags / file_metadata）：
+    metadata 與檔案一對一，在分頁查詢中一起 JOIN；variants 與 tags 各以一次 IN 查詢載入整頁。
+    一頁共 4 個查詢（總數、分頁、變體、標籤），與每頁筆數無關。
+    """
+    return (
+        joinedload(MLFile.file_metadata),
+        selectinload(MLFile.variants),
+        selectinload(MLFile.tags),
+    )
+
+
 @media_lib_bp.route('/files', methods=['GET'])
 @jwt_required()
 def list_files():
@@ -141,7 +269,7 @@ def list_files():
     tag_id = request.args.get('tag_id', type=int)
     search = request.args.get('search', '').strip()
 
-    query = MLFile.query
+    query = MLFile.query.options(*_listing_options())
 
     if folder_id is not None:
         query = query.filter_by(folder_id=folder_id if folder_id != 0 else None)
@@ -180,7 +308,7 @@ def get_file(file_id):
 @media_lib_bp.route('/files', methods=['POST'])
 @jwt_required()
 def upload_file():
-    """上傳檔案（Local 或 GCS），圖片類型自動產生變體。"""
+    """上傳檔案（Local 或 GCS）；圖片類型排入背景工作產生變體，立即回應 processing。"""
     user, err = _require_editor()
     if err:
         return err
@@ -193,78 +321,54 @@ def upload_file():
         return jsonify({'error': 'Filename is empty'}), 400
 
     folder_id = request.form.get('folder_id', type=int)
-
-    # 先讀進 buffer 才能驗大小
-    file_data = file.read()
-    file_size = len(file_data)
     mime_type = file.content_type or 'application/octet-stream'
 
-    # 驗證副檔名、MIME 與大小（在上傳到 GCS 之前擋下）
-    err_resp = _validate_upload(file.filename, mime_type, file_size)
+    # 驗證副檔名與 MIME（在讀取內容之前擋下）
+    err_resp = _validate_upload(file.filename, mime_type)
     if err_resp[0] is not None:
         return err_resp
 
-    try:
-        gcs = MediaStorage.get_instance()
+    storage = MediaStorage.get_instance()
 
-        # 上傳原圖到 GCS
-        file.seek(0)
-        public_url, gcs_path, unique_name = gcs.upload(
-            file, file.filename, content_type=mime_type
-        )
+    # 單次串流讀取：寫入暫存檔，同時計算大小、sha256 與檔頭（不將整個檔案讀入記憶體）
+    try:
+        spooled = storage.spool(file.stream, _max_file_size())
+    except FileTooLargeError as e:
+        return jsonify({'error': f'File too large (max {e.max_size} bytes).'}), 413
 
-        # 取得圖片尺寸
+    try:
+        err_resp = _validate_content(file.filename, spooled.head)
+        if err_resp[0] is not None:
+            return err_resp
+
+        # 相同內容已存在：共用既有物件與變體，只建立新的檔案記錄
+        original = dedup.find_original(spooled.sha256)
+        if original is not None:
+            ml_file = dedup.create_reference(original, user, file.filename, folder_id=folder_id)
+            db.session.commit()
+            return jsonify(file_schema.dump(ml_file)), 201
+
+        # 取得圖片尺寸（只讀檔頭）
         width, height = None, None
         if is_image(mime_type):
-            width, height = get_image_dimensions(file_data)
-
-        # 建立資料庫記錄
-        ml_file = MLFile(
-            filename=unique_name,
-            original_filename=file.filename,
-            gcs_path=gcs_path,
-            public_url=public_url,
-            file_size=file_size,
+            width, height = get_image_dimensions(spooled.path)
+
+        # 上傳原檔（Local：移動暫存檔；GCS：分段 resumable upload）
+        public_url, gcs_path, unique_name = storage.upload_spooled(
+            spooled, file.filename, content_type=mime_type
+        )
+
+        ml_file = _create_file_record(
+            user, file.filename, unique_name, gcs_path, public_url,
+            file_size=spooled.size,
             mime_type=mime_type,
+            folder_id=folder_id,
             width=width,
             height=height,
-            folder_id=folder_id,
-            uploaded_by=user.id,
+            content_hash=spooled.sha256,
         )
-        db.session.add(ml_file)
-        db.session.flush()  # 取得 ml_file.id
-
-        # 自動建立 metadata 記錄
-        metadata = MLFileMetadata(file_id=ml_file.id)
-        db.session.add(metadata)
-
-        # 產生圖片變體
-        if is_image(mime_type):
-            variants = generate_variants(file_data, mime_type)
-            for v in variants:
-                # 變體的 GCS 路徑：在原檔路徑前加上變體類型前綴
-                base_path = os.path.dirname(gcs_path)
-                variant_gcs_path = f'{base_path}/{v["variant_type"]}_{unique_name}'
-                # 如果副檔名不同，替換
-                if v['ext'] != os.path.splitext(unique_name)[1]:
-                    variant_gcs_path = os.path.splitext(variant_gcs_path)[0] + v['ext']
-
-                variant_url = gcs.upload_bytes(
-                    v['data'], variant_gcs_path, v['content_type']
-                )
-
-                variant_record = MLFileVariant(
-                    file_id=ml_file.id,
-                    variant_type=v['variant_type'],
-                    gcs_path=variant_gcs_path,
-                    public_url=variant_url,
-                    width=v['width'],
-                    height=v['height'],
-                    file_size=v['file_size'],
-                )
-                db.session.add(variant_record)
-
         db.session.commit()
+        notify_workers()
 
         return jsonify(file_schema.dump(ml_file)), 201
 
@@ -272,6 +376,8 @@ def upload_file():
         db.session.rollback()
         current_app.logger.error(f'Upload failed: {e}')
         return jsonify({'error': f'Upload failed: {str(e)}'}), 500
+    finally:
+        spooled.discard()
 
 
 @media_lib_bp.route('/files/<int:file_id>', methods=['PUT'])
@@ -308,7 +414,7 @@ def update_file(file_id):
 @media_lib_bp.route('/files/<int:file_id>', methods=['DELETE'])
 @jwt_required()
 def delete_file(file_id):
-    """刪除檔案及其所有變體。"""
+    """刪除檔案；儲存中的原檔與變體只在沒有其他記錄共用時刪除。"""
     user, err = _require_media_delete()
     if err:
         return err
@@ -316,14 +422,13 @@ def delete_file(file_id):
     ml_file = MLFile.query.get_or_404(file_id)
 
     try:
-        gcs = MediaStorage.get_instance()
-
-        # 刪除 GCS 上的所有變體
-        for variant in ml_file.variants:
-            gcs.delete(variant.gcs_path)
+        storage = MediaStorage.get_instance()
 
-        # 刪除 GCS 上的原檔
-        gcs.delete(ml_file.gcs_path)
+        # 並行刪除不再被使用的變體與原檔（個別失敗只記錄，不中斷刪除）
+        paths = dedup.release_file(ml_file)
+        for result in storage.delete_many(paths):
+            if not result.ok:
+                current_app.logger.warning(f'Storage delete failed for {result.path}: {result.error}')
 
         # 刪除資料庫記錄
         db.session.delete(ml_file)
@@ -367,6 +472,539 @@ def move_files():
         return jsonify({'error': 'Move failed'}), 500
 
 
+@media_lib_bp.route('/files/<int:file_id>/status', methods=['GET'])
+@jwt_required()
+def get_file_status(file_id):
+    """查詢檔案的變體處理狀態（前端於 processing 時輪詢）。"""
+    user, err = _require_media_read()
+    if err:
+        return err
+
+    ml_file = MLFile.query.get_or_404(file_id)
+    job = ml_file.jobs.filter_by(job_type=JOB_VARIANTS).order_by(MLJob.id.desc()).first()
+
+    return jsonify({
+        'id': ml_file.id,
+        'processing_status': ml_file.processing_status,
+        'formats': file_schema.dump(ml_file)['formats'],
+        'job': job.to_dict() if job else None,
+    }), 200
+
+
+@media_lib_bp.route('/files/<int:file_id>/reprocess', methods=['POST'])
+@jwt_required()
+def reprocess_file(file_id):
+    """重新產生變體（失敗後手動重試）。"""
+    user, err = _require_editor()
+    if err:
+        return err
+
+    ml_file = MLFile.query.get_or_404(file_id)
+    if not is_image(ml_file.mime_type):
+        return jsonify({'error': 'File is not a processable image'}), 400
+
+    job = ml_file.jobs.filter(
+        MLJob.job_type == JOB_VARIANTS, MLJob.status.in_(('pending', 'running', 'failed'))
+    ).order_by(MLJob.id.desc()).first()
+    if job and job.status in ('pending', 'running'):
+        return jsonify({'error': 'File is already being processed', 'job': job.to_dict()}), 409
+
+    try:
+        if job:
+            retry_job(job)
+            ml_file.processing_status = 'processing'
+        else:
+            job = enqueue_variants(ml_file)
+        db.session.commit()
+        notify_workers()
+        return jsonify({'processing_status': ml_file.processing_status, 'job': job.to_dict()}), 202
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f'Reprocess failed: {e}')
+        return jsonify({'error': 'Reprocess failed'}), 500
+
+
+@media_lib_bp.route('/files/<int:file_id>/focal-point', methods=['PUT', 'DELETE'])
+@jwt_required()
+def set_file_focal_point(file_id):
+    """
+    設定（PUT {"x": 0~1, "y": 0~1}）或清除（DELETE，回到中心）焦點，並排入裁切圖工作。
+    共用同一原檔的記錄使用相同的裁切圖，焦點一併更新。
+    """
+    user, err = _require_editor()
+    if err:
+        return err
+
+    ml_file = MLFile.query.get_or_404(file_id)
+    if not is_image(ml_file.mime_type):
+        return jsonify({'error': 'File is not a processable image'}), 400
+
+    point = None
+    if request.method == 'PUT':
+        try:
+            point = crops.parse_focal_point(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    try:
+        crops.set_focal_point(ml_file, point)
+        # 變體工作處理中時也排入：該工作可能已讀取舊的焦點
+        job = enqueue_crops(ml_file)
+        db.session.commit()
+        notify_workers()
+        return jsonify({
+            'focal_point': crops.focal_point(ml_file),
+            'crops': (ml_file.attributes or {}).get('crops'),
+            'job': job.to_dict(),
+        }), 202
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f'Set focal point failed: {e}')
+        return jsonify({'error': 'Set focal point failed'}), 500
+
+
+@media_lib_bp.route('/files/<int:file_id>/render-url', methods=['GET'])
+@jwt_required()
+def get_render_url(file_id):
+    """取得已簽章的即時衍生圖網址（參數同 /render/<id>）。"""
+    user, err = _require_media_read()
+    if err:
+        return err
+
+    ml_file = MLFile.query.get_or_404(file_id)
+    if not is_image(ml_file.mime_type):
+        return jsonify({'error': 'File is not a processable image'}), 400
+    try:
+        params = render.parse_params(request.args)
+    except RenderParamsError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'url': render.render_url(ml_file, **params, external=True)}), 200
+
+
+# =============================================================================
+# 即時衍生圖（見 render.py）
+# =============================================================================
+
+@media_lib_bp.route('/render/<int:file_id>', methods=['GET'])
+def render_file(file_id):
+    """
+    依簽章參數產生任意尺寸 / 格式的衍生圖（公開，以簽章 s 授權）。
+    首次 request 產生並寫入磁碟快取，回應可由瀏覽器 / CDN 長期快取。
+    """
+    try:
+        params = render.parse_params(request.args)
+    except RenderParamsError as e:
+        return jsonify({'error': str(e)}), 400
+    version = request.args.get('v') or ''
+    if not render.verify(file_id, params, request.args.get('s'), version):
+        return jsonify({'error': 'Invalid signature'}), 403
+
+    ml_file = db.session.get(MLFile, file_id)
+    if ml_file is None or not is_image(ml_file.mime_type):
+        return jsonify({'error': 'Not found'}), 404
+
+    # 原檔已被覆寫（移除 metadata）：舊網址的結果不可再長期快取，轉址到目前版本
+    if version != render.source_version(ml_file):
+        response = redirect(render.render_url(ml_file, **params), code=302)
+        max_age = int(current_app.config.get('MEDIA_VARIANT_REDIRECT_MAX_AGE', VARIANT_REDIRECT_MAX_AGE))
+        response.headers['Cache-Control'] = f'public, max-age={max_age}'
+        return response
+
+    try:
+        path, content_type = render.get_rendered(ml_file, params)
+    except FileNotFoundError:
+        return jsonify({'error': 'Original not found'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RenderBusy:
+        return jsonify({'error': 'Render in progress, retry shortly'}), 503, {'Retry-After': '1'}
+
+    max_age = int(current_app.config.get('MEDIA_RENDER_CACHE_MAX_AGE', RENDER_CACHE_MAX_AGE))
+    # ETag 取自快取 key（原檔內容與版本 + 參數），多台機器的快取檔案時間不同也一致
+    response = send_file(path, mimetype=content_type, max_age=max_age, conditional=True,
+                         etag=render.cache_key(ml_file, params))
+    response.headers['Cache-Control'] = f'public, max-age={max_age}, immutable'
+    return response
+
+
+# =============================================================================
+# 可續傳分段上傳（tus 風格，見 resumable.py）
+# =============================================================================
+
+TUS_VERSION = '1.0.0'
+
+
+def _max_resumable_size(mime_type: str) -> int:
+    """
+    可續傳 / 直接上傳的大小上限。會產生變體的圖片與一般上傳相同（MEDIA_MAX_FILE_SIZE）：
+    變體工作需將原檔完整下載到記憶體。
+    """
+    if is_image(mime_type):
+        return _max_file_size()
+    return int(current_app.config.get('MEDIA_MAX_RESUMABLE_SIZE', MAX_RESUMABLE_FILE_SIZE))
+
+
+def _tus_headers(session: Optional[MLUploadSession] = None) -> dict:
+    headers = {'Tus-Resumable': TUS_VERSION, 'Cache-Control': 'no-store'}
+    if session is not None:
+        headers['Upload-Offset'] = str(session.upload_offset)
+        headers['Upload-Length'] = str(session.upload_length)
+        if session.expires_at:
+            headers['Upload-Expires'] = http_date(session.expires_at.replace(tzinfo=timezone.utc))
+    return headers
+
+
+def _parse_upload_metadata(header: str) -> Optional[dict]:
+    """解析 tus Upload-Metadata（"key base64value,key2 base64value2"）；格式錯誤回傳 None。"""
+    metadata = {}
+    for pair in (header or '').split(','):
+        pair = pair.strip()
+        if not pair:
+            continue
+        key, _, value = pair.partition(' ')
+        try:
+            metadata[key] = base64.b64decode(value, validate=True).decode('utf-8') if value else ''
+        except (binascii.Error, UnicodeDecodeError):
+            return None
+    return metadata
+
+
+def _get_upload_session(session_id: str, user, lock: bool = False):
+    """
+    取得目前使用者未逾期的上傳 session，回傳 (session, None) 或 (None, error_response)。
+    lock=True 時鎖定該列，同一 session 的 PATCH 不會並行寫入。
+    """
+    query = MLUploadSession.query.filter(
+        MLUploadSession.id == session_id,
+        MLUploadSession.created_by == user.id,
+        MLUploadSession.expires_at > datetime.now(timezone.utc),
+    )
+    if query.first() is None:
+        return None, (jsonify({'error': 'Upload not found'}), 404, _tus_headers())
+    if lock:
+        session = query.with_for_update(skip_locked=True).first()
+        if session is None:
+            return None, (jsonify({'error': 'Another request is writing to this upload'}), 409, _tus_headers())
+        return session, None
+    return query.first(), None
+
+
+@media_lib_bp.route('/uploads', methods=['POST'])
+@jwt_required()
+def create_upload():
+    """
+    建立可續傳上傳（tus creation）。
+
+    Headers:
+        Upload-Length: 檔案總大小
+        Upload-Metadata: filename <base64>,filetype <base64>[,folder_id <base64>]
+    """
+    user, err = _require_editor()
+    if err:
+        return err
+
+    length = request.headers.get('Upload-Length', type=int)
+    if length is None or length <= 0:
+        return jsonify({'error': 'Upload-Length header is required'}), 400, _tus_headers()
+
+    metadata = _parse_upload_metadata(request.headers.get('Upload-Metadata', ''))
+    if metadata is None or not metadata.get('filename'):
+        return jsonify({'error': 'Upload-Metadata must include a base64 filename'}), 400, _tus_headers()
+    filename = metadata['filename']
+    mime_type = metadata.get('filetype') or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    folder_id = int(metadata['folder_id']) if metadata.get('folder_id', '').isdigit() else None
+
+    err_resp = _validate_upload(filename, mime_type)
+    if err_resp[0] is not None:
+        return err_resp
+    max_size = _max_resumable_size(mime_type)
+    if length > max_size:
+        return jsonify({'error': f'File too large: {length} bytes (max {max_size}).'}), 413, _tus_headers()
+
+    try:
+        session = resumable.create_session(filename, mime_type, length, folder_id=folder_id, user_id=user.id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f'Create upload session failed: {e}')
+        return jsonify({'error': 'Could not create upload'}), 500, _tus_headers()
+
+    headers = _tus_headers(session)
+    headers['Location'] = url_for('media_lib.upload_status', session_id=session.id)
+    return jsonify(session.to_dict()), 201, headers
+
+
+@media_lib_bp.route('/uploads/<session_id>', methods=['GET', 'HEAD'])
+@jwt_required()
+def upload_status(session_id):
+    """查詢上傳進度（tus HEAD：Upload-Offset 為續傳起點）。"""
+    user, err = _require_editor()
+    if err:
+        return err
+
+    session, err = _get_upload_session(session_id, user)
+    if err:
+        return err
+    return jsonify(session.to_dict()), 200, _tus_headers(session)
+
+
+@media_lib_bp.route('/uploads/<session_id>', methods=['PATCH'])
+@jwt_required()
+def upload_chunk(session_id):
+    """
+    續寫一段資料（tus PATCH）。
+
+    Headers:
+        Content-Type: application/offset+octet-stream
+        Upload-Offset: 必須等於目前的 offset
+        Content-Length: 這段的長度（GCS 模式下非最後一段須為 256KiB 的倍數）
+
+    Returns:
+        204（尚未完成）或 201 + 檔案資料（最後一段，檔案已建立）
+    """
+    user, err = _require_editor()
+    if err:
+        return err
+
+    if request.mimetype != 'application/offset+octet-stream':
+        return jsonify({'error': 'Content-Type must be application/offset+octet-stream'}), 415, _tus_headers()
+    offset = request.headers.get('Upload-Offset', type=int)
+    length = request.content_length
+    if offset is None:
+        return jsonify({'error': 'Upload-Offset header is required'}), 400, _tus_headers()
+    if length is None:
+        return jsonify({'error': 'Content-Length header is required'}), 411, _tus_headers()
+
+    session, err = _get_upload_session(session_id, user, lock=True)
+    if err:
+        return err
+    if session.file_id is not None:
+        return jsonify({'error': 'Upload already completed', 'file_id': session.file_id}), 409, _tus_headers(session)
+    if offset != session.upload_offset:
+        return jsonify({'error': 'Upload-Offset does not match'}), 409, _tus_headers(session)
+    if session.is_complete:
+        # 資料已完整但先前建立檔案失敗：重送最後一個（空的）PATCH 即可完成
+        return _finish_upload(session, user)
+
+    try:
+        head = resumable.write_chunk(session, request.stream, length)
+    except UploadChunkError as e:
+        db.session.commit()  # 保存實際寫入的 offset
+        return jsonify({'error': str(e)}), 400, _tus_headers(session)
+    except Exception as e:
+        db.session.commit()
+        current_app.logger.error(f'Upload chunk failed for {session_id}: {e}')
+        return jsonify({'error': 'Upload chunk failed'}), 500, _tus_headers(session)
+
+    # 第一段：以實際內容驗證副檔名，不符者整個上傳作廢
+    if offset == 0:
+        err_resp = _validate_content(session.filename, head)
+        if err_resp[0] is not None:
+            resumable.abort_session(session)
+            db.session.commit()
+            return err_resp
+
+    db.session.commit()
+    if not session.is_complete:
+        return '', 204, _tus_headers(session)
+    return _finish_upload(session, user)
+
+
+def _finish_upload(session: MLUploadSession, user):
+    """資料已完整：移到最終路徑並建立檔案記錄（失敗時可由 client 重送 PATCH 重試）。"""
+    try:
+        public_url = resumable.complete_session(session)
+        width, height = None, None
+        local_path = resumable.local_file_path(session)
+        if local_path and is_image(session.mime_type):
+            width, height = get_image_dimensions(local_path)
+
+        ml_file = _create_file_record(
+            user, session.filename, session.unique_name, session.storage_path, public_url,
+            file_size=session.upload_length,
+            mime_type=session.mime_type,
+            folder_id=session.folder_id,
+            width=width,
+            height=height,
+        )
+        session.file_id = ml_file.id
+        db.session.commit()
+        notify_workers()
+        return jsonify(file_schema.dump(ml_file)), 201, _tus_headers(session)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f'Completing upload {session.id} failed: {e}')
+        return jsonify({'error': 'Upload failed'}), 500, _tus_headers()
+
+
+@media_lib_bp.route('/uploads/<session_id>', methods=['DELETE'])
+@jwt_required()
+def cancel_upload(session_id):
+    """取消上傳並丟棄已上傳的資料（tus termination）。"""
+    user, err = _require_editor()
+    if err:
+        return err
+
+    session, err = _get_upload_session(session_id, user, lock=True)
+    if err:
+        return err
+    if session.file_id is not None:
+        return jsonify({'error': 'Upload already completed', 'file_id': session.file_id}), 409, _tus_headers(session)
+
+    resumable.abort_session(session)
+    db.session.commit()
+    return '', 204, _tus_headers()
+
+
+# =============================================================================
+# 直接上傳到儲存（signed upload，見 signed_uploads.py）
+# =============================================================================
+
+@media_lib_bp.route('/uploads/signed', methods=['POST'])
+@jwt_required()
+def create_signed_upload():
+    """
+    發出直接上傳 URL（GCS：V4 signed URL；Local：HMAC 簽章的 PUT 端點）。
+    client 以回傳的 method / headers 上傳後，呼叫 /uploads/signed/finalize。
+
+    Body (JSON):
+        filename: 原始檔名
+        content_type: MIME type（省略時依副檔名判斷）
+        size: 檔案大小（bytes，作為上傳大小上限）
+        folder_id: 資料夾（選填）
+    """
+    user, err = _require_editor()
+    if err:
+        return err
+
+    data = request.get_json(silent=True) or {}
+    filename = (data.get('filename') or '').strip()
+    if not filename:
+        return jsonify({'error': 'filename is required'}), 400
+    size = data.get('size')
+    if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+        return jsonify({'error': 'size (bytes) is required'}), 400
+    content_type = data.get('content_type') or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    folder_id = data.get('folder_id') if isinstance(data.get('folder_id'), int) else None
+
+    err_resp = _validate_upload(filename, content_type)
+    if err_resp[0] is not None:
+        return err_resp
+    max_size = _max_resumable_size(content_type)
+    if size > max_size:
+        return jsonify({'error': f'File too large: {size} bytes (max {max_size}).'}), 413
+
+    try:
+        result = signed_uploads.issue_upload(filename, content_type, size, folder_id=folder_id, user_id=user.id)
+    except Exception as e:
+        current_app.logger.error(f'Issue signed upload failed: {e}')
+        return jsonify({'error': 'Could not create upload URL'}), 500
+    return jsonify(result), 201
+
+
+@media_lib_bp.route('/uploads/signed/<token>', methods=['PUT'])
+def signed_upload_put(token):
+    """
+    Local 模式的直接上傳端點（以 token 授權，不需登入）。
+    request body 串流寫入暫存檔後移到預定路徑；GCS 模式不使用此端點。
+    大小上限為 token 的 max（非圖片可達 MEDIA_MAX_RESUMABLE_SIZE），不受 MAX_CONTENT_LENGTH 限制。
+    """
+    storage = MediaStorage.get_instance()
+    if not storage.is_local:
+        return jsonify({'error': 'Not found'}), 404
+
+    try:
+        claims = signed_uploads.load_token(token)
+    except InvalidUploadToken as e:
+        return jsonify({'error': str(e)}), 403
+    if request.mimetype != claims['type']:
+        return jsonify({'error': f"Content-Type must be {claims['type']}"}), 400
+    if storage.exists(claims['path']):
+        return jsonify({'error': 'Already uploaded'}), 409
+
+    if request.content_length is not None and request.content_length > claims['max']:
+        return jsonify({'error': f"File too large (max {claims['max']} bytes)."}), 413
+
+    # request.stream 以 MAX_CONTENT_LENGTH（圖片上傳上限）檢查，這裡改以 token 的上限讀取 wsgi.input
+    stream = get_input_stream(request.environ, max_content_length=claims['max'])
+    try:
+        spooled = storage.spool(stream, claims['max'])
+    except FileTooLargeError as e:
+        return jsonify({'error': f'File too large (max {e.max_size} bytes).'}), 413
+    try:
+        storage.commit_staged(spooled.path, claims['path'])
+    finally:
+        spooled.discard()
+    return jsonify({'size': spooled.size}), 201
+
+
+@media_lib_bp.route('/uploads/signed/finalize', methods=['POST'])
+@jwt_required()
+def finalize_signed_upload():
+    """
+    完成直接上傳：驗證物件存在、大小與內容後建立檔案記錄並排入變體工作。
+    重複呼叫回傳同一個檔案。
+
+    Body (JSON):
+        token: create_signed_upload 回傳的 token
+    """
+    user, err = _require_editor()
+    if err:
+        return err
+
+    token = (request.get_json(silent=True) or {}).get('token')
+    if not token:
+        return jsonify({'error': 'token is required'}), 400
+    try:
+        claims = signed_uploads.load_token(token, for_finalize=True)
+    except InvalidUploadToken as e:
+        return jsonify({'error': str(e)}), 400
+    if claims['user'] != user.id:
+        return jsonify({'error': 'Insufficient permissions'}), 403
+
+    existing = MLFile.query.filter_by(gcs_path=claims['path']).first()
+    if existing:
+        return jsonify(file_schema.dump(existing)), 200
+
+    storage = MediaStorage.get_instance()
+    try:
+        info = storage.object_info(claims['path'])
+        if info is None:
+            return jsonify({'error': 'Uploaded object not found'}), 409
+        if info['size'] > claims['max']:
+            storage.delete(claims['path'])
+            return jsonify({'error': 'Uploaded object exceeds the declared size'}), 400
+
+        # 以實際內容驗證副檔名，不符者刪除物件
+        err_resp = _validate_content(claims['filename'], storage.read_head(claims['path'], SNIFF_BYTES))
+        if err_resp[0] is not None:
+            storage.delete(claims['path'])
+            return err_resp
+
+        width, height = None, None
+        local_path = storage.get_local_file_path(claims['path'])
+        if local_path and is_image(claims['type']):
+            width, height = get_image_dimensions(local_path)
+
+        ml_file = _create_file_record(
+            user, claims['filename'], claims['name'], claims['path'],
+            storage.public_url_for(claims['path']),
+            file_size=info['size'],
+            mime_type=claims['type'],
+            folder_id=claims['folder'],
+            width=width,
+            height=height,
+        )
+        db.session.commit()
+        notify_workers()
+        return jsonify(file_schema.dump(ml_file)), 201
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f'Finalize signed upload failed: {e}')
+        return jsonify({'error': 'Finalize failed'}), 500
+
+
 # =============================================================================
 # 資料夾管理
 # =============================================================================
@@ -379,19 +1017,33 @@ def list_folders():
     if err:
         return err
 
+    # 縮圖與其變體一次載入
+    query = MLFolder.query.options(selectinload(MLFolder.thumbnail).selectinload(MLFile.variants))
+
     # ?all=true 回傳所有資料夾（前端建構樹狀結構用）
     if request.args.get('all') == 'true':
-        folders = MLFolder.query.order_by(MLFolder.path).all()
-        return jsonify(folders_schema.dump(folders)), 200
+        folder_list = query.order_by(MLFolder.path).all()
+        return jsonify(folders_schema.dump(folder_list)), 200
 
     parent_id = request.args.get('parent_id', type=int)
     if parent_id:
-        folders = MLFolder.query.filter_by(parent_id=parent_id).all()
+        folder_list = query.filter_by(parent_id=parent_id).all()
     else:
         # 取得所有根資料夾
-        folders = MLFolder.query.filter_by(parent_id=None).all()
+        folder_list = query.filter_by(parent_id=None).all()
 
-    return jsonify(folders_schema.dump(folders)), 200
+    return jsonify(folders_schema.dump(folder_list)), 200
+
+
+@media_lib_bp.route('/folders/tree', methods=['GET'])
+@jwt_required()
+def folder_tree():
+    """所有資料夾（依 path 排序）與各自的檔案統計，一次查詢取得並快取。"""
+    user, err = _require_media_read()
+    if err:
+        return err
+
+    return jsonify(folders.folder_tree()), 200
 
 
 @media_lib_bp.route('/folders', methods=['POST'])
@@ -406,17 +1058,19 @@ def create_folder():
     name = data.get('name', '').strip()
     parent_id = data.get('parent_id')
 
-    if not name:
-        return jsonify({'error': 'Folder name is required'}), 400
+    try:
+        folders.validate_name(name)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     # 計算路徑
     if parent_id:
         parent = MLFolder.query.get(parent_id)
         if not parent:
             return jsonify({'error': 'Parent folder not found'}), 404
-        path = f"{parent.path.rstrip('/')}/{name}"
+        path = folders.child_path(parent.path, name)
     else:
-        path = f'/{name}'
+        path = folders.child_path(None, name)
 
     # 重名檢查
     if MLFolder.query.filter_by(name=name, parent_id=parent_id).first():
@@ -440,7 +1094,7 @@ def create_folder():
 @media_lib_bp.route('/folders/<int:folder_id>', methods=['PUT'])
 @jwt_required()
 def update_folder(folder_id):
-    """更新資料夾名稱（自動更新子資料夾路徑）。"""
+    """更新資料夾名稱 / 移動資料夾（子資料夾路徑以單一 UPDATE 一併改寫）。"""
     user, err = _require_editor()
     if err:
         return err
@@ -449,7 +1103,12 @@ def update_folder(folder_id):
     data = request.get_json()
     name = data.get('name', folder.name).strip()
 
-    if not name:
+    if name != folder.name:
+        try:
+            folders.validate_name(name)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    elif not name:
         return jsonify({'error': 'Folder name is required'}), 400
 
     # 更新 description 和 thumbnail_id（若有傳入）
@@ -459,7 +1118,7 @@ def update_folder(folder_id):
         folder.thumbnail_id = data['thumbnail_id']
 
     # 更新 parent_id（移動資料夾）
-    new_parent_id = folder.parent_id
+    parent = folder.parent
     if 'parent_id' in data:
         target_parent_id = data['parent_id']
         # 不能把自己移到自己底下
@@ -467,20 +1126,15 @@ def update_folder(folder_id):
             return jsonify({'error': 'Cannot move folder into itself'}), 400
         # 驗證目標父資料夾存在
         if target_parent_id is not None:
-            target_parent = MLFolder.query.get(target_parent_id)
-            if not target_parent:
+            parent = MLFolder.query.get(target_parent_id)
+            if not parent:
                 return jsonify({'error': 'Target parent folder not found'}), 404
-            # 不能移到自己的子孫底下（會形成循環）
-            def is_descendant(ancestor_id, folder_to_check):
-                for child in folder_to_check.subfolders:
-                    if child.id == ancestor_id:
-                        return True
-                    if is_descendant(ancestor_id, child):
-                        return True
-                return False
-            if is_descendant(target_parent_id, folder):
+            # 不能移到自己的子孫底下（會形成循環）：依 path 前綴判斷
+            if folders.is_within(folder, parent):
                 return jsonify({'error': 'Cannot move folder into its own subfolder'}), 400
-        new_parent_id = target_parent_id
+        else:
+            parent = None
+    new_parent_id = parent.id if parent is not None else None
 
     # 重名檢查（在目標父資料夾下）
     existing = MLFolder.query.filter(
@@ -492,21 +1146,7 @@ def update_folder(folder_id):
         return jsonify({'error': 'A folder with this name already exists'}), 409
 
     try:
-        folder.name = name
-        folder.parent_id = new_parent_id
-        if folder.parent_id is not None:
-            parent = MLFolder.query.get(folder.parent_id)
-            folder.path = f"{parent.path.rstrip('/')}/{name}"
-        else:
-            folder.path = f'/{name}'
-
-        # 遞迴更新子資料夾路徑
-        def update_children(parent_folder):
-            for child in parent_folder.subfolders:
-                child.path = f"{parent_folder.path.rstrip('/')}/{child.name}"
-                update_children(child)
-        update_children(folder)
-
+        folders.relocate(folder, name, parent)
         db.session.commit()
         return jsonify(folder_schema.dump(folder)), 200
     except Exception as e:
@@ -524,9 +1164,10 @@ def delete_folder(folder_id):
 
     folder = MLFolder.query.get_or_404(folder_id)
 
-    if folder.files.count() > 0:
+    # EXISTS：找到第一筆即停止，不需計算總數
+    if db.session.query(MLFile.query.filter_by(folder_id=folder_id).exists()).scalar():
         return jsonify({'error': 'Folder contains files'}), 409
-    if folder.subfolders.count() > 0:
+    if db.session.query(MLFolder.query.filter_by(parent_id=folder_id).exists()).scalar():
         return jsonify({'error': 'Folder contains subfolders'}), 409
 
     try:
@@ -611,45 +1252,58 @@ def delete_tag(tag_id):
 @jwt_required()
 def scan_gcs():
     """
-    掃描 GCS Bucket，列出尚未匯入資料庫的檔案。
-    回傳未匯入的檔案清單（不做任何寫入）。
+    掃描 GCS Bucket，列出尚未匯入資料庫的檔案（不寫入檔案記錄）。
     僅 GCS 模式可用。
+
+    Query:
+        prefix   掃描的前綴（預設 media/）
+        format   ndjson：以 NDJSON 串流回傳（或 Accept: application/x-ndjson）
+        full     1：比對全部物件（預設只比對上一次完整掃描之後更新的物件）
+        restart  1：捨棄進行中掃描的 cursor，從頭開始
+
+    NDJSON 每行一個事件（見 gcs_import.scan_bucket）：start / file / progress / done。
+    done.complete 為 false 時表示已達單一 request 的掃描時間上限，再次呼叫即由檢查點續掃。
+    未指定 NDJSON 時維持原本的回應 {total_found, files}（不使用檢查點的完整掃描）。
     """
     user, err = _require_media_read()
     if err:
         return err
 
-    try:
-        gcs = MediaStorage.get_instance()
-        if gcs.is_local:
-            return jsonify({'error': 'GCS scan is not available in local storage mode'}), 400
-        prefix = request.args.get('prefix', 'media/')
-
-        # 列出 GCS 上的所有檔案
-        blobs = gcs.bucket.list_blobs(prefix=prefix)
-
-        # 取得資料庫中已有的 gcs_path
-        existing_paths = set(
-            row[0] for row in db.session.query(MLFile.gcs_path).all()
+    gcs = MediaStorage.get_instance()
+    if gcs.is_local:
+        return jsonify({'error': 'GCS scan is not available in local storage mode'}), 400
+    prefix = request.args.get('prefix', 'media/')
+
+    if request.args.get('format') == 'ndjson' or 'application/x-ndjson' in request.headers.get('Accept', ''):
+        max_seconds = float(current_app.config.get('MEDIA_IMPORT_SCAN_MAX_SECONDS', IMPORT_SCAN_MAX_SECONDS))
+        events = gcs_import.scan_bucket(
+            prefix,
+            incremental=request.args.get('full') not in ('1', 'true'),
+            restart=request.args.get('restart') in ('1', 'true'),
+            max_seconds=max_seconds,
         )
 
-        new_files = []
-        for blob in blobs:
-            # 跳過目錄標記和 0 byte 檔案
-            if blob.name.endswith('/') or blob.size == 0:
-                continue
-
-            if blob.name not in existing_paths:
-                mime = blob.content_type or mimetypes.guess_type(blob.name)[0] or 'application/octet-stream'
-                new_files.append({
-                    'gcs_path': blob.name,
-                    'public_url': f'{gcs.public_url_prefix}/{blob.name}',
-                    'filename': os.path.basename(blob.name),
-                    'file_size': blob.size,
-                    'mime_type': mime,
-                    'updated': blob.updated.isoformat() if blob.updated else None,
-                })
+        def _stream():
+            try:
+                for event in events:
+                    yield json.dumps(event, ensure_ascii=False) + '\n'
+            except Exception as e:
+                # 已送出的事件仍有效，檢查點保留最後 commit 的 cursor
+                db.session.rollback()
+                current_app.logger.error(f'GCS scan failed: {e}')
+                yield json.dumps({'type': 'error', 'error': f'Scan failed: {str(e)}'}) + '\n'
+
+        response = Response(stream_with_context(_stream()), mimetype='application/x-ndjson')
+        response.headers['Cache-Control'] = 'no-store'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
 
+    try:
+        new_files = [
+            {k: v for k, v in event.items() if k != 'type'}
+            for event in gcs_import.scan_bucket(prefix, incremental=False, persist=False)
+            if event['type'] == 'file'
+        ]
         return jsonify({
             'total_found': len(new_files),
             'files': new_files,
@@ -664,8 +1318,8 @@ def scan_gcs():
 @jwt_required()
 def import_from_gcs():
     """
-    將指定的 GCS 檔案匯入到媒體庫資料庫。
-    不搬移/複製 GCS 上的檔案，只建立資料庫記錄。
+    將指定的 GCS 檔案匯入到媒體庫資料庫（背景工作，見 bulk_import.py）。
+    不搬移/複製 GCS 上的檔案，只建立資料庫記錄（與選擇性產生的變體）。
 
     Body:
     {
@@ -673,8 +1327,10 @@ def import_from_gcs():
             {"gcs_path": "media/2026/01/photo.jpg", "public_url": "https://...", ...}
         ],
         "folder_id": null,          // 可選：放入指定資料夾
-        "generate_variants": false   // 可選：是否下載圖片並產生縮圖（較慢）
+        "generate_variants": false   // 可選：是否產生縮圖
     }
+
+    回傳 202 與工作狀態（Location: /import/jobs/<id>），以該端點查詢進度與結果。
     """
     user, err = _require_editor()
     if err:
@@ -684,101 +1340,46 @@ def import_from_gcs():
     if storage.is_local:
         return jsonify({'error': 'GCS import is not available in local storage mode'}), 400
 
-    data = request.get_json()
-    files_to_import = data.get('files', [])
+    data = request.get_json() or {}
     folder_id = data.get('folder_id')
-    gen_variants = data.get('generate_variants', False)
+    try:
+        entries = bulk_import.normalize_entries(data.get('files') or [], storage)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
 
-    if not files_to_import:
+    if not entries:
         return jsonify({'error': 'No files specified'}), 400
-
-    imported = 0
-    skipped = 0
-    errors = []
-
-    for f in files_to_import:
-        gcs_path = f.get('gcs_path', '')
-        if not gcs_path:
-            continue
-
-        # 檢查是否已存在
-        if MLFile.query.filter_by(gcs_path=gcs_path).first():
-            skipped += 1
-            continue
-
-        try:
-            gcs = MediaStorage.get_instance()
-            filename = os.path.basename(gcs_path)
-            public_url = f.get('public_url', f'{gcs.public_url_prefix}/{gcs_path}')
-            mime_type = f.get('mime_type', mimetypes.guess_type(filename)[0] or 'application/octet-stream')
-            file_size = f.get('file_size', 0)
-
-            ml_file = MLFile(
-                filename=filename,
-                original_filename=filename,
-                gcs_path=gcs_path,
-                public_url=public_url,
-                file_size=file_size,
-                mime_type=mime_type,
-                folder_id=folder_id,
-                uploaded_by=user.id,
-            )
-            db.session.add(ml_file)
-            db.session.flush()
-
-            # 自動建立 metadata 記錄
-            metadata = MLFileMetadata(file_id=ml_file.id)
-            db.session.add(metadata)
-
-            # 如果要求產生縮圖且為圖片類型
-            if gen_variants and is_image(mime_type):
-                try:
-                    blob = gcs.bucket.blob(gcs_path)
-                    file_data = blob.download_as_bytes()
-
-                    width, height = get_image_dimensions(file_data)
-                    ml_file.width = width
-                    ml_file.height = height
-
-                    variants = generate_variants(file_data, mime_type)
-                    for v in variants:
-                        base_path = os.path.dirname(gcs_path)
-                        variant_gcs_path = f'{base_path}/{v["variant_type"]}_{filename}'
-                        if v['ext'] != os.path.splitext(filename)[1]:
-                            variant_gcs_path = os.path.splitext(variant_gcs_path)[0] + v['ext']
-
-                        variant_url = gcs.upload_bytes(
-                            v['data'], variant_gcs_path, v['content_type']
-                        )
-
-                        variant_record = MLFileVariant(
-                            file_id=ml_file.id,
-                            variant_type=v['variant_type'],
-                            gcs_path=variant_gcs_path,
-                            public_url=variant_url,
-                            width=v['width'],
-                            height=v['height'],
-                            file_size=v['file_size'],
-                        )
-                        db.session.add(variant_record)
-                except Exception as ve:
-                    current_app.logger.warning(f'Variant generation failed for {gcs_path}: {ve}')
-
-            imported += 1
-        except Exception as e:
-            errors.append({'gcs_path': gcs_path, 'error': str(e)})
+    if folder_id is not None and db.session.get(MLFolder, folder_id) is None:
+        return jsonify({'error': 'Folder not found'}), 404
 
     try:
+        job = bulk_import.enqueue_import(entries, folder_id, data.get('generate_variants', False), user.id)
         db.session.commit()
+        notify_workers()
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Database commit failed: {str(e)}'}), 500
 
-    return jsonify({
-        'imported': imported,
-        'skipped': skipped,
-        'errors': errors,
-    }), 200
+    response = jsonify({'job': job.to_dict()})
+    response.headers['Location'] = url_for('media_lib.import_job_status', job_id=job.id)
+    return response, 202
+
+
+@media_lib_bp.route('/import/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def import_job_status(job_id):
+    """
+    批次匯入工作的狀態（pending / running / done / failed）與進度：
+    progress = {total, next_index, imported, skipped, variants_done, failed, errors: [{gcs_path, error}]}
+    """
+    user, err = _require_media_read()
+    if err:
+        return err
+
+    job = db.session.get(MLJob, job_id)
+    if job is None or job.job_type != bulk_import.JOB_IMPORT:
+        return jsonify({'error': 'Import job not found'}), 404
+    return jsonify({'job': job.to_dict()}), 200
 
 
 # =============================================================================
@@ -828,68 +1429,64 @@ def update_metadata(file_id):
 
 @media_lib_bp.route('/public/lookup', methods=['GET'])
 def public_lookup():
-    """透過命盤ID 查詢圖片（公開端點）。"""
+    """透過命盤ID 查詢圖片（公開端點，短暫快取，支援 ETag）。"""
     chart_id = request.args.get('chart_id', '').strip()
     if not chart_id:
         return jsonify({'error': 'chart_id is required'}), 400
 
-    meta = MLFileMetadata.query.filter_by(chart_id=chart_id).first()
-    if not meta:
-        return jsonify({'error': 'Not found'}), 404
-
-    ml_file = MLFile.query.get(meta.file_id)
-    if not ml_file:
-        return jsonify({'error': 'File not found'}), 404
+    def _build():
+        result = public_queries.lookup_chart(chart_id)
+        if result is None:
+            return {'error': 'Not found'}, 404
+        return result, 200
 
-    result = file_schema.dump(ml_file)
-    return jsonify(result), 200
+    return public_queries.cached_response('lookup', {'chart_id': chart_id}, _build)
 
 
 @media_lib_bp.route('/public/search', methods=['GET'])
 def public_search():
     """
-    公開搜尋 API，支援 metadata 欄位篩選。
-    參數: status, location, source, license, rating, page, per_page
+    公開搜尋 API，支援 metadata 欄位篩選（短暫快取，支援 ETag）。
+    參數: status, location, source, license, rating, chart_id, page, per_page
     """
-    page = request.args.get('page', 1, type=int)
-    per_page = min(request.args.get('per_page', 20, type=int), 100)
-
-    query = MLFile.query.join(MLFileMetadata)
-
-    status = request.args.get('status')
-    if status:
-        query = query.filter(MLFileMetadata.status == status)
-
-    location = request.args.get('location')
-    if location:
-        query = query.filter(MLFileMetadata.location.ilike(f'%{location}%'))
-
-    source = request.args.get('source')
-    if source:
-        query = query.filter(MLFileMetadata.source.ilike(f'%{source}%'))
-
-    license_val = request.args.get('license')
-    if license_val:
-        query = query.filter(MLFileMetadata.license.ilike(f'%{license_val}%'))
-
-    rating = request.args.get('rating', type=int)
-    if rating:
-        query = query.filter(MLFileMetadata.rating >= rating)
+    filters, page, per_page = public_queries.parse_search_args(request.args)
+    params = {'filters': filters, 'page': page, 'per_page': per_page}
+    return public_queries.cached_response(
+        'search', params, lambda: (public_queries.search_files(filters, page, per_page), 200)
+    )
 
-    chart_id = request.args.get('chart_id')
-    if chart_id:
-        query = query.filter(MLFileMetadata.chart_id.ilike(f'%{chart_id}%'))
 
-    pagination = query.order_by(MLFile.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+@media_lib_bp.route('/public/files/<int:file_id>/<variant_type>', methods=['GET'])
+def public_variant(file_id, variant_type):
+    """
+    轉址到 client 支援的最小變體格式（公開端點，回應帶 Vary: Accept）。
+    原圖格式一律可用；WebP / AVIF 需在 Accept 中明確列出（舊版瀏覽器的 image/* 不算）。
+    variant_type 為 original 時轉址到原檔，動畫圖片則在原檔與原尺寸的動畫 WebP 中選擇。
+    """
+    ml_file = db.session.get(MLFile, file_id)
+    if ml_file is None:
+        return jsonify({'error': 'Not found'}), 404
 
-    return jsonify({
-        'files': files_schema.dump(pagination.items),
-        'pagination': {
-            'page': pagination.page,
-            'pages': pagination.pages,
-            'per_page': pagination.per_page,
-            'total': pagination.total,
-        }
-    }), 200
+    group = ml_file.grouped_variants().get(variant_type)
+    if variant_type == ANIMATED_ORIGINAL:
+        # 原尺寸的變體只有其他格式，原檔本身即原圖格式
+        candidates = [(ml_file.public_url, ml_file.file_size)]
+        alternates = [group[0]] + group[1] if group else []
+    elif group is not None:
+        primary, alternates = group
+        candidates = [(primary.public_url, primary.file_size)]
+    else:
+        return jsonify({'error': 'Variant not found'}), 404
+
+    accepted = {mime for mime, quality in request.accept_mimetypes if quality > 0}
+    candidates += [
+        (v.public_url, v.file_size) for v in alternates
+        if v.format in OUTPUT_FORMATS and OUTPUT_FORMATS[v.format][2] in accepted
+    ]
+    url, _ = min(candidates, key=lambda c: c[1] if c[1] is not None else float('inf'))
+
+    response = redirect(url, code=302)
+    response.headers['Vary'] = 'Accept'
+    max_age = int(current_app.config.get('MEDIA_VARIANT_REDIRECT_MAX_AGE', VARIANT_REDIRECT_MAX_AGE))
+    response.headers['Cache-Control'] = f'public, max-age={max_age}'
+    return response
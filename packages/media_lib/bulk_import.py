@@ -0,0 +1,284 @@
+"""
+Media Library - 批次匯入工作（POST /import/execute）
+
+原本在單一 request 內逐一處理選取的物件（每個檔案一次存在查詢、最後一次 commit），
+大量匯入時 request 逾時、失敗時全部重來。這裡改為背景工作（job_type = import）：
+
+- 檔案清單存於 jobs.payload，每 IMPORT_CHUNK_SIZE 筆以一次 IN 查詢排除已存在的路徑，
+  建立記錄後與進度一起 commit；工作重試時由 progress.next_index 接續，不會重複建立。
+- 要求產生變體時，各批的圖片經過 下載 → 最佳化原檔 / 編碼 → 上傳 三個階段，各階段以
+  獨立的執行緒池處理，同時在途的檔案數以 IMPORT_MAX_IN_FLIGHT 為上限（限制記憶體用量），
+  不同檔案的下載、編碼、上傳重疊進行。DB 操作只在工作執行緒內進行。
+  設定 MEDIA_ENCODER_WORKERS 時編碼在子行程中執行（見 encoder.py）。
+- 每次 commit 進度時一併續約（jobs.touch_job），執行超過 JOB_STALE_AFTER 也不會被其他 worker
+  重新領取；續約失敗（工作已被重新領取）時捨棄未 commit 的批次並停止，避免同一批重複建立記錄。
+- 進度與個別檔案的錯誤記錄在 jobs.progress，以 GET /import/jobs/<id> 查詢。
+  單一檔案失敗（原檔不存在、無法解碼）不影響其他檔案，該檔案標記為 failed。
+"""
+
+import mimetypes
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Optional
+
+from flask import current_app
+
+from core.backend_engine.factory import db
+from packages.media_lib.config import (
+    IMPORT_CHUNK_SIZE,
+    IMPORT_DOWNLOAD_CONCURRENCY,
+    IMPORT_ENCODE_CONCURRENCY,
+    IMPORT_MAX_IN_FLIGHT,
+    IMPORT_MAX_REPORTED_ERRORS,
+    IMPORT_UPLOAD_CONCURRENCY,
+)
+from packages.media_lib.crops import focal_point
+from packages.media_lib.image_processor import is_image
+from packages.media_lib.jobs import JobLeaseLost, PermanentJobError, enqueue_job, job_handler, touch_job
+from packages.media_lib.models import MLFile, MLFileMetadata, MLJob
+from packages.media_lib.storage import MediaStorage
+from packages.media_lib.tasks import (
+    check_source_size,
+    delete_unused_variants,
+    prepare_original,
+    render_outputs,
+    replace_variants,
+    upload_variants,
+    variant_attributes,
+    variant_paths,
+)
+
+
+JOB_IMPORT = 'import'
+
+
+def normalize_entries(files: list, storage: MediaStorage) -> List[dict]:
+    """
+    整理 API 傳入的檔案清單（去除重複與空路徑，補上 public url / MIME type）。
+
+    Raises:
+        ValueError
+    """
+    entries, seen = [], set()
+    for f in files:
+        if not isinstance(f, dict):
+            raise ValueError('Each file must be an object')
+        gcs_path = f.get('gcs_path') or ''
+        if not isinstance(gcs_path, str) or not gcs_path or gcs_path in seen:
+            continue
+        if len(gcs_path) > 500:
+            raise ValueError(f'gcs_path too long: {gcs_path[:50]}...')
+        seen.add(gcs_path)
+        filename = os.path.basename(gcs_path)
+        entries.append({
+            'gcs_path': gcs_path,
+            'public_url': f.get('public_url') or f'{storage.public_url_prefix}/{gcs_path}',
+            'mime_type': f.get('mime_type') or mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+            'file_size': int(f.get('file_size') or 0),
+        })
+    return entries
+
+
+def enqueue_import(entries: List[dict], folder_id: Optional[int], generate_variants: bool,
+                   user_id: int) -> MLJob:
+    """排入批次匯入工作（不 commit）。"""
+    job = enqueue_job(JOB_IMPORT, payload={
+        'files': entries,
+        'folder_id': folder_id,
+        'generate_variants': bool(generate_variants),
+        'uploaded_by': user_id,
+    })
+    job.progress = {
+        'total': len(entries),
+        'next_index': 0,
+        'imported': 0,
+        'skipped': 0,
+        'variants_done': 0,
+        'failed': 0,
+        'errors': [],
+        'pending': [],
+    }
+    return job
+
+
+def _record_error(progress: dict, gcs_path: str, error) -> None:
+    progress['failed'] += 1
+    if len(progress['errors']) < IMPORT_MAX_REPORTED_ERRORS:
+        progress['errors'].append({'gcs_path': gcs_path, 'error': str(error)[:500]})
+
+
+def _create_records(chunk: List[dict], payload: dict, progress: dict) -> List[int]:
+    """
+    建立一批檔案記錄（不 commit），已存在的路徑以一次 IN 查詢排除。
+
+    Returns:
+        需要產生變體的檔案 id
+    """
+    existing = {
+        path for (path,) in db.session.query(MLFile.gcs_path).filter(
+            MLFile.gcs_path.in_([entry['gcs_path'] for entry in chunk])
+        )
+    }
+    created = []
+    for entry in chunk:
+        if entry['gcs_path'] in existing:
+            progress['skipped'] += 1
+            continue
+        filename = os.path.basename(entry['gcs_path'])
+        ml_file = MLFile(
+            filename=filename,
+            original_filename=filename,
+            gcs_path=entry['gcs_path'],
+            public_url=entry['public_url'],
+            file_size=entry['file_size'],
+            mime_type=entry['mime_type'],
+            folder_id=payload.get('folder_id'),
+            uploaded_by=payload.get('uploaded_by'),
+        )
+        if payload.get('generate_variants') and is_image(ml_file.mime_type):
+            ml_file.processing_status = 'processing'
+        db.session.add(ml_file)
+        created.append(ml_file)
+    db.session.flush()  # 取得 id
+
+    for ml_file in created:
+        # 自動建立 metadata 記錄
+        db.session.add(MLFileMetadata(file_id=ml_file.id))
+    progress['imported'] += len(created)
+    return [ml_file.id for ml_file in created if ml_file.processing_status == 'processing']
+
+
+# =============================================================================
+# 變體 pipeline
+# =============================================================================
+
+class _VariantPipeline:
+    """
+    下載、編碼、上傳各用一個執行緒池，依完成順序推進每個檔案；
+    在途檔案數（各階段合計）不超過 max_in_flight。
+    """
+
+    def __init__(self, app, storage: MediaStorage):
+        self.app = app
+        self.storage = storage
+        self.max_in_flight = int(app.config.get('MEDIA_IMPORT_MAX_IN_FLIGHT', IMPORT_MAX_IN_FLIGHT))
+        self.downloads = ThreadPoolExecutor(IMPORT_DOWNLOAD_CONCURRENCY, thread_name_prefix='media-import-download')
+        self.encodes = ThreadPoolExecutor(IMPORT_ENCODE_CONCURRENCY, thread_name_prefix='media-import-encode')
+        self.uploads = ThreadPoolExecutor(IMPORT_UPLOAD_CONCURRENCY, thread_name_prefix='media-import-upload')
+
+    def shutdown(self) -> None:
+        for pool in (self.downloads, self.encodes, self.uploads):
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _submit(self, pool: ThreadPoolExecutor, func, *args):
+        def _call():
+            with self.app.app_context():
+                return func(*args)
+        return pool.submit(_call)
+
+    def run(self, file_ids: List[int], progress: dict) -> set:
+        """
+        產生並上傳一批檔案的變體，結果寫入 session（不 commit）。
+
+        Returns:
+            被取代的舊變體路徑（commit 後以 delete_unused_variants 刪除）
+        """
+        queue = deque()
+        for ml_file in MLFile.query.filter(MLFile.id.in_(file_ids)):
+            try:
+                check_source_size(ml_file)
+            except PermanentJobError as e:
+                ml_file.processing_status = 'failed'
+                _record_error(progress, ml_file.gcs_path, e)
+                continue
+            queue.append(ml_file)
+        pending = {}
+        stale = set()
+
+        while queue or pending:
+            while queue and len(pending) < self.max_in_flight:
+                ml_file = queue.popleft()
+                future = self._submit(self.downloads, self.storage.download_bytes, ml_file.gcs_path)
+                pending[future] = ('download', ml_file, None)
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, ml_file, extra = pending.pop(future)
+                try:
+                    result = future.result()
+                    if stage == 'download':
+                        # 尺寸 / 雜湊 / 原檔最佳化需要 DB，在工作執行緒內處理
+                        file_data = prepare_original(ml_file, result, self.storage)
+                        future = self._submit(
+                            self.encodes, render_outputs, file_data, ml_file.mime_type,
+                            focal_point(ml_file), (ml_file.width, ml_file.height),
+                        )
+                        pending[future] = ('encode', ml_file, None)
+                    elif stage == 'encode':
+                        outputs, placeholder = result
+                        future = self._submit(
+                            self.uploads, upload_variants, self.storage, outputs, variant_paths(ml_file, outputs)
+                        )
+                        pending[future] = ('upload', ml_file, placeholder)
+                    else:
+                        with db.session.begin_nested():
+                            stale |= replace_variants(
+                                ml_file, result, variant_attributes(ml_file, result, extra), commit=False
+                            )
+                        progress['variants_done'] += 1
+                except Exception as e:
+                    if isinstance(e, FileNotFoundError):
+                        e = f'Original not found: {e}'
+                    current_app.logger.warning(f'Import: variants of {ml_file.gcs_path} failed: {e}')
+                    ml_file.processing_status = 'failed'
+                    _record_error(progress, ml_file.gcs_path, e)
+        return stale
+
+
+@job_handler(JOB_IMPORT)
+def process_import(job: MLJob) -> None:
+    """建立檔案記錄並產生變體（每批 commit，重試時由進度接續）。"""
+    storage = MediaStorage.get_instance()
+    if storage.is_local:
+        raise PermanentJobError('GCS import is not available in local storage mode')
+
+    job_id = job.id
+    worker_id = job.locked_by
+    payload = job.payload or {}
+    entries = payload.get('files') or []
+    progress = dict(job.progress or {})
+    chunk_size = int(current_app.config.get('MEDIA_IMPORT_CHUNK_SIZE', IMPORT_CHUNK_SIZE))
+
+    def _save():
+        # 續約與進度在同一個 transaction：工作列在 commit 前保持鎖定，其他 worker 無法在中間領取
+        if not touch_job(job_id, worker_id, commit=False):
+            raise JobLeaseLost(f'Import job {job_id} is no longer held by {worker_id}')
+        # JSONB 欄位需指定新的 dict 才會寫回
+        db.session.get(MLJob, job_id).progress = {**progress, 'errors': list(progress['errors'])}
+        db.session.commit()
+
+    pipeline = None
+    if payload.get('generate_variants'):
+        pipeline = _VariantPipeline(current_app._get_current_object(), storage)
+    try:
+        while True:
+            if progress['pending'] and pipeline is not None:
+                stale = pipeline.run(progress['pending'], progress)
+                progress['pending'] = []
+                _save()
+                delete_unused_variants(stale)
+
+            start = progress['next_index']
+            if start >= len(entries):
+                break
+            chunk = entries[start:start + chunk_size]
+            progress['pending'] = _create_records(chunk, payload, progress)
+            progress['next_index'] = start + len(chunk)
+            _save()
+    finally:
+        if pipeline is not None:
+            pipeline.shutdown()
+
+
+__all__ = ['JOB_IMPORT', 'normalize_entries', 'enqueue_import', 'process_import']
@@ -0,0 +1,118 @@
+"""
+Media Library - CLI 指令
+
+    flask media-lib worker            持續處理背景工作（Ctrl+C 結束）
+    flask media-lib worker --once     處理目前所有可執行的工作後結束
+    flask media-lib worker --threads 4   （預設 MEDIA_JOBS_WORKER_THREADS；
+                                        搭配 MEDIA_ENCODER_WORKERS 以多核心編碼）
+    flask media-lib gc-uploads        清除逾期的可續傳上傳 session 與暫存檔（建議 cron 每小時執行）
+    flask media-lib backfill-hashes   為既有檔案分批補上內容雜湊（去重用，可中斷後重跑）
+    flask media-lib optimize-originals --workers 4   以多個子行程最佳化既有原檔（可中斷後重跑）
+"""
+
+import os
+import signal
+import threading
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+
+media_lib_cli = AppGroup('media-lib', help='Media library maintenance commands.')
+
+
+@media_lib_cli.command('worker')
+@click.option('--once', is_flag=True, help='Process all runnable jobs, then exit.')
+@click.option('--threads', type=int, default=None,
+              help='Number of worker threads (default: MEDIA_JOBS_WORKER_THREADS).')
+@click.option('--job-type', 'job_types', multiple=True, help='Only process these job types.')
+def worker_command(once, threads, job_types):
+    """Run the media background job worker."""
+    # 註冊工作處理函式
+    import packages.media_lib.tasks  # noqa: F401
+    import packages.media_lib.bulk_import  # noqa: F401
+    from packages.media_lib.jobs import MediaJobWorker
+
+    app = current_app._get_current_object()
+
+    if once:
+        worker = MediaJobWorker(app, job_types=job_types)
+        processed = 0
+        while worker.run_once():
+            processed += 1
+        click.echo(f'Processed {processed} job(s).')
+        return
+
+    threads = threads or int(app.config.get('MEDIA_JOBS_WORKER_THREADS', 1))
+    workers = [MediaJobWorker(app, job_types=job_types) for _ in range(max(1, threads))]
+
+    def _shutdown(signum, frame):
+        click.echo('Stopping media job worker...')
+        for w in workers:
+            w.stop()
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+
+    pool = [threading.Thread(target=w.run_forever, name=f'media-lib-jobs-{i}') for i, w in enumerate(workers)]
+    for t in pool:
+        t.start()
+    click.echo(f'Media job worker running with {len(pool)} thread(s).')
+    for t in pool:
+        t.join()
+
+
+@media_lib_cli.command('gc-uploads')
+@click.option('--dry-run', is_flag=True, help='Only report what would be removed.')
+def gc_uploads_command(dry_run):
+    """Remove expired resumable upload sessions and stale temp files."""
+    from packages.media_lib.resumable import gc_expired_sessions
+
+    result = gc_expired_sessions(dry_run=dry_run)
+    prefix = 'Would remove' if dry_run else 'Removed'
+    click.echo(f"{prefix} {result['sessions']} upload session(s) and {result['files']} temp file(s).")
+
+
+@media_lib_cli.command('backfill-hashes')
+@click.option('--batch-size', type=int, default=100, show_default=True, help='Files per commit.')
+@click.option('--limit', type=int, default=None, help='Stop after this many files.')
+@click.option('--dry-run', is_flag=True, help='Compute hashes without saving them.')
+def backfill_hashes_command(batch_size, limit, dry_run):
+    """Compute content hashes for files uploaded before deduplication."""
+    from packages.media_lib.dedup import backfill_hashes
+
+    stats = {'hashed': 0, 'duplicates': 0, 'missing': 0}
+    for stats in backfill_hashes(batch_size=max(1, batch_size), limit=limit, dry_run=dry_run):
+        click.echo(
+            f"Hashed {stats['hashed']} file(s) (up to id {stats['last_id']}), "
+            f"{stats['duplicates']} duplicate(s), {stats['missing']} missing."
+        )
+    click.echo(f"Done: {stats['hashed']} hashed, {stats['duplicates']} duplicate(s), {stats['missing']} missing.")
+
+
+@media_lib_cli.command('optimize-originals')
+@click.option('--workers', type=int, default=None, help='Encoder processes (default: CPU count).')
+@click.option('--batch-size', type=int, default=50, show_default=True, help='Files per commit.')
+@click.option('--limit', type=int, default=None, help='Stop after scanning this many files.')
+@click.option('--dry-run', is_flag=True, help='Report savings without rewriting originals.')
+def optimize_originals_command(workers, batch_size, limit, dry_run):
+    """Losslessly strip metadata from existing JPEG / PNG originals."""
+    from packages.media_lib.optimize import backfill_optimization
+
+    workers = max(1, workers or os.cpu_count() or 1)
+    stats = {'processed': 0, 'optimized': 0, 'saved_bytes': 0, 'reoriented': 0, 'failed': 0}
+    for stats in backfill_optimization(workers, batch_size=max(1, batch_size), limit=limit, dry_run=dry_run):
+        click.echo(
+            f"Processed {stats['processed']} file(s) (up to id {stats['last_id']}), "
+            f"{stats['optimized']} rewritten, {stats['saved_bytes']} bytes saved."
+        )
+    prefix = 'Would save' if dry_run else 'Saved'
+    click.echo(
+        f"Done: {stats['processed']} processed, {stats['optimized']} rewritten, "
+        f"{stats['reoriented']} with EXIF orientation (variants re-queued), {stats['failed']} missing. "
+        f"{prefix} {stats['saved_bytes']} bytes."
+    )
+
+
+__all__ = ['media_lib_cli']
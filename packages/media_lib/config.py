@@ -16,6 +16,84 @@ IMAGE_VARIANTS = {
     'hero':      {'max_width': 1920, 'max_height': 1080, 'quality': 90},
 }
 
+# 變體除了原圖格式外另外產生的格式（GET /public/files/<id>/<variant> 依 Accept 選最小者）。
+# quality 為 None 時沿用 IMAGE_VARIANTS 的設定；avif 需 Pillow 支援（11.2+ 內建或
+# pillow-avif-plugin），不支援時略過。動畫圖片只產生 ANIMATED_FORMATS。
+VARIANT_EXTRA_FORMATS = {
+    'webp': {'quality': None},
+    'avif': {'quality': 60},
+}
+# 動畫圖片（GIF / 動畫 WebP）：每一格都縮小，變體保留動畫（原圖格式 + ANIMATED_FORMATS）；
+# 另將原尺寸轉為動畫 WebP（variant_type 為 original，通常比 GIF 小 5~10 倍，
+# GET /public/files/<id>/original 依 Accept 選用）。影格數 × 寬 × 高 超過
+# ANIMATION_MAX_PIXELS 時只取第一格（所有影格需同時留在記憶體中編碼）。
+ANIMATED_FORMATS = ('webp',)
+ANIMATED_ORIGINAL = 'original'
+ANIMATED_ORIGINAL_QUALITY = 80
+ANIMATION_MAX_PIXELS = 40_000_000
+
+# 變體工作順便計算的前端輔助資訊（存於 files.attributes）：
+#   lqip            極小的模糊預覽圖（data URI），以縮圖變體產生
+#   dominant_color  主色（#rrggbb），圖片載入前的底色
+#   srcset / sizes  各格式的 srcset 字串與預設 sizes
+LQIP_MAX_SIZE = 16
+LQIP_QUALITY = 40
+DOMINANT_COLOR_SAMPLE = 32   # 取主色前先縮到此尺寸再量化
+
+# 依焦點裁切的固定比例衍生圖（art direction）：Content.featured_image 與首頁輪播為 16:9，
+# Content.cover_image 為 1:1。裁切框取原圖內最大的該比例區域，位置以
+# files.attributes.focal_point（{'x', 'y'}，0~1，預設中心）為準；每種比例產生數個寬度
+# （不放大原圖），格式與變體相同。變體類型為 crop_<比例>_<寬度>，例如 crop_16x9_1280。
+CROP_VARIANTS = {
+    '16x9': {'ratio': (16, 9), 'widths': (640, 1280, 1920), 'quality': 85},
+    '1x1':  {'ratio': (1, 1), 'widths': (180, 600), 'quality': 85},
+}
+DEFAULT_FOCAL_POINT = {'x': 0.5, 'y': 0.5}
+
+VARIANT_REDIRECT_MAX_AGE = 60 * 60   # 轉址回應的快取秒數（重新處理後格式可能改變，不設為長期）
+
+# 原檔最佳化（optimize.py）：變體工作先無損移除原檔 ICC profile 以外的 metadata
+# （JPEG 只刪除 marker segment、不重新編碼，EXIF 方向改寫為最小 EXIF；PNG 以 optimize
+# 重新存檔並確認像素相同），變小時才覆寫原檔。既有檔案以 `flask media-lib optimize-originals` 平行處理。
+OPTIMIZABLE_TYPES = {'image/jpeg', 'image/png'}
+
+# 產生變體時允許解碼的最大像素數（約 80MP），避免解壓縮炸彈與單張圖片吃光 worker 記憶體。
+# 以實際解碼的像素數判斷：JPEG 以 draft() 在解碼時先縮小（最多 1/8），更大的 JPEG 照常處理；
+# 其他格式超過時變體工作標記為失敗（SourceTooLargeError → PermanentJobError）。
+MAX_SOURCE_PIXELS = 80_000_000
+
+# 多核心編碼（encoder.py）：MEDIA_ENCODER_WORKERS > 0 時變體在子行程中產生
+ENCODER_MAX_TASKS_PER_CHILD = 50             # 子行程處理此數量的工作後重啟，限制記憶體成長
+ENCODER_PARALLEL_MIN_PIXELS = 4_000_000      # 大於此像素數的單張圖片才拆分成多組平行處理
+
+# 即時衍生圖（render.py，GET /render/<file_id>）：簽章的 w / h / fit / fmt 參數，
+# 結果存於本機磁碟的 LRU 快取（MEDIA_RENDER_CACHE_DIR / MEDIA_RENDER_CACHE_MAX_BYTES），
+# MEDIA_RENDER_STORE_IN_BUCKET 開啟時另存一份到儲存（RENDER_STORAGE_PREFIX 下）
+RENDER_MAX_DIMENSION = 4096
+RENDER_FITS = ('contain', 'cover')
+RENDER_FORMATS = {
+    'jpeg': ('JPEG', '.jpg', 'image/jpeg'),
+    'png':  ('PNG', '.png', 'image/png'),
+    'webp': ('WEBP', '.webp', 'image/webp'),
+}
+RENDER_QUALITY = 85
+RENDER_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+RENDER_CACHE_MAX_AGE = 365 * 24 * 60 * 60     # Cache-Control max-age（檔案的原檔不會變更，結果可視為不變）
+RENDER_LOCK_TIMEOUT = 30                      # 等待同一衍生圖的首次產生完成的秒數
+RENDER_STORAGE_PREFIX = 'media/_render'
+
+# 背景工作（變體產生）預設值，可由 Flask config 覆寫：
+#   MEDIA_JOBS_EMBEDDED_WORKER  每個 gunicorn worker 內啟動背景執行緒處理工作（未設定時只在 DEBUG 開啟；
+#                               正式環境以獨立的 `flask media-lib worker` 執行）
+#   MEDIA_JOBS_WORKER_THREADS   內嵌 worker 的執行緒數（搭配 MEDIA_ENCODER_WORKERS 可同時處理多張圖片）
+#   MEDIA_JOBS_POLL_INTERVAL    無工作時的輪詢間隔（秒）
+#   MEDIA_JOBS_MAX_ATTEMPTS     失敗重試上限
+JOB_POLL_INTERVAL = 2.0
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_DELAY = 30        # 秒；第 n 次失敗後延遲 base * 2^(n-1)
+JOB_RETRY_MAX_DELAY = 3600
+JOB_STALE_AFTER = 15 * 60        # running 超過此秒數視為 worker 已死，重新領取
+
 # 支援的圖片 MIME types（只有這些會產生變體）
 SUPPORTED_IMAGE_TYPES = {
     'image/jpeg', 'image/png', 'image/webp', 'image/gif',
@@ -24,9 +102,51 @@ SUPPORTED_IMAGE_TYPES = {
 # GCS 路徑前綴
 GCS_BASE_PATH = 'media'
 
-# 上傳限制
+# upload_many / delete_many 的並行數（GCS 模式；可由 MEDIA_STORAGE_CONCURRENCY 覆寫）
+STORAGE_MAX_CONCURRENCY = 8
+
+# GCS 掃描匯入（gcs_import.py）：每頁列出的物件數、每次以 IN 查詢比對資料庫的路徑數，
+# 以及單一 request 的掃描秒數上限（可由 MEDIA_IMPORT_SCAN_MAX_SECONDS 覆寫，須小於 gunicorn timeout；
+# 超過時回傳 cursor，下一個 request 由檢查點續掃）
+IMPORT_SCAN_PAGE_SIZE = 1000
+IMPORT_SCAN_BATCH_SIZE = 500
+IMPORT_SCAN_MAX_SECONDS = 60
+
+# 批次匯入工作（bulk_import.py）：每批建立 / commit 的檔案數；產生變體時各階段的執行緒數
+# （下載、編碼、上傳）與同時在途的檔案數上限（限制記憶體用量）；進度中保留的錯誤筆數。
+# 批次大小與在途上限可由 MEDIA_IMPORT_CHUNK_SIZE / MEDIA_IMPORT_MAX_IN_FLIGHT 覆寫
+IMPORT_CHUNK_SIZE = 50
+IMPORT_DOWNLOAD_CONCURRENCY = 4
+IMPORT_ENCODE_CONCURRENCY = 2
+IMPORT_UPLOAD_CONCURRENCY = 4
+IMPORT_MAX_IN_FLIGHT = 8
+IMPORT_MAX_REPORTED_ERRORS = 200
+
+# 資料夾樹（GET /folders/tree）的快取秒數（可由 MEDIA_FOLDER_TREE_CACHE_TIMEOUT 覆寫）。
+# 檔案 / 資料夾寫入 commit 後即清除，timeout 只是清除失敗時的上限
+FOLDER_TREE_CACHE_TIMEOUT = 10 * 60
+
+# 公開查詢（public_queries.py，/public/lookup 與 /public/search）回應的快取秒數，
+# 同時作為 Cache-Control max-age（可由 MEDIA_PUBLIC_CACHE_TIMEOUT 覆寫）
+PUBLIC_CACHE_TIMEOUT = 60
+
+# 上傳限制（預設值；各站可用 Flask config MEDIA_MAX_FILE_SIZE 覆寫）
 MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
 
+# 可續傳分段上傳（resumable.py）：單檔上限（files.file_size 為 INTEGER，須小於 2GiB；
+# 各站可用 MEDIA_MAX_RESUMABLE_SIZE 覆寫）與未完成 session 的保留時間（MEDIA_UPLOAD_SESSION_TTL，秒）
+MAX_RESUMABLE_FILE_SIZE = 2000 * 1024 * 1024
+UPLOAD_SESSION_TTL = 24 * 60 * 60
+
+# 直接上傳（signed_uploads.py）：上傳 URL 有效秒數（可由 MEDIA_SIGNED_UPLOAD_EXPIRES 覆寫），
+# 以及上傳 URL 到期後仍可呼叫 finalize 的寬限秒數
+SIGNED_UPLOAD_URL_EXPIRES = 15 * 60
+SIGNED_UPLOAD_FINALIZE_WINDOW = 60 * 60
+
+# 串流上傳：每次從 request 讀取的區塊大小；GCS resumable upload 的分段大小（須為 256KB 的倍數）
+SPOOL_CHUNK_SIZE = 1024 * 1024
+GCS_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
 # 副檔名 allowlist。注意：
 # - 不包含 svg（XSS 風險：SVG 可內嵌 <script>。日後若要支援需 server-side sanitize）
 # - 不包含 html/htm/js/exe 等可執行型副檔名
@@ -51,3 +171,10 @@ ALLOWED_MIME_TYPES = {
     'mov':  {'video/quicktime'},
     'avi':  {'video/x-msvideo', 'video/avi'},
 }
+
+# 內容檢測（utils.sniff_mime_type）結果與 ALLOWED_MIME_TYPES 名稱不同但可接受者
+SNIFFED_MIME_EQUIVALENTS = {
+    'docx': {'application/zip'},        # OOXML 為 zip 容器
+    'mp4':  {'video/quicktime'},        # ISO BMFF：ftyp 品牌不一定與副檔名一致
+    'mov':  {'video/mp4'},
+}
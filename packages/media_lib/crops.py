@@ -0,0 +1,149 @@
+"""
+Media Library - 依焦點裁切的固定比例衍生圖（art direction）
+
+變體只等比例縮放，版面需要固定比例時（Content.featured_image 與首頁輪播為 16:9、
+Content.cover_image 為 1:1）由瀏覽器以 object-fit 裁切，會下載整張圖且主體可能被切掉。
+這裡依 CROP_VARIANTS 在背景工作中產生裁切圖：
+
+- 焦點存於 files.attributes.focal_point（{'x', 'y'}，0~1），以 PUT /files/<id>/focal-point
+  設定；焦點是圖片內容的屬性，共用同一原檔的重複記錄（見 dedup.py）一併更新。
+- 裁切圖存為 file_variants（variant_type 為 crop_<比例>_<寬度>），儲存路徑含焦點，
+  焦點變更後網址隨之改變，CDN 不會回傳舊的裁切；舊物件在新記錄寫入後刪除。
+- 結果摘要存於 files.attributes.crops，core 的內容 / 首頁 API 以 image_crops()
+  （由 register_media_lib 註冊到 app.extensions['media_lib']）依圖片網址查詢。
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+from core.backend_engine.factory import db
+from packages.media_lib.config import DEFAULT_FOCAL_POINT
+from packages.media_lib.dedup import sharing_files
+from packages.media_lib.image_processor import source_format
+from packages.media_lib.models import MLFile, MLFileVariant
+
+
+CROP_PREFIX = 'crop_'
+
+
+def is_crop(variant_type: str) -> bool:
+    return variant_type.startswith(CROP_PREFIX)
+
+
+def parse_focal_point(data) -> dict:
+    """
+    驗證焦點（{'x': 0~1, 'y': 0~1}，相對原圖寬高）。
+
+    Raises:
+        ValueError
+    """
+    if not isinstance(data, dict):
+        raise ValueError('focal point must be an object with x and y')
+    point = {}
+    for axis in ('x', 'y'):
+        value = data.get(axis)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f'{axis} must be a number between 0 and 1')
+        if not 0 <= value <= 1:
+            raise ValueError(f'{axis} must be between 0 and 1')
+        point[axis] = round(float(value), 4)
+    return point
+
+
+def focal_point(ml_file: MLFile) -> dict:
+    """檔案目前的焦點（未設定時為中心）。"""
+    return (ml_file.attributes or {}).get('focal_point') or dict(DEFAULT_FOCAL_POINT)
+
+
+def focal_token(point: dict) -> str:
+    """焦點的短代碼（萬分比），放在裁切圖的儲存路徑中，例如 x=0.3, y=0.45 → '3000-4500'。"""
+    return f"{round(point['x'] * 10000):04d}-{round(point['y'] * 10000):04d}"
+
+
+def set_focal_point(ml_file: MLFile, point: Optional[dict]) -> List[MLFile]:
+    """
+    設定焦點（None 表示回到中心），共用同一原檔的記錄一併更新（不 commit）。
+
+    Returns:
+        更新的記錄（ml_file 在第一個）
+    """
+    targets = [ml_file] + sharing_files(ml_file)
+    for target in targets:
+        attributes = dict(target.attributes or {})
+        if point is None:
+            attributes.pop('focal_point', None)
+        else:
+            attributes['focal_point'] = point
+        # JSONB 欄位需指定新的 dict 才會寫回
+        target.attributes = attributes
+    return targets
+
+
+def crop_attributes(mime_type: str, uploaded: list) -> dict:
+    """
+    由已上傳的裁切圖組出 attributes.crops：每種比例取最大的原圖格式裁切圖作為預設 url，
+    並附上各格式的 srcset（依寬度遞增）。
+
+    Returns:
+        {'16x9': {'url', 'width', 'height', 'srcset': {'jpeg': 'url 640w, ...', 'webp': ...}}, '1x1': ...}
+    """
+    primary_format = source_format(mime_type)
+    by_aspect = {}
+    for v, _, url in uploaded:
+        if 'aspect' in v:
+            by_aspect.setdefault(v['aspect'], []).append((v, url))
+
+    crops = {}
+    for aspect, entries in by_aspect.items():
+        srcset = {}
+        for v, url in sorted(entries, key=lambda e: e[0]['width']):
+            srcset.setdefault(v['format'], []).append(f"{url} {v['width']}w")
+        primary = [e for e in entries if e[0]['format'] == primary_format] or entries
+        largest, url = max(primary, key=lambda e: e[0]['width'])
+        crops[aspect] = {
+            'url': url,
+            'width': largest['width'],
+            'height': largest['height'],
+            'srcset': {fmt: ', '.join(items) for fmt, items in srcset.items()},
+        }
+    return crops
+
+
+def image_crops(urls: Iterable[str]) -> Dict[str, dict]:
+    """
+    依圖片網址（原檔或任一變體的 public url）查詢裁切圖，供 core 的 API 使用。
+    一次查詢所有網址（列表頁不會 N+1）；找不到或尚未產生裁切圖的網址不列入結果。
+
+    Returns:
+        {url: {'16x9': {...}, '1x1': {...}}}（內容同 attributes.crops）
+    """
+    urls = {url for url in urls if url}
+    if not urls:
+        return {}
+
+    result = {}
+    rows = db.session.query(MLFile.public_url, MLFile.attributes).filter(MLFile.public_url.in_(urls))
+    for url, attributes in rows:
+        if (attributes or {}).get('crops'):
+            result.setdefault(url, attributes['crops'])
+
+    remaining = urls - set(result)
+    if remaining:
+        rows = db.session.query(MLFileVariant.public_url, MLFile.attributes).join(
+            MLFile, MLFile.id == MLFileVariant.file_id
+        ).filter(MLFileVariant.public_url.in_(remaining))
+        for url, attributes in rows:
+            if (attributes or {}).get('crops'):
+                result.setdefault(url, attributes['crops'])
+    return result
+
+
+__all__ = [
+    'CROP_PREFIX',
+    'is_crop',
+    'parse_focal_point',
+    'focal_point',
+    'focal_token',
+    'set_focal_point',
+    'crop_attributes',
+    'image_crops',
+]
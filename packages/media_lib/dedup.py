@@ -0,0 +1,199 @@
+"""
+Media Library - 內容雜湊去重
+
+files.content_hash 為原檔的 SHA-256（上傳時串流計算）。同一內容只有一筆
+原始記錄（duplicate_of_id IS NULL，由 partial unique index 保證），其餘記錄以
+duplicate_of_id 指向它：
+
+- 上傳時內容已存在：不再上傳原檔、不再產生變體，只建立新的 MLFile 與 metadata
+  記錄，共用原始記錄的 gcs_path 與變體物件；標籤、alt text、資料夾各自獨立。
+- 刪除：只刪除沒有其他記錄使用的儲存物件；刪除原始記錄時由最早的重複記錄接手。
+- 既有檔案的雜湊由 `flask media-lib backfill-hashes` 分批補上（重複的內容只標記
+  duplicate_of_id，物件保留原樣，既有的 public url 不受影響）。
+"""
+
+from typing import Iterator, List, Optional
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from core.backend_engine.factory import db
+from packages.media_lib.models import MLFile, MLFileMetadata, MLFileVariant
+from packages.media_lib.storage import MediaStorage
+
+
+def find_original(content_hash: str) -> Optional[MLFile]:
+    """取得此內容的原始記錄（不存在時回傳 None）。"""
+    return MLFile.query.filter(
+        MLFile.content_hash == content_hash, MLFile.duplicate_of_id.is_(None)
+    ).first()
+
+
+def copy_variants(source: MLFile, target: MLFile) -> None:
+    """讓 target 使用 source 的變體物件（取代 target 既有的變體記錄，不 commit）。"""
+    target.variants = [
+        MLFileVariant(
+            variant_type=v.variant_type,
+            format=v.format,
+            gcs_path=v.gcs_path,
+            public_url=v.public_url,
+            width=v.width,
+            height=v.height,
+            file_size=v.file_size,
+        )
+        for v in source.variants
+    ]
+
+
+def sharing_files(ml_file: MLFile) -> List[MLFile]:
+    """與 ml_file 共用同一原檔物件的其他記錄。"""
+    return MLFile.query.filter(MLFile.gcs_path == ml_file.gcs_path, MLFile.id != ml_file.id).all()
+
+
+def create_reference(original: MLFile, user, original_filename: str,
+                     folder_id: Optional[int] = None) -> MLFile:
+    """
+    以既有檔案的儲存物件與變體建立新的檔案記錄（不 commit）。
+    原始記錄的變體仍在處理中時，狀態沿用 processing，完成後由變體工作一併補上。
+    """
+    ml_file = MLFile(
+        filename=original.filename,
+        original_filename=original_filename,
+        gcs_path=original.gcs_path,
+        public_url=original.public_url,
+        file_size=original.file_size,
+        mime_type=original.mime_type,
+        width=original.width,
+        height=original.height,
+        folder_id=folder_id,
+        uploaded_by=user.id,
+        attributes=dict(original.attributes or {}),
+        processing_status=original.processing_status,
+        content_hash=original.content_hash,
+        duplicate_of_id=original.id,
+    )
+    copy_variants(original, ml_file)
+    db.session.add(ml_file)
+    db.session.flush()  # 取得 ml_file.id
+    db.session.add(MLFileMetadata(file_id=ml_file.id))
+    return ml_file
+
+
+def flush_with_hash(ml_file: MLFile) -> None:
+    """
+    flush 帶有 content_hash 的記錄（不 commit）。若另一個交易同時以相同內容建立了
+    原始記錄（unique index 衝突），改標記為該記錄的重複記錄；已上傳的物件保留原樣。
+    """
+    content_hash = ml_file.content_hash
+    try:
+        with db.session.begin_nested():
+            db.session.add(ml_file)
+            db.session.flush()
+        return
+    except IntegrityError:
+        original = find_original(content_hash)
+        if original is None or original is ml_file:
+            raise
+    # savepoint rollback 會移除 pending 物件 / 還原已修改的欄位，重新設定後再 flush
+    db.session.add(ml_file)
+    ml_file.content_hash = content_hash
+    ml_file.duplicate_of_id = original.id
+    db.session.flush()
+
+
+def assign_hash(ml_file: MLFile, content_hash: str) -> None:
+    """為既有記錄補上雜湊（不 commit）；內容已有原始記錄時標記為其重複記錄。"""
+    original = find_original(content_hash)
+    ml_file.content_hash = content_hash
+    if original is not None and original.id != ml_file.id:
+        ml_file.duplicate_of_id = original.id
+    flush_with_hash(ml_file)
+
+
+def release_file(ml_file: MLFile) -> List[str]:
+    """
+    刪除記錄前呼叫（不 commit）：原始記錄有重複記錄時，由最早的一筆接手成為原始記錄。
+
+    Returns:
+        沒有其他記錄使用、可從儲存中刪除的路徑（變體在前，原檔在後）
+    """
+    if ml_file.duplicate_of_id is None and ml_file.content_hash:
+        successor = MLFile.query.filter_by(duplicate_of_id=ml_file.id).order_by(MLFile.id).first()
+        if successor is not None:
+            # 先讓出 unique index，再由接手者成為原始記錄
+            ml_file.content_hash = None
+            db.session.flush()
+            MLFile.query.filter(
+                MLFile.duplicate_of_id == ml_file.id, MLFile.id != successor.id
+            ).update({'duplicate_of_id': successor.id}, synchronize_session=False)
+            successor.duplicate_of_id = None
+            db.session.flush()
+
+    paths = [v.gcs_path for v in ml_file.variants] + [ml_file.gcs_path]
+    in_use = {
+        path for (path,) in db.session.query(MLFile.gcs_path).filter(
+            MLFile.id != ml_file.id, MLFile.gcs_path.in_(paths)
+        )
+    }
+    in_use.update(
+        path for (path,) in db.session.query(MLFileVariant.gcs_path).filter(
+            MLFileVariant.file_id != ml_file.id, MLFileVariant.gcs_path.in_(paths)
+        )
+    )
+    return [path for path in paths if path and path not in in_use]
+
+
+def backfill_hashes(batch_size: int = 100, limit: Optional[int] = None,
+                    dry_run: bool = False) -> Iterator[dict]:
+    """
+    為尚未有 content_hash 的檔案計算雜湊，每批 commit 一次（依 id 遞增，可中斷後重跑）。
+
+    Yields:
+        每批的進度 {'hashed', 'duplicates', 'missing', 'last_id'}（累計值）
+    """
+    storage = MediaStorage.get_instance()
+    stats = {'hashed': 0, 'duplicates': 0, 'missing': 0, 'last_id': 0}
+    processed = 0
+
+    while limit is None or processed < limit:
+        size = batch_size if limit is None else min(batch_size, limit - processed)
+        batch = MLFile.query.filter(
+            MLFile.content_hash.is_(None), MLFile.id > stats['last_id']
+        ).order_by(MLFile.id).limit(size).all()
+        if not batch:
+            break
+
+        for ml_file in batch:
+            stats['last_id'] = ml_file.id
+            processed += 1
+            try:
+                content_hash = storage.sha256_of(ml_file.gcs_path)
+            except FileNotFoundError:
+                current_app.logger.warning(f'Backfill: original of file {ml_file.id} not found: {ml_file.gcs_path}')
+                stats['missing'] += 1
+                continue
+            if dry_run:
+                stats['hashed'] += 1
+                continue
+            assign_hash(ml_file, content_hash)
+            stats['hashed'] += 1
+            if ml_file.duplicate_of_id is not None:
+                stats['duplicates'] += 1
+
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+        yield dict(stats)
+
+
+__all__ = [
+    'find_original',
+    'copy_variants',
+    'sharing_files',
+    'create_reference',
+    'flush_with_hash',
+    'assign_hash',
+    'release_file',
+    'backfill_hashes',
+]
@@ -0,0 +1,282 @@
+"""
+Media Library - 多核心變體編碼
+
+Pillow 的縮圖與編碼大多持有 GIL，執行緒無法用到多核心。VariantEncoder 以
+ProcessPoolExecutor 在子行程中執行 generate_variants：
+
+- 單張大圖：依目標尺寸分組（最大的幾個變體各一組，其餘小變體串接為一組），
+  各組平行產生。
+- 多張圖片：多個 job worker 執行緒共用同一個 pool，或以 encode_many() 批次送出，
+  每張圖片一個工作。optimize_many() 以相同方式批次最佳化原檔（optimize-originals 指令）。
+
+原圖 bytes 只寫入 SharedMemory 一次，子行程依名稱讀取，不經 pickle / pipe 傳送；
+只有壓縮後的變體（體積小）經由 pipe 回傳。
+
+子行程以 forkserver（無 forkserver 的平台用 spawn）啟動，不繼承 Flask app 與 DB
+連線；每個子行程處理 max_tasks_per_child 個工作後重啟，避免記憶體碎片持續累積。
+
+設定（Flask config）：
+    MEDIA_ENCODER_WORKERS              子行程數；0 = 在目前行程內產生（預設）
+    MEDIA_ENCODER_MAX_TASKS_PER_CHILD  每個子行程處理幾個工作後重啟
+"""
+
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from flask import current_app
+from PIL import Image
+
+from packages.media_lib.config import (
+    ENCODER_MAX_TASKS_PER_CHILD,
+    ENCODER_PARALLEL_MIN_PIXELS,
+)
+from packages.media_lib.image_processor import (
+    _orientation,
+    _oriented_size,
+    _plan_targets,
+    _should_animate,
+    generate_variants,
+    is_image,
+    optimize_original,
+    variant_order,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# 子行程
+# =============================================================================
+
+def _read_shared(shm_name: str, size: int) -> bytes:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        return bytes(shm.buf[:size])
+    finally:
+        shm.close()
+
+
+def _generate_from_shared(shm_name: str, size: int, mime_type: str,
+                          variant_types: Optional[List[str]] = None) -> List[dict]:
+    """子行程：從 SharedMemory 讀取原圖並產生指定的變體。"""
+    return generate_variants(_read_shared(shm_name, size), mime_type, variant_types)
+
+
+def _optimize_from_shared(shm_name: str, size: int, mime_type: str) -> Optional[dict]:
+    """子行程：從 SharedMemory 讀取原檔並最佳化。"""
+    return optimize_original(_read_shared(shm_name, size), mime_type)
+
+
+def _share(file_data: bytes) -> shared_memory.SharedMemory:
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(file_data)))
+    shm.buf[:len(file_data)] = file_data
+    return shm
+
+
+def _release(shm: shared_memory.SharedMemory) -> None:
+    shm.close()
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _sort_variants(variants: List[dict]) -> List[dict]:
+    return sorted(variants, key=lambda v: variant_order(v['variant_type']))
+
+
+# =============================================================================
+# Encoder
+# =============================================================================
+
+class VariantEncoder:
+    """以 process pool 產生圖片變體；pool 在第一次使用時建立。"""
+
+    def __init__(self, workers: int, max_tasks_per_child: int = ENCODER_MAX_TASKS_PER_CHILD):
+        self.workers = max(1, workers)
+        self.max_tasks_per_child = max_tasks_per_child
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=context,
+                    max_tasks_per_child=self.max_tasks_per_child,
+                )
+            return self._executor
+
+    def _reset_executor(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+    def plan_groups(self, file_data: bytes, mime_type: str) -> List[List[str]]:
+        """
+        依原圖尺寸將變體分組，每組由一個子行程串接產生。
+
+        大變體各自一組（縮圖成本集中在前幾個），剩下的小變體合為一組；
+        小於 ENCODER_PARALLEL_MIN_PIXELS 的圖片不拆分（行程間往返不划算）。
+        """
+        if not is_image(mime_type):
+            return []
+        try:
+            img = Image.open(io.BytesIO(file_data))
+        except Exception:
+            return []
+        # 像素上限由 generate_variants 在子行程解碼前檢查（JPEG 以 draft() 後的尺寸計算）
+        width, height = img.size
+
+        # 與 generate_variants 相同，依 EXIF 方向轉正後的尺寸規劃（動畫不轉正）
+        animate = _should_animate(img)
+        planned = _oriented_size(img.size, 1 if animate else _orientation(img))
+        variant_types = [variant_type for variant_type, _ in _plan_targets(*planned, animate)]
+        if not variant_types:
+            return []
+        parts = min(self.workers, len(variant_types)) if width * height >= ENCODER_PARALLEL_MIN_PIXELS else 1
+        groups = [[variant_type] for variant_type in variant_types[:parts - 1]]
+        groups.append(variant_types[parts - 1:])
+        return groups
+
+    def generate_variants(self, file_data: bytes, mime_type: str) -> List[dict]:
+        """與 image_processor.generate_variants 相同的結果，各組變體平行產生。"""
+        groups = self.plan_groups(file_data, mime_type)
+        if not groups:
+            return []
+
+        shm = _share(file_data)
+        try:
+            executor = self._get_executor()
+            futures = [
+                executor.submit(_generate_from_shared, shm.name, len(file_data), mime_type, group)
+                for group in groups
+            ]
+            variants = [v for future in futures for v in future.result()]
+        except BrokenProcessPool:
+            # 子行程異常結束（例如 OOM kill）：重建 pool，這次改在目前行程內產生
+            logger.warning('Media encoder pool broke; falling back to in-process encoding')
+            self._reset_executor()
+            return generate_variants(file_data, mime_type)
+        finally:
+            _release(shm)
+        return _sort_variants(variants)
+
+    def encode_many(self, items: Iterable[Tuple[Any, bytes, str]]) -> Iterator[Tuple[Any, List[dict]]]:
+        """
+        批次產生多張圖片的變體，依完成順序回傳 (key, variants)。
+
+        同時在途的圖片最多 workers * 2 張，SharedMemory 用量因此有上限。
+        pool 損壞時會重建並拋出 BrokenProcessPool，由呼叫端決定是否重試。
+
+        Args:
+            items: (key, file_data, mime_type) 的 iterable
+        """
+        return self._map_shared(items, _generate_from_shared, [])
+
+    def optimize_many(self, items: Iterable[Tuple[Any, bytes, str]]) -> Iterator[Tuple[Any, Optional[dict]]]:
+        """
+        批次最佳化原檔（image_processor.optimize_original），依完成順序回傳 (key, result)。
+        在途數量與 pool 損壞時的處理同 encode_many。
+        """
+        return self._map_shared(items, _optimize_from_shared, None)
+
+    def _map_shared(self, items, task, empty) -> Iterator[Tuple[Any, Any]]:
+        """以 SharedMemory 傳遞原檔，將 task(shm_name, size, mime_type) 送到子行程執行。"""
+        executor = self._get_executor()
+        max_in_flight = self.workers * 2
+        pending = {}
+        items = iter(items)
+        exhausted = False
+
+        try:
+            while pending or not exhausted:
+                while not exhausted and len(pending) < max_in_flight:
+                    item = next(items, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    key, file_data, mime_type = item
+                    if not is_image(mime_type):
+                        yield key, empty
+                        continue
+                    shm = _share(file_data)
+                    try:
+                        future = executor.submit(task, shm.name, len(file_data), mime_type)
+                    except BaseException:
+                        _release(shm)
+                        raise
+                    pending[future] = (key, shm)
+
+                if not pending:
+                    continue
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key, shm = pending.pop(future)
+                    _release(shm)
+                    yield key, future.result()
+        except BrokenProcessPool:
+            self._reset_executor()
+            raise
+        finally:
+            for future, (_, shm) in pending.items():
+                future.cancel()
+                _release(shm)
+
+
+_encoder: Optional[VariantEncoder] = None
+_encoder_pid: Optional[int] = None
+_encoder_lock = threading.Lock()
+
+
+def get_encoder(app=None) -> Optional[VariantEncoder]:
+    """
+    取得目前行程的 encoder（依 MEDIA_ENCODER_WORKERS）；未啟用時回傳 None。
+    gunicorn fork 後各 process 各自建立自己的 pool。
+    """
+    global _encoder, _encoder_pid
+    app = app or current_app
+    workers = int(app.config.get('MEDIA_ENCODER_WORKERS') or 0)
+    if workers <= 0:
+        return None
+
+    pid = os.getpid()
+    if _encoder_pid == pid:
+        return _encoder
+    with _encoder_lock:
+        if _encoder_pid != pid:
+            _encoder = VariantEncoder(
+                workers,
+                int(app.config.get('MEDIA_ENCODER_MAX_TASKS_PER_CHILD', ENCODER_MAX_TASKS_PER_CHILD)),
+            )
+            _encoder_pid = pid
+    return _encoder
+
+
+def encode_variants(file_data: bytes, mime_type: str) -> List[dict]:
+    """產生圖片變體：有設定 encoder pool 時交給子行程，否則在目前行程內產生。"""
+    encoder = get_encoder()
+    if encoder is None:
+        return generate_variants(file_data, mime_type)
+    return encoder.generate_variants(file_data, mime_type)
+
+
+__all__ = ['VariantEncoder', 'get_encoder', 'encode_variants']
@@ -0,0 +1,280 @@
+"""
+Media Library - 資料夾階層（materialized path）
+
+folders.path 為由根到自己的名稱路徑（例如 /2026/活動/封面），同時作為子樹查詢的
+materialized path：
+
+- 子孫資料夾 = path 以「自己的 path + /」開頭者（LIKE 'prefix%'，以
+  ix_media_lib_folders_path_pattern（varchar_pattern_ops）索引；名稱中的 % / _ 會跳脫）。
+- 移動 / 改名時以一個 UPDATE 改寫整個子樹的 path（新前綴 || substr(path, ...)），
+  不再逐層載入 subfolders。
+- 名稱不可包含 /，path 的每一段才會對應一個資料夾（既有名稱中的 / 由 migration 0011
+  換成全形 ／ 並重新計算 path）。
+
+資料夾樹（GET /folders/tree）：一個 recursive CTE 查詢取得所有資料夾、各自直接與含子孫的
+檔案數 / 位元組數以及縮圖網址，結果存於 Flask-Caching。files / folders / file_variants 有寫入
+並 commit 後清除（session 事件，包含 bulk UPDATE / DELETE），各端點不需個別處理。
+"""
+
+from datetime import datetime, timezone
+from typing import Optional
+
+from flask import current_app
+from sqlalchemy import case, event, func, literal, select
+from sqlalchemy.orm import Session, aliased
+
+from core.backend_engine.factory import cache, db
+from packages.media_lib.config import FOLDER_TREE_CACHE_TIMEOUT
+from packages.media_lib.models import MLFile, MLFileVariant, MLFolder
+
+
+PATH_SEPARATOR = '/'
+
+
+def validate_name(name: str) -> str:
+    """
+    驗證資料夾名稱（已去除前後空白）。
+
+    Raises:
+        ValueError
+    """
+    if not name:
+        raise ValueError('Folder name is required')
+    if PATH_SEPARATOR in name:
+        raise ValueError(f"Folder name cannot contain '{PATH_SEPARATOR}'")
+    return name
+
+
+def child_path(parent_path: Optional[str], name: str) -> str:
+    """資料夾的 path（parent_path 為 None 表示根目錄）。"""
+    return f'{(parent_path or "").rstrip(PATH_SEPARATOR)}{PATH_SEPARATOR}{name}'
+
+
+def subtree_prefix(folder: MLFolder) -> str:
+    """子孫資料夾 path 的共同前綴。"""
+    return folder.path.rstrip(PATH_SEPARATOR) + PATH_SEPARATOR
+
+
+def descendants(folder: MLFolder):
+    """子孫資料夾的查詢（不含自己）。"""
+    return MLFolder.query.filter(MLFolder.path.startswith(subtree_prefix(folder), autoescape=True))
+
+
+def is_within(folder: MLFolder, other: MLFolder) -> bool:
+    """other 是否為 folder 本身或其子孫（兩者皆已載入，不需查詢）。"""
+    return other.id == folder.id or other.path.startswith(subtree_prefix(folder))
+
+
+def relocate(folder: MLFolder, name: str, parent: Optional[MLFolder]) -> None:
+    """
+    改名 / 移動資料夾（不 commit）：自己的 path 與所有子孫的 path 以一個 UPDATE 改寫。
+    呼叫端需先以 is_within 確認 parent 不在 folder 的子樹內。
+    """
+    old_prefix = subtree_prefix(folder)
+    new_path = child_path(parent.path if parent is not None else None, name)
+
+    folder.name = name
+    folder.parent_id = parent.id if parent is not None else None
+    if new_path == folder.path:
+        return
+    folder.path = new_path
+
+    new_prefix = new_path + PATH_SEPARATOR
+    MLFolder.query.filter(MLFolder.path.startswith(old_prefix, autoescape=True)).update(
+        {MLFolder.path: literal(new_prefix) + func.substr(MLFolder.path, len(old_prefix) + 1)},
+        synchronize_session=False,
+    )
+    # 已載入的子孫物件 path 已過時
+    for obj in db.session.identity_map.values():
+        if isinstance(obj, MLFolder) and obj is not folder:
+            db.session.expire(obj, ['path'])
+
+
+# =============================================================================
+# 資料夾樹
+# =============================================================================
+
+FOLDER_TREE_CACHE_KEY = 'media_lib:folder_tree'
+
+
+def _tree_statement():
+    # 每個資料夾直接包含的檔案
+    direct = (
+        select(
+            MLFile.folder_id.label('folder_id'),
+            func.count().label('file_count'),
+            func.coalesce(func.sum(MLFile.file_size), 0).label('total_bytes'),
+        )
+        .where(MLFile.folder_id.isnot(None))
+        .group_by(MLFile.folder_id)
+        .cte('direct')
+    )
+
+    # (祖先, 子孫) 配對，包含自己
+    closure = select(
+        MLFolder.id.label('ancestor_id'), MLFolder.id.label('descendant_id')
+    ).cte('closure', recursive=True)
+    child = aliased(MLFolder)
+    closure = closure.union_all(
+        select(closure.c.ancestor_id, child.id).join(child, child.parent_id == closure.c.descendant_id)
+    )
+
+    totals = (
+        select(
+            closure.c.ancestor_id.label('folder_id'),
+            func.coalesce(func.sum(direct.c.file_count), 0).label('file_count'),
+            func.coalesce(func.sum(direct.c.total_bytes), 0).label('total_bytes'),
+        )
+        .select_from(closure.outerjoin(direct, direct.c.folder_id == closure.c.descendant_id))
+        .group_by(closure.c.ancestor_id)
+        .cte('totals')
+    )
+
+    # 縮圖檔案原圖格式的 thumbnail 變體（與 MLFile.grouped_variants 的代表格式相同）
+    thumb = aliased(MLFile)
+    primary_format = case(
+        {'image/png': 'png', 'image/webp': 'webp', 'image/gif': 'gif'}, value=thumb.mime_type, else_='jpeg'
+    )
+    thumb_variant_id = (
+        select(MLFileVariant.id)
+        .where(
+            MLFileVariant.file_id == thumb.id,
+            MLFileVariant.variant_type == 'thumbnail',
+            MLFileVariant.format == primary_format,
+        )
+        .order_by(MLFileVariant.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    thumb_variant = aliased(MLFileVariant)
+
+    return (
+        select(
+            MLFolder.id, MLFolder.name, MLFolder.parent_id, MLFolder.path, MLFolder.description,
+            MLFolder.thumbnail_id, MLFolder.created_at,
+            thumb.public_url.label('thumbnail_url'),
+            thumb_variant.public_url.label('thumbnail_variant_url'),
+            thumb_variant.width.label('thumbnail_variant_width'),
+            thumb_variant.height.label('thumbnail_variant_height'),
+            func.coalesce(direct.c.file_count, 0).label('file_count'),
+            func.coalesce(direct.c.total_bytes, 0).label('total_bytes'),
+            totals.c.file_count.label('recursive_file_count'),
+            totals.c.total_bytes.label('recursive_bytes'),
+        )
+        .join(totals, totals.c.folder_id == MLFolder.id)
+        .outerjoin(direct, direct.c.folder_id == MLFolder.id)
+        .outerjoin(thumb, thumb.id == MLFolder.thumbnail_id)
+        .outerjoin(thumb_variant, thumb_variant.id == thumb_variant_id)
+        .order_by(MLFolder.path)
+    )
+
+
+def _build_tree() -> dict:
+    folders = []
+    for row in db.session.execute(_tree_statement()):
+        thumbnail = None
+        if row.thumbnail_url:
+            thumbnail = {'id': row.thumbnail_id, 'url': row.thumbnail_url, 'formats': {}}
+            if row.thumbnail_variant_url:
+                thumbnail['formats']['thumbnail'] = {
+                    'url': row.thumbnail_variant_url,
+                    'width': row.thumbnail_variant_width,
+                    'height': row.thumbnail_variant_height,
+                }
+        folders.append({
+            'id': row.id,
+            'name': row.name,
+            'parent_id': row.parent_id,
+            'path': row.path,
+            'description': row.description,
+            'thumbnail_id': row.thumbnail_id,
+            'thumbnail': thumbnail,
+            'created_at': row.created_at.isoformat() if row.created_at else None,
+            'file_count': int(row.file_count),
+            'total_bytes': int(row.total_bytes),
+            'recursive_file_count': int(row.recursive_file_count),
+            'recursive_bytes': int(row.recursive_bytes),
+        })
+
+    unfiled_count, unfiled_bytes = db.session.query(
+        func.count(MLFile.id), func.coalesce(func.sum(MLFile.file_size), 0)
+    ).filter(MLFile.folder_id.is_(None)).one()
+    return {
+        'folders': folders,
+        'unfiled': {'file_count': int(unfiled_count), 'total_bytes': int(unfiled_bytes)},
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def folder_tree(use_cache: bool = True) -> dict:
+    """
+    所有資料夾（依 path 排序，前端依 parent_id 組成樹）與檔案統計。
+
+    Returns:
+        {'folders': [{id, name, parent_id, path, description, thumbnail_id, thumbnail, created_at,
+                      file_count, total_bytes, recursive_file_count, recursive_bytes}, ...],
+         'unfiled': {'file_count', 'total_bytes'},   # 不在任何資料夾中的檔案
+         'generated_at'}
+    """
+    if use_cache:
+        cached = cache.get(FOLDER_TREE_CACHE_KEY)
+        if cached is not None:
+            return cached
+
+    tree = _build_tree()
+    timeout = int(current_app.config.get('MEDIA_FOLDER_TREE_CACHE_TIMEOUT', FOLDER_TREE_CACHE_TIMEOUT))
+    cache.set(FOLDER_TREE_CACHE_KEY, tree, timeout=timeout)
+    return tree
+
+
+def invalidate_tree() -> None:
+    cache.delete(FOLDER_TREE_CACHE_KEY)
+
+
+# 寫入這些資料表後資料夾樹需重新計算（file_variants 影響縮圖網址）
+_TREE_MODELS = (MLFile, MLFolder, MLFileVariant)
+_DIRTY_FLAG = 'media_lib_folder_tree_dirty'
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_tree_dirty(session, flush_context):
+    if any(isinstance(obj, _TREE_MODELS) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info[_DIRTY_FLAG] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _mark_tree_dirty_bulk(orm_execute_state):
+    # query.update() / query.delete() 不經過 flush
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and any(
+        mapper.class_ in _TREE_MODELS for mapper in orm_execute_state.all_mappers
+    ):
+        orm_execute_state.session.info[_DIRTY_FLAG] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop(_DIRTY_FLAG, False):
+        try:
+            invalidate_tree()
+        except Exception as e:
+            # 快取後端無法連線時不影響已 commit 的寫入，舊結果在 timeout 後過期
+            current_app.logger.warning(f'Folder tree cache invalidation failed: {e}')
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop(_DIRTY_FLAG, None)
+
+
+__all__ = [
+    'PATH_SEPARATOR',
+    'validate_name',
+    'child_path',
+    'subtree_prefix',
+    'descendants',
+    'is_within',
+    'relocate',
+    'FOLDER_TREE_CACHE_KEY',
+    'folder_tree',
+    'invalidate_tree',
+]
@@ -0,0 +1,169 @@
+"""
+Media Library - GCS 掃描匯入（GET /import/scan）
+
+原本一次列出 prefix 下的所有物件、把所有 files.gcs_path 載入記憶體比對，再以單一 JSON 回傳，
+bucket 大時 request 逾時。這裡改為：
+
+- 依名稱順序分頁列出物件（storage.list_objects），候選路徑每 IMPORT_SCAN_BATCH_SIZE 筆
+  以一次 IN 查詢比對資料庫，不載入整張 files。
+- 檢查點（import_scans，每個 prefix 一筆）記錄進行中掃描的 cursor（最後處理的物件名稱）
+  與上一次完整掃描看到的最新更新時間（since）。單一 request 最多掃描
+  IMPORT_SCAN_MAX_SECONDS 秒，未完成時下一個 request 由 cursor 續掃。
+- 增量掃描（預設）只比對 since 之後更新的物件；full 掃描比對全部，restart 捨棄進行中的 cursor。
+- scan_bucket 以事件（start / file / progress / done）逐步產生，API 以 NDJSON 串流回傳。
+"""
+
+import mimetypes
+import os
+import time
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional
+
+from core.backend_engine.factory import db
+from packages.media_lib.config import IMPORT_SCAN_BATCH_SIZE, IMPORT_SCAN_PAGE_SIZE
+from packages.media_lib.models import MLFile, MLImportScan
+from packages.media_lib.storage import MediaStorage, StoredObject
+
+
+def _utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """GCS 的更新時間為 aware datetime，資料庫欄位為 naive UTC。"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def get_checkpoint(prefix: str) -> MLImportScan:
+    """取得（不存在時建立，不 commit）prefix 的檢查點。"""
+    checkpoint = MLImportScan.query.filter_by(prefix=prefix).first()
+    if checkpoint is None:
+        checkpoint = MLImportScan(prefix=prefix, scanned=0, found=0)
+        db.session.add(checkpoint)
+    return checkpoint
+
+
+def _file_entry(storage: MediaStorage, obj: StoredObject) -> dict:
+    return {
+        'gcs_path': obj.name,
+        'public_url': f'{storage.public_url_prefix}/{obj.name}',
+        'filename': os.path.basename(obj.name),
+        'file_size': obj.size,
+        'mime_type': obj.content_type or mimetypes.guess_type(obj.name)[0] or 'application/octet-stream',
+        'updated': obj.updated.isoformat() if obj.updated else None,
+    }
+
+
+def _not_imported(candidates: List[StoredObject]) -> List[StoredObject]:
+    """以一次 IN 查詢排除資料庫中已有的路徑。"""
+    if not candidates:
+        return []
+    existing = {
+        path for (path,) in db.session.query(MLFile.gcs_path).filter(
+            MLFile.gcs_path.in_([obj.name for obj in candidates])
+        )
+    }
+    return [obj for obj in candidates if obj.name not in existing]
+
+
+def scan_bucket(prefix: str, incremental: bool = True, restart: bool = False,
+                max_seconds: Optional[float] = None, persist: bool = True) -> Iterator[dict]:
+    """
+    掃描 prefix 下尚未匯入的物件（GCS 模式）。
+
+    Args:
+        incremental: 只比對上一次完整掃描之後更新的物件
+        restart: 捨棄進行中掃描的 cursor，從頭開始
+        max_seconds: 超過時結束本次掃描（檢查點保留 cursor，下次續掃）；None 表示不限
+        persist: 是否讀寫檢查點（False 時為不留紀錄的完整掃描）
+
+    Yields:
+        {'type': 'start', 'prefix', 'resumed', 'since'}
+        {'type': 'file', 'gcs_path', 'public_url', 'filename', 'file_size', 'mime_type', 'updated'}
+        {'type': 'progress', 'scanned', 'found', 'cursor'}（每批比對後，checkpoint 已 commit）
+        {'type': 'done', 'complete', 'scanned', 'found', 'cursor'}
+    """
+    storage = MediaStorage.get_instance()
+    deadline = time.monotonic() + max_seconds if max_seconds else None
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    checkpoint = get_checkpoint(prefix) if persist else MLImportScan(prefix=prefix)
+    if restart or checkpoint.cursor is None:
+        checkpoint.cursor = None
+        checkpoint.high_water = None
+        checkpoint.scanned = 0
+        checkpoint.found = 0
+        checkpoint.started_at = now
+        resumed = False
+    else:
+        resumed = True
+    since = checkpoint.since if incremental else None
+
+    def _save():
+        if persist:
+            db.session.commit()
+
+    _save()
+    yield {
+        'type': 'start',
+        'prefix': prefix,
+        'resumed': resumed,
+        'since': since.isoformat() if since else None,
+    }
+
+    candidates: List[StoredObject] = []
+    start_offset = last_name = checkpoint.cursor
+    unflushed = 0
+
+    def _flush():
+        new_objects = _not_imported(candidates)
+        candidates.clear()
+        checkpoint.found += len(new_objects)
+        checkpoint.cursor = last_name
+        _save()
+        return new_objects
+
+    for obj in storage.list_objects(prefix, start_offset=start_offset, page_size=IMPORT_SCAN_PAGE_SIZE):
+        # start_offset 包含 cursor 本身（上一次已處理）
+        if obj.name == start_offset:
+            continue
+        last_name = obj.name
+        checkpoint.scanned += 1
+        unflushed += 1
+
+        updated = _utc_naive(obj.updated)
+        if updated and (checkpoint.high_water is None or updated > checkpoint.high_water):
+            checkpoint.high_water = updated
+
+        # 跳過目錄標記和 0 byte 檔案；增量掃描跳過上一次掃描之前更新的物件
+        skip = obj.name.endswith('/') or obj.size == 0 or (since and updated and updated <= since)
+        if not skip:
+            candidates.append(obj)
+
+        # 候選路徑滿一批，或連續略過的物件達一頁時，比對並記錄檢查點
+        if len(candidates) >= IMPORT_SCAN_BATCH_SIZE or unflushed >= IMPORT_SCAN_PAGE_SIZE:
+            unflushed = 0
+            for new_obj in _flush():
+                yield {'type': 'file', **_file_entry(storage, new_obj)}
+            yield {'type': 'progress', 'scanned': checkpoint.scanned, 'found': checkpoint.found,
+                   'cursor': checkpoint.cursor}
+            if deadline and time.monotonic() >= deadline:
+                yield {'type': 'done', 'complete': False, 'scanned': checkpoint.scanned,
+                       'found': checkpoint.found, 'cursor': checkpoint.cursor}
+                return
+
+    for new_obj in _flush():
+        yield {'type': 'file', **_file_entry(storage, new_obj)}
+
+    # 掃描期間新上傳、名稱在 cursor 之前的物件不會被列出；since 不超過掃描開始的時間，
+    # 下一次增量掃描仍會比對到它們
+    if checkpoint.high_water is not None:
+        since = min(checkpoint.high_water, checkpoint.started_at or now)
+        checkpoint.since = max(checkpoint.since, since) if checkpoint.since else since
+    checkpoint.cursor = None
+    checkpoint.high_water = None
+    checkpoint.completed_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    _save()
+    yield {'type': 'done', 'complete': True, 'scanned': checkpoint.scanned,
+           'found': checkpoint.found, 'cursor': None}
+
+
+__all__ = ['get_checkpoint', 'scan_bucket']
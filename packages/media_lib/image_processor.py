@@ -1,16 +1,47 @@
 """
 Media Library - Image Processor
 
-使用 Pillow 產生圖片變體（thumbnail, small, medium, large）。
+使用 Pillow 產生圖片變體（thumbnail, small, medium, large, hero）。
 只在記憶體中處理，不寫入本機磁碟。
+變體由大到小串接產生，JPEG 解碼時即以 draft() 縮小，峰值記憶體與最大變體相當。
+每個變體以原圖格式編碼，另以 VARIANT_EXTRA_FORMATS（WebP、Pillow 支援時的 AVIF）
+各編碼一份，縮圖只做一次。
+動畫圖片逐格縮小並保留動畫（原圖格式 + 動畫 WebP），原尺寸另轉為動畫 WebP。
+另依焦點產生 CROP_VARIANTS 的固定比例裁切圖（generate_crops）。
+原檔本身以 optimize_original 無損移除 metadata（見 optimize.py），EXIF 方向保留在原檔中，
+變體、裁切圖與即時衍生圖在解碼後依方向轉正。
 """
 
+import base64
+import functools
 import io
-from typing import List, Tuple, Optional
+import math
+from typing import Iterable, List, Optional, Tuple, Union
 
-from PIL import Image
+from PIL import ExifTags, Image, ImageSequence
 
-from packages.media_lib.config import IMAGE_VARIANTS, SUPPORTED_IMAGE_TYPES
+from packages.media_lib.config import (
+    ANIMATED_FORMATS,
+    ANIMATED_ORIGINAL,
+    ANIMATED_ORIGINAL_QUALITY,
+    ANIMATION_MAX_PIXELS,
+    CROP_VARIANTS,
+    DEFAULT_FOCAL_POINT,
+    DOMINANT_COLOR_SAMPLE,
+    IMAGE_VARIANTS,
+    LQIP_MAX_SIZE,
+    LQIP_QUALITY,
+    MAX_SOURCE_PIXELS,
+    OPTIMIZABLE_TYPES,
+    RENDER_FORMATS,
+    RENDER_QUALITY,
+    SUPPORTED_IMAGE_TYPES,
+    VARIANT_EXTRA_FORMATS,
+)
+
+
+class SourceTooLargeError(ValueError):
+    """解碼後的像素數超過 MAX_SOURCE_PIXELS（JPEG 以 draft() 縮小後計算）。"""
 
 
 def is_image(mime_type: str) -> bool:
@@ -18,16 +49,19 @@ def is_image(mime_type: str) -> bool:
     return mime_type in SUPPORTED_IMAGE_TYPES
 
 
-def get_image_dimensions(file_data: bytes) -> Tuple[Optional[int], Optional[int]]:
+def get_image_dimensions(file_data: Union[bytes, str]) -> Tuple[Optional[int], Optional[int]]:
     """
-    取得圖片的寬高。
+    取得圖片依 EXIF 方向轉正後的寬高（只讀取檔頭）。
+
+    Args:
+        file_data: 圖片 bytes 或檔案路徑（串流上傳的暫存檔）
 
     Returns:
         (width, height) 或 (None, None)
     """
     try:
-        img = Image.open(io.BytesIO(file_data))
-        w, h = img.size
+        with Image.open(io.BytesIO(file_data) if isinstance(file_data, bytes) else file_data) as img:
+            w, h = _oriented_size(img.size, _orientation(img))
         # 確保寬高是合理的整數值
         if not (0 < w < 1e8 and 0 < h < 1e8):
             return None, None
@@ -39,18 +73,37 @@ def get_image_dimensions(file_data: bytes) -> Tuple[Optional[int], Optional[int]
 def generate_variants(
     file_data: bytes,
     mime_type: str,
+    variant_types: Optional[Iterable[str]] = None,
 ) -> List[dict]:
     """
     產生圖片的各尺寸變體。
 
+    以「串接」方式處理以壓低記憶體與 CPU：
+    1. 先依原圖尺寸算出每個變體的目標尺寸，由大到小排序。
+    2. JPEG 以 draft() 在解碼時直接以 1/2、1/4、1/8 縮小（DCT scaling），
+       其他格式解碼後以 reduce() 整數倍縮小，只保留略大於最大變體的像素。
+    3. 每個變體由上一個（較大的）結果縮小而來，不再每次複製全尺寸原圖。
+
+    動畫圖片（影格數 × 像素數不超過 ANIMATION_MAX_PIXELS）逐格縮小，變體保留動畫，
+    並多一個原尺寸的 ANIMATED_ORIGINAL 變體（只有 ANIMATED_FORMATS，見 _generate_animated）。
+
+    EXIF 方向不為 1 的靜態圖片依轉正後的尺寸規劃，解碼後轉正再縮小。
+    像素上限 MAX_SOURCE_PIXELS 以實際解碼的像素數判斷（JPEG 為 draft() 縮小後），
+    超過時 raise SourceTooLargeError，不會靜默地不產生變體。
+
     Args:
         file_data: 原始圖片的 bytes
         mime_type: 圖片的 MIME type
+        variant_types: 只產生這些變體（預設全部；encoder 分組平行處理時使用）
+
+    Raises:
+        SourceTooLargeError
 
     Returns:
-        list of dict, 每個 dict 包含:
+        list of dict（依 IMAGE_VARIANTS 順序）, 每個 dict 包含:
         {
             'variant_type': 'thumbnail',
+            'format': 'jpeg',
             'data': bytes,
             'width': 245,
             'height': 163,
@@ -58,6 +111,7 @@ def generate_variants(
             'content_type': 'image/jpeg',
             'ext': '.jpg',
         }
+        同一 variant_type 先列原圖格式，其後為額外格式。
     """
     if not is_image(mime_type):
         return []
@@ -67,59 +121,688 @@ def generate_variants(
     except Exception:
         return []
 
-    # 保留原始模式，轉換 RGBA 為 RGB（JPEG 不支援 alpha）
-    original_width, original_height = img.size
-    output_format, ext, content_type = _get_output_format(mime_type)
+    animate = _should_animate(img)
+    orientation = 1 if animate else _orientation(img)
+    original_width, original_height = _oriented_size(img.size, orientation)
+    targets = _plan_targets(original_width, original_height, animate)
+    if variant_types is not None:
+        wanted = set(variant_types)
+        targets = [t for t in targets if t[0] in wanted]
+    if not targets:
+        return []
+    if animate:
+        return _generate_animated(img, mime_type, targets)
+
+    # 超過預算的動畫只取第一格，不產生額外格式（避免依 Accept 選到靜態圖）
+    animated = getattr(img, 'is_animated', False)
+
+    try:
+        working = _apply_orientation(_decode_for_size(img, _oriented_size(targets[0][1], orientation)), orientation)
+    except SourceTooLargeError:
+        raise
+    except Exception:
+        return []
 
     results = []
+    for variant_type, size in targets:
+        # 由上一個結果縮小；reducing_gap 讓大倍率縮小先走 reduce() 再 LANCZOS
+        resized = working.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        working.close()
+        working = resized
 
-    for variant_type, spec in IMAGE_VARIANTS.items():
-        max_w = spec['max_width']
-        max_h = spec['max_height']
-        quality = spec['quality']
+        encodings = _encodings(mime_type, IMAGE_VARIANTS[variant_type]['quality'], animated)
+        results.extend(_encode_variant(resized, variant_type, encodings))
+    working.close()
+
+    results.sort(key=lambda r: variant_order(r['variant_type']))
+    return results
+
+
+def _should_animate(img: Image.Image) -> bool:
+    """是否以動畫方式產生變體（多格且總像素數在 ANIMATION_MAX_PIXELS 內）。"""
+    frames = getattr(img, 'n_frames', 1)
+    return frames > 1 and frames * img.size[0] * img.size[1] <= ANIMATION_MAX_PIXELS
+
+
+def _generate_animated(img: Image.Image, mime_type: str, targets: List[Tuple[str, Tuple[int, int]]]) -> List[dict]:
+    """
+    逐格解碼一次，每格由大到小串接縮小到各目標尺寸，再將各尺寸的影格編碼為動畫。
+    每格的顯示時間與循環次數沿用原圖；ANIMATED_ORIGINAL 只編碼 ANIMATED_FORMATS
+    （原圖格式即原檔本身）。
+    """
+    has_alpha = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+    mode = 'RGBA' if has_alpha else 'RGB'
+    frames = {variant_type: [] for variant_type, _ in targets}
+    durations = []
+    try:
+        for frame in ImageSequence.Iterator(img):
+            durations.append(frame.info.get('duration', img.info.get('duration', 100)))
+            working = frame.convert(mode)
+            for variant_type, size in targets:
+                if working.size != size:
+                    working = working.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+                frames[variant_type].append(working)
+    except Exception:
+        return []
+    loop = img.info.get('loop', 0)
+
+    results = []
+    for variant_type, size in targets:
+        if variant_type == ANIMATED_ORIGINAL:
+            encodings = _animated_encodings(mime_type, ANIMATED_ORIGINAL_QUALITY, include_source=False)
+        else:
+            encodings = _animated_encodings(mime_type, IMAGE_VARIANTS[variant_type]['quality'])
+        for fmt, pil_format, ext, content_type, quality in encodings:
+            data = _encode_animation(frames[variant_type], pil_format, quality, durations, loop)
+            results.append({
+                'variant_type': variant_type,
+                'format': fmt,
+                'data': data,
+                'width': size[0],
+                'height': size[1],
+                'file_size': len(data),
+                'content_type': content_type,
+                'ext': ext,
+            })
+        for frame in frames.pop(variant_type):
+            frame.close()
+
+    results.sort(key=lambda r: variant_order(r['variant_type']))
+    return results
+
+
+def generate_crops(
+    file_data: bytes,
+    mime_type: str,
+    focal_point: Optional[dict] = None,
+) -> List[dict]:
+    """
+    依焦點產生 CROP_VARIANTS 的固定比例裁切圖（art direction）。
+
+    每種比例取原圖內最大的該比例裁切框，讓焦點盡量位於框的中心（靠近邊緣時貼齊邊緣），
+    再縮小為各個寬度；原圖不足最小寬度時只產生一張原尺寸的裁切圖。
+    解碼只做一次，只保留足以產生最大裁切圖的像素量。
+
+    Args:
+        focal_point: {'x': 0~1, 'y': 0~1}（相對依 EXIF 方向轉正後的寬高），None 時為中心
+
+    Returns:
+        與 generate_variants 相同格式的 list，另含 'aspect'（CROP_VARIANTS 的 key）；
+        variant_type 為 crop_<比例>_<寬度>，例如 crop_16x9_1280
+
+    Raises:
+        SourceTooLargeError: 解碼後的像素數超過 MAX_SOURCE_PIXELS
+    """
+    if not is_image(mime_type):
+        return []
+
+    try:
+        img = Image.open(io.BytesIO(file_data))
+    except Exception:
+        return []
+
+    orientation = _orientation(img)
+    width, height = _oriented_size(img.size, orientation)
+    plans = _plan_crops(width, height, focal_point or DEFAULT_FOCAL_POINT)
+    # 最大裁切圖相對裁切框的縮放比例，決定需要解碼的像素量
+    scale = max(targets[0][1][0] / (box[2] - box[0]) for _, box, targets in plans)
+    animated = getattr(img, 'is_animated', False)
+
+    try:
+        size = (max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale)))
+        working = _apply_orientation(_decode_for_size(img, _oriented_size(size, orientation)), orientation)
+    except SourceTooLargeError:
+        raise
+    except Exception:
+        return []
+
+    # draft() / reduce() 後的座標比例
+    kx, ky = working.size[0] / width, working.size[1] / height
+    results = []
+    for aspect, box, targets in plans:
+        encodings = _encodings(mime_type, CROP_VARIANTS[aspect]['quality'], animated)
+        source, source_box = working, (box[0] * kx, box[1] * ky,
+                                       min(box[2] * kx, working.size[0]), min(box[3] * ky, working.size[1]))
+        for variant_type, size in targets:
+            resized = source.resize(size, Image.Resampling.LANCZOS, box=source_box, reducing_gap=3.0)
+            if source is not working:
+                source.close()
+            source, source_box = resized, None
+            for result in _encode_variant(resized, variant_type, encodings):
+                result['aspect'] = aspect
+                results.append(result)
+        source.close()
+    working.close()
+    return results
+
+
+def _plan_crops(
+    width: int, height: int, focal_point: dict,
+) -> List[Tuple[str, Tuple[float, float, float, float], List[Tuple[str, Tuple[int, int]]]]]:
+    """
+    計算每種比例的裁切框（原圖座標）與輸出尺寸（由大到小）。
+
+    Returns:
+        [(aspect, (left, top, right, bottom), [(variant_type, (w, h)), ...]), ...]
+    """
+    fx = min(max(float(focal_point.get('x', 0.5)), 0.0), 1.0)
+    fy = min(max(float(focal_point.get('y', 0.5)), 0.0), 1.0)
+
+    plans = []
+    for aspect, spec in CROP_VARIANTS.items():
+        ratio_w, ratio_h = spec['ratio']
+        crop_w = min(width, height * ratio_w / ratio_h)
+        crop_h = crop_w * ratio_h / ratio_w
+        left = min(max(fx * width - crop_w / 2, 0.0), width - crop_w)
+        top = min(max(fy * height - crop_h / 2, 0.0), height - crop_h)
+
+        widths = sorted(spec['widths'], reverse=True)
+        targets = [
+            (f'crop_{aspect}_{w}', (w, max(1, round(w * ratio_h / ratio_w))))
+            for w in widths if w <= crop_w
+        ]
+        if not targets:
+            # 原圖太小：以最小規格的名稱輸出原尺寸裁切圖
+            w = max(1, int(crop_w))
+            targets = [(f'crop_{aspect}_{widths[-1]}', (w, max(1, round(w * ratio_h / ratio_w))))]
+        plans.append((aspect, (left, top, left + crop_w, top + crop_h), targets))
+    return plans
+
+
+def optimize_original(file_data: bytes, mime_type: str) -> Optional[dict]:
+    """
+    無損最佳化原檔：只移除 metadata，不改變任何像素。
+
+    - JPEG：逐一複製 marker segment，移除 EXIF / XMP / 內嵌縮圖（APP1、JFXX）、其他 APPn 與
+      註解，保留 JFIF、ICC profile、Adobe（色彩轉換）與所有解碼需要的區段；壓縮資料原封不動
+      複製（不重新編碼）。EXIF 方向不為 1 時改寫為只含方向的最小 EXIF，像素不旋轉。
+    - PNG：以 optimize（最高壓縮等級）重新存檔並移除文字區塊，解碼後的像素與原檔完全相同
+      才採用。
+    只處理 OPTIMIZABLE_TYPES；WebP / GIF 重新編碼會失真或影響動畫，動畫 PNG 亦略過。
+
+    Returns:
+        {
+            'data': 最佳化後的 bytes；沒有變小時為 None（保留原檔）,
+            'width', 'height': 依 EXIF 方向轉正後的顯示尺寸,
+            'original_size', 'optimized_size': bytes,
+            'orientation': EXIF 方向（1~8，1 為不需轉正）,
+        }
+        無法處理時回傳 None
+    """
+    if mime_type not in OPTIMIZABLE_TYPES:
+        return None
+    try:
+        img = Image.open(io.BytesIO(file_data))
+        if getattr(img, 'n_frames', 1) > 1:
+            return None
+        orientation = _orientation(img)
+        if img.format == 'JPEG':
+            # 不解碼，沒有像素數上限
+            data = _strip_jpeg(file_data, orientation)
+        elif img.format == 'PNG':
+            if img.size[0] * img.size[1] > MAX_SOURCE_PIXELS:
+                return None
+            data = _optimize_png(img, orientation)
+        else:
+            return None
+    except Exception:
+        return None
+
+    if data is not None and len(data) >= len(file_data):
+        data = None
+    width, height = _oriented_size(img.size, orientation)
+    return {
+        'data': data,
+        'width': width,
+        'height': height,
+        'original_size': len(file_data),
+        'optimized_size': len(data) if data is not None else len(file_data),
+        'orientation': orientation,
+    }
+
+
+# JPEG marker
+_SOI, _EOI, _SOS = 0xD8, 0xD9, 0xDA
+_APP0, _APP1, _APP2, _APP14, _APP15, _COM = 0xE0, 0xE1, 0xE2, 0xEE, 0xEF, 0xFE
+
+
+def _keep_jpeg_segment(marker: int, payload: bytes) -> bool:
+    """最佳化時是否保留此 segment（APPn / COM 只保留解碼與色彩需要的）。"""
+    if marker == _APP0:
+        return payload.startswith(b'JFIF\0')       # JFXX 為內嵌縮圖
+    if marker == _APP2:
+        return payload.startswith(b'ICC_PROFILE\0')
+    if marker == _APP14:
+        return payload.startswith(b'Adobe')         # 決定 YCbCr / CMYK 的色彩轉換
+    return not (_APP0 <= marker <= _APP15 or marker == _COM)
+
+
+def _strip_jpeg(file_data: bytes, orientation: int = 1) -> Optional[bytes]:
+    """
+    移除 JPEG 的 metadata segment（見 _keep_jpeg_segment），壓縮資料逐 byte 複製，
+    EOI 之後的資料（例如 MPF 附加的預覽圖）不保留。orientation 不為 1 時插入只含方向的 EXIF。
+    結構無法解析時回傳 None。
+    """
+    if file_data[:2] != b'\xff\xd8':
+        return None
+    out = [b'\xff\xd8']
+    if orientation != 1:
+        exif = Image.Exif()
+        exif[ExifTags.Base.Orientation] = orientation
+        exif_bytes = exif.tobytes()
+        if not exif_bytes.startswith(b'Exif\0\0'):
+            exif_bytes = b'Exif\0\0' + exif_bytes
+        exif_segment = b'\xff\xe1' + (len(exif_bytes) + 2).to_bytes(2, 'big') + exif_bytes
+    else:
+        exif_segment = b''
+
+    # EXIF 緊接在 JFIF 之後（沒有 JFIF 時在 SOI 之後）
+    exif_at = 1
+    pos, size = 2, len(file_data)
+    while pos < size:
+        if file_data[pos] != 0xFF:
+            return None
+        while pos < size and file_data[pos] == 0xFF:     # 填充的 0xFF
+            pos += 1
+        if pos >= size:
+            return None
+        marker = file_data[pos]
+        pos += 1
+        if marker == _EOI:
+            out.append(b'\xff\xd9')
+            break
+        if 0xD0 <= marker <= 0xD7 or marker == 0x01:      # 沒有長度欄位的 marker
+            out.append(bytes((0xFF, marker)))
+            continue
+        if pos + 2 > size:
+            return None
+        length = int.from_bytes(file_data[pos:pos + 2], 'big')
+        end = pos + length
+        if length < 2 or end > size:
+            return None
+        payload = file_data[pos + 2:end]
+        if _keep_jpeg_segment(marker, payload):
+            out.append(file_data[pos - 2:end])
+            if marker == _APP0 and len(out) == 2:
+                exif_at = 2
+        pos = end
+
+        if marker == _SOS:
+            # 壓縮資料：0xFF 之後為 0x00（跳脫）或 RSTn 時屬於資料本身，其餘為下一個 marker
+            scan_start = pos
+            while True:
+                pos = file_data.find(b'\xff', pos)
+                if pos < 0 or pos + 1 >= size:
+                    return None
+                following = file_data[pos + 1]
+                if following == 0x00 or 0xD0 <= following <= 0xD7 or following == 0xFF:
+                    pos += 1 if following == 0xFF else 2
+                    continue
+                break
+            out.append(file_data[scan_start:pos])
+    else:
+        return None
+    if exif_segment:
+        out.insert(exif_at, exif_segment)
+    return b''.join(out)
 
+
+def _optimize_png(img: Image.Image, orientation: int = 1) -> Optional[bytes]:
+    """以 optimize 重新存 PNG（只保留 ICC profile 與方向）；像素與原檔不同時回傳 None。"""
+    save_kwargs = {'format': 'PNG', 'optimize': True}
+    if img.info.get('icc_profile'):
+        save_kwargs['icc_profile'] = img.info['icc_profile']
+    if 'transparency' in img.info:
+        save_kwargs['transparency'] = img.info['transparency']
+    if orientation != 1:
+        exif = Image.Exif()
+        exif[ExifTags.Base.Orientation] = orientation
+        save_kwargs['exif'] = exif
+    buffer = io.BytesIO()
+    img.save(buffer, **save_kwargs)
+    data = buffer.getvalue()
+
+    with Image.open(io.BytesIO(data)) as check:
+        check.load()
+        if check.mode != img.mode or check.size != img.size or check.tobytes() != img.tobytes():
+            return None
+        if img.mode == 'P' and check.getpalette() != img.getpalette():
+            return None
+    return data
+
+
+def _orientation(img: Image.Image) -> int:
+    """EXIF 方向（1~8）；沒有或無效時為 1。"""
+    try:
+        orientation = img.getexif().get(ExifTags.Base.Orientation, 1)
+    except Exception:
+        return 1
+    return orientation if orientation in range(1, 9) else 1
+
+
+def _oriented_size(size: Tuple[int, int], orientation: int) -> Tuple[int, int]:
+    """依 EXIF 方向轉正後的寬高（5~8 為旋轉 90 度，存放的寬高與顯示相反）。"""
+    return (size[1], size[0]) if orientation in (5, 6, 7, 8) else size
+
+
+# EXIF 方向 → 轉正所需的 transpose（與 ImageOps.exif_transpose 相同）
+_ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+def _apply_orientation(img: Image.Image, orientation: int) -> Image.Image:
+    """依 EXIF 方向轉正已解碼的圖片（原圖不需轉正時直接回傳，否則關閉原圖）。"""
+    method = _ORIENTATION_TRANSPOSE.get(orientation)
+    if method is None:
+        return img
+    oriented = img.transpose(method)
+    img.close()
+    return oriented
+
+
+def render_image(
+    file_data: bytes,
+    mime_type: str,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    fit: str = 'contain',
+    output_format: Optional[str] = None,
+    quality: int = RENDER_QUALITY,
+) -> dict:
+    """
+    依指定尺寸產生單一衍生圖（/render 端點使用），不放大原圖。
+
+    Args:
+        width / height: 目標尺寸，只給一邊時等比例縮放
+        fit: 'contain'（縮放到框內）或 'cover'（填滿框後置中裁切，需同時給寬高）
+        output_format: RENDER_FORMATS 的 key；None 時沿用原圖格式
+
+    Returns:
+        {'data': bytes, 'width': int, 'height': int, 'content_type': str, 'ext': str}
+
+    Raises:
+        ValueError: 不是可處理的圖片；解碼後超過 MAX_SOURCE_PIXELS 時為 SourceTooLargeError
+    """
+    if not is_image(mime_type):
+        raise ValueError(f'Not a processable image: {mime_type}')
+    try:
+        img = Image.open(io.BytesIO(file_data))
+    except Exception as e:
+        raise ValueError(f'Cannot decode image: {e}')
+
+    # 尺寸依 EXIF 方向轉正後計算（原檔保留方向，不實際旋轉像素）
+    orientation = _orientation(img)
+    original_width, original_height = _oriented_size(img.size, orientation)
+
+    resize_to, crop_to = _plan_render(original_width, original_height, width, height, fit)
+    if output_format is None:
+        pil_format, ext, content_type = _get_output_format(mime_type)
+    else:
+        pil_format, ext, content_type = RENDER_FORMATS[output_format]
+
+    working = _apply_orientation(_decode_for_size(img, _oriented_size(resize_to, orientation)), orientation)
+    if working.size != resize_to:
+        resized = working.resize(resize_to, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        working.close()
+        working = resized
+    if crop_to != resize_to:
+        left = (resize_to[0] - crop_to[0]) // 2
+        top = (resize_to[1] - crop_to[1]) // 2
+        cropped = working.crop((left, top, left + crop_to[0], top + crop_to[1]))
+        working.close()
+        working = cropped
+
+    data = _encode(working, pil_format, quality)
+    result = {
+        'data': data,
+        'width': working.size[0],
+        'height': working.size[1],
+        'content_type': content_type,
+        'ext': ext,
+    }
+    working.close()
+    return result
+
+
+def _plan_render(
+    width: int, height: int, target_width: Optional[int], target_height: Optional[int], fit: str,
+) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+    """
+    計算 render_image 的縮放尺寸與最終（裁切後）尺寸，皆不超過原圖。
+
+    Returns:
+        (resize_to, crop_to)
+    """
+    if fit == 'cover' and target_width and target_height:
+        # 原圖小於要求時，以相同長寬比縮小裁切框而不是放大
+        k = min(1.0, width / target_width, height / target_height)
+        crop_to = (max(1, round(target_width * k)), max(1, round(target_height * k)))
+        scale = max(crop_to[0] / width, crop_to[1] / height)
+        resize_to = (max(crop_to[0], round(width * scale)), max(crop_to[1], round(height * scale)))
+        return resize_to, crop_to
+
+    scale = 1.0
+    if target_width:
+        scale = min(scale, target_width / width)
+    if target_height:
+        scale = min(scale, target_height / height)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return size, size
+
+
+def placeholder_info(file_data: bytes) -> dict:
+    """
+    由小圖（縮圖變體）產生 LQIP 與主色，供前端在圖片載入前顯示。
+
+    Returns:
+        {'lqip': 'data:image/webp;base64,...', 'dominant_color': '#rrggbb'}；無法解碼時回傳 {}
+    """
+    try:
+        with Image.open(io.BytesIO(file_data)) as img:
+            img.draft('RGB', (LQIP_MAX_SIZE * 2, LQIP_MAX_SIZE * 2))
+            has_alpha = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+            img = _apply_orientation(img.convert('RGBA' if has_alpha else 'RGB'), _orientation(img))
+    except Exception:
+        return {}
+
+    tiny = img.copy()
+    tiny.thumbnail((LQIP_MAX_SIZE, LQIP_MAX_SIZE), Image.Resampling.LANCZOS)
+    pil_format, _, content_type = OUTPUT_FORMATS['webp' if 'WEBP' in Image.SAVE else 'jpeg']
+    lqip = _encode(tiny if pil_format == 'WEBP' else tiny.convert('RGB'), pil_format, LQIP_QUALITY)
+
+    # 主色：縮小後以 median cut 量化，取像素數最多的顏色（比平均色鮮明）
+    sample = img.convert('RGB')
+    sample.thumbnail((DOMINANT_COLOR_SAMPLE, DOMINANT_COLOR_SAMPLE), Image.Resampling.BOX)
+    quantized = sample.quantize(colors=5, method=Image.Quantize.MEDIANCUT)
+    _, index = max(quantized.getcolors())
+    r, g, b = quantized.getpalette()[index * 3:index * 3 + 3]
+
+    return {
+        'lqip': f'data:{content_type};base64,{base64.b64encode(lqip).decode()}',
+        'dominant_color': f'#{r:02x}{g:02x}{b:02x}',
+    }
+
+
+def _plan_targets(width: int, height: int, animated: bool = False) -> List[Tuple[str, Tuple[int, int]]]:
+    """
+    計算每個變體的目標尺寸（等比例縮放，與 thumbnail() 相同的取整方式），
+    原圖已小於規格者略過；依像素數由大到小排序，供串接縮圖使用。
+    animated 時另加原尺寸的 ANIMATED_ORIGINAL（排在最前面）。
+    """
+    targets = [(ANIMATED_ORIGINAL, (width, height))] if animated else []
+    for variant_type, spec in IMAGE_VARIANTS.items():
+        max_w, max_h = spec['max_width'], spec['max_height']
         # 如果原圖比目標小，跳過這個變體
-        if original_width <= max_w and original_height <= max_h:
+        if width <= max_w and height <= max_h:
             continue
+        scale = min(max_w / width, max_h / height)
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        targets.append((variant_type, size))
+    targets.sort(key=lambda t: t[1][0] * t[1][1], reverse=True)
+    return targets
 
-        # 等比例縮放
-        resized = img.copy()
-        resized.thumbnail((max_w, max_h), Image.Resampling.LANCZOS)
-
-        # 轉為 bytes
-        buffer = io.BytesIO()
-        save_img = resized
-        if output_format == 'JPEG' and save_img.mode in ('RGBA', 'P'):
-            save_img = save_img.convert('RGB')
-
-        # 清除可能導致 "cannot convert float infinity to integer" 的異常 DPI 元數據
-        save_kwargs = {'format': output_format, 'optimize': True}
-        if output_format in ('JPEG', 'WEBP'):
-            save_kwargs['quality'] = quality
-        if 'dpi' in save_img.info:
-            dpi = save_img.info['dpi']
-            try:
-                if any(not (0 < d < 1e6) for d in dpi):
-                    del save_img.info['dpi']
-            except (TypeError, ValueError):
-                del save_img.info['dpi']
 
-        save_img.save(buffer, **save_kwargs)
-        data = buffer.getvalue()
+def variant_order(variant_type: str) -> int:
+    """變體的排序（ANIMATED_ORIGINAL 在前，其餘依 IMAGE_VARIANTS 順序）。"""
+    if variant_type == ANIMATED_ORIGINAL:
+        return -1
+    return list(IMAGE_VARIANTS).index(variant_type)
+
+
+def _decode_for_size(img: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """
+    解碼圖片，只保留足以產生 ``size`` 的像素量。
+
+    JPEG：draft() 讓 libjpeg 在解碼時就縮小，保留至少 1.5 倍於目標的解析度
+    （DCT scaling 品質良好，不需 2 倍餘裕）。
+    其他格式：完整解碼後以 reduce() 整數倍縮小，保留約 2 倍於目標的解析度
+    讓後續 LANCZOS 維持品質。
+
+    Raises:
+        SourceTooLargeError: 實際要解碼的像素數（JPEG 為 draft() 後）超過 MAX_SOURCE_PIXELS
+    """
+    if img.format == 'JPEG':
+        draft_size = (int(size[0] * 1.5), int(size[1] * 1.5))
+        img.draft('RGB' if img.mode in ('RGB', 'YCbCr') else img.mode, draft_size)
+    # draft() 後 img.size 即為解碼尺寸；在解碼前檢查，避免解壓縮炸彈
+    if img.size[0] * img.size[1] > MAX_SOURCE_PIXELS:
+        raise SourceTooLargeError(
+            f'Image too large to decode: {img.size[0]}x{img.size[1]} (max {MAX_SOURCE_PIXELS} pixels)'
+        )
+    img.load()
+
+    # 調色盤 / 灰階透明 / CMYK 先轉為可用 LANCZOS 縮放的模式（只轉一次）
+    if img.mode == 'P':
+        img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+    elif img.mode in ('LA', 'PA'):
+        img = img.convert('RGBA')
+    elif img.mode not in ('RGB', 'RGBA', 'L'):
+        img = img.convert('RGB')
+
+    factor = min(img.size[0] // (size[0] * 2), img.size[1] // (size[1] * 2))
+    if factor >= 2:
+        reduced = img.reduce(factor)
+        img.close()
+        img = reduced
+    return img
+
+
+def _encodings(mime_type: str, quality: int, animated: bool = False) -> List[tuple]:
+    """
+    變體的編碼方式：原圖格式在前，其後為 Pillow 支援的 VARIANT_EXTRA_FORMATS
+    （動畫圖片只有原圖格式）。
+
+    Returns:
+        [(格式名稱, PIL_format, ext, content_type, quality), ...]
+    """
+    output_format, ext, content_type = _get_output_format(mime_type)
+    encodings = [(output_format.lower(), output_format, ext, content_type, quality)]
+    if not animated:
+        for fmt in supported_extra_formats():
+            pil_format, fmt_ext, fmt_content_type = OUTPUT_FORMATS[fmt]
+            if pil_format != output_format:
+                encodings.append((fmt, pil_format, fmt_ext, fmt_content_type,
+                                  VARIANT_EXTRA_FORMATS[fmt]['quality'] or quality))
+    return encodings
+
+
+def _animated_encodings(mime_type: str, quality: int, include_source: bool = True) -> List[tuple]:
+    """動畫變體的編碼方式：原圖格式（include_source 時）與 Pillow 支援的 ANIMATED_FORMATS。"""
+    output_format, ext, content_type = _get_output_format(mime_type)
+    encodings = [(output_format.lower(), output_format, ext, content_type, quality)] if include_source else []
+    for fmt in ANIMATED_FORMATS:
+        pil_format, fmt_ext, fmt_content_type = OUTPUT_FORMATS[fmt]
+        if pil_format != output_format and fmt in supported_extra_formats():
+            encodings.append((fmt, pil_format, fmt_ext, fmt_content_type,
+                              VARIANT_EXTRA_FORMATS[fmt]['quality'] or quality))
+    return encodings
+
 
+def _encode_animation(frames: List[Image.Image], output_format: str, quality: int,
+                      durations: List[int], loop: int) -> bytes:
+    """將影格編碼為動畫（GIF / WebP）。"""
+    save_kwargs = {
+        'format': output_format,
+        'save_all': True,
+        'append_images': frames[1:],
+        'duration': durations,
+        'loop': loop,
+    }
+    if output_format == 'GIF':
+        # 每格都是完整畫面，先清除前一格再繪製（避免透明區域殘影）
+        save_kwargs.update(optimize=True, disposal=2)
+    elif output_format == 'WEBP':
+        save_kwargs.update(quality=quality, method=4)
+    buffer = io.BytesIO()
+    frames[0].save(buffer, **save_kwargs)
+    return buffer.getvalue()
+
+
+def _encode_variant(img: Image.Image, variant_type: str, encodings: List[tuple]) -> List[dict]:
+    """以 _encodings() 的每種格式編碼同一張縮圖。"""
+    results = []
+    for fmt, pil_format, ext, content_type, quality in encodings:
+        data = _encode(img, pil_format, quality)
         results.append({
             'variant_type': variant_type,
+            'format': fmt,
             'data': data,
-            'width': resized.size[0],
-            'height': resized.size[1],
+            'width': img.size[0],
+            'height': img.size[1],
             'file_size': len(data),
             'content_type': content_type,
             'ext': ext,
         })
-
     return results
 
 
+def _encode(img: Image.Image, output_format: str, quality: int) -> bytes:
+    """將變體編碼為 bytes。"""
+    save_img = img
+    if output_format == 'JPEG' and save_img.mode != 'RGB' and save_img.mode != 'L':
+        save_img = save_img.convert('RGB')
+
+    # 清除可能導致 "cannot convert float infinity to integer" 的異常 DPI 元數據
+    save_kwargs = {'format': output_format}
+    if output_format in ('JPEG', 'PNG', 'GIF'):
+        save_kwargs['optimize'] = True
+    if output_format == 'JPEG':
+        save_kwargs['progressive'] = True
+    if output_format in ('JPEG', 'WEBP', 'AVIF'):
+        save_kwargs['quality'] = quality
+    # 只保留 ICC profile（色彩正確），EXIF 等其他 metadata 不寫入變體
+    if output_format != 'GIF' and save_img.info.get('icc_profile'):
+        save_kwargs['icc_profile'] = save_img.info['icc_profile']
+    if 'dpi' in save_img.info:
+        dpi = save_img.info['dpi']
+        try:
+            if any(not (0 < d < 1e6) for d in dpi):
+                del save_img.info['dpi']
+        except (TypeError, ValueError):
+            del save_img.info['dpi']
+
+    buffer = io.BytesIO()
+    save_img.save(buffer, **save_kwargs)
+    return buffer.getvalue()
+
+
+# 變體格式名稱 → (PIL_format, file_extension, content_type)
+OUTPUT_FORMATS = {
+    'jpeg': ('JPEG', '.jpg', 'image/jpeg'),
+    'png': ('PNG', '.png', 'image/png'),
+    'webp': ('WEBP', '.webp', 'image/webp'),
+    'gif': ('GIF', '.gif', 'image/gif'),
+    'avif': ('AVIF', '.avif', 'image/avif'),
+}
+
+
 def _get_output_format(mime_type: str) -> Tuple[str, str, str]:
     """
     根據 MIME type 決定輸出格式。
@@ -127,13 +810,24 @@ def _get_output_format(mime_type: str) -> Tuple[str, str, str]:
     Returns:
         (PIL_format, file_extension, content_type)
     """
-    mapping = {
-        'image/jpeg': ('JPEG', '.jpg', 'image/jpeg'),
-        'image/png': ('PNG', '.png', 'image/png'),
-        'image/webp': ('WEBP', '.webp', 'image/webp'),
-        'image/gif': ('GIF', '.gif', 'image/gif'),
-    }
-    return mapping.get(mime_type, ('JPEG', '.jpg', 'image/jpeg'))
+    for pil_format, ext, content_type in OUTPUT_FORMATS.values():
+        if content_type == mime_type and content_type in SUPPORTED_IMAGE_TYPES:
+            return pil_format, ext, content_type
+    return OUTPUT_FORMATS['jpeg']
+
+
+def source_format(mime_type: str) -> str:
+    """變體的原圖格式名稱（'jpeg' / 'png' / 'webp' / 'gif'）。"""
+    return _get_output_format(mime_type)[0].lower()
+
+
+@functools.lru_cache(maxsize=None)
+def supported_extra_formats() -> Tuple[str, ...]:
+    """目前 Pillow 可以編碼的 VARIANT_EXTRA_FORMATS。"""
+    Image.init()
+    return tuple(fmt for fmt in VARIANT_EXTRA_FORMATS if OUTPUT_FORMATS[fmt][0] in Image.SAVE)
 
 
-__all__ = ['is_image', 'get_image_dimensions', 'generate_variants']
+__all__ = ['SourceTooLargeError', 'is_image', 'get_image_dimensions', 'generate_variants', 'generate_crops', 'optimize_original',
+           'render_image', 'variant_order', 'placeholder_info', 'source_format',
+           'supported_extra_formats', 'OUTPUT_FORMATS']
@@ -0,0 +1,337 @@
+"""
+Media Library - 背景工作佇列
+
+以 media_lib.jobs 資料表作為工作佇列（不需額外的 broker）：
+
+- enqueue_job()：在呼叫端的 transaction 內新增工作，與檔案記錄一起 commit。
+- claim_job()：SELECT ... FOR UPDATE SKIP LOCKED 領取一筆工作，多個 worker
+  （多個 gunicorn process / 獨立 CLI worker）同時領取也不會重複。
+- 失敗時依嘗試次數指數退避（run_after）重試，超過 max_attempts 標記為 failed；
+  running 太久（worker 當掉）的工作會被重新領取，已用完嘗試次數者標記為 failed
+  （例如每次都讓 worker OOM 的圖片，不會無限重試）。
+- 執行時間可能超過 JOB_STALE_AFTER 的處理函式以 touch_job() 續約（更新 locked_at）；
+  續約失敗表示工作已被其他 worker 重新領取，應以 JobLeaseLost 結束。run_job 標記完成前
+  同樣確認仍持有工作，逾時後被重新領取的工作不會由舊 worker 標記為 done。
+
+工作處理函式以 @job_handler('<job_type>') 註冊（見 tasks.py）。
+
+Worker（每個執行緒各自的 worker_id，租約以此判斷）：
+- 獨立：flask media-lib worker（見 cli.py），正式環境以獨立的 service / container 執行，
+  變體編碼不佔用 gunicorn 的 web process。
+- 內嵌：MEDIA_JOBS_EMBEDDED_WORKER=True 時，每個 process 在第一個 request
+  啟動背景執行緒（開發環境預設開啟；正式環境只適合沒有獨立 worker 的小型部署）。
+"""
+
+import os
+import socket
+import threading
+import traceback
+import uuid
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from flask import Flask, current_app
+from sqlalchemy import and_, or_, select
+
+from core.backend_engine.factory import db
+from packages.media_lib.config import (
+    JOB_MAX_ATTEMPTS,
+    JOB_POLL_INTERVAL,
+    JOB_RETRY_BASE_DELAY,
+    JOB_RETRY_MAX_DELAY,
+    JOB_STALE_AFTER,
+)
+from packages.media_lib.dedup import sharing_files
+from packages.media_lib.models import MLJob
+
+
+_handlers: Dict[str, Callable[[MLJob], None]] = {}
+
+# 同 process 內有新工作時喚醒內嵌 worker（跨 process 靠輪詢）
+_wakeup = threading.Event()
+
+
+class PermanentJobError(Exception):
+    """不可重試的錯誤（例如原檔已不存在），直接標記 failed。"""
+
+
+class JobLeaseLost(Exception):
+    """工作已被其他 worker 重新領取；目前的 worker 停止處理，不記錄成功或失敗。"""
+
+
+def job_handler(job_type: str):
+    """註冊工作處理函式的 decorator。"""
+    def decorator(func):
+        _handlers[job_type] = func
+        return func
+    return decorator
+
+
+# =============================================================================
+# 佇列操作
+# =============================================================================
+
+def enqueue_job(job_type: str, file_id: Optional[int] = None, payload: Optional[dict] = None,
+                max_attempts: Optional[int] = None) -> MLJob:
+    """
+    新增工作（不 commit，由呼叫端與其他變更一起 commit）。
+    commit 後呼叫 notify_workers() 可立即喚醒同 process 的 worker。
+    """
+    job = MLJob(
+        job_type=job_type,
+        file_id=file_id,
+        payload=payload or {},
+        max_attempts=max_attempts or current_app.config.get('MEDIA_JOBS_MAX_ATTEMPTS', JOB_MAX_ATTEMPTS),
+    )
+    db.session.add(job)
+    return job
+
+
+def notify_workers() -> None:
+    """喚醒同 process 的內嵌 worker。"""
+    _wakeup.set()
+
+
+def claim_job(worker_id: str, job_types: Optional[Iterable[str]] = None) -> Optional[MLJob]:
+    """
+    領取一筆可執行的工作並標記為 running（已 commit）。
+
+    Returns:
+        MLJob 或 None（目前沒有工作）
+    """
+    now = db.func.now()
+    stale_before = now - timedelta(seconds=JOB_STALE_AFTER)
+    _fail_exhausted_stale(stale_before, job_types)
+
+    stmt = (
+        select(MLJob)
+        .where(or_(
+            and_(MLJob.status == 'pending', MLJob.run_after <= now),
+            and_(MLJob.status == 'running', MLJob.locked_at < stale_before,
+                 MLJob.attempts < MLJob.max_attempts),
+        ))
+        .order_by(MLJob.run_after, MLJob.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    if job_types:
+        stmt = stmt.where(MLJob.job_type.in_(list(job_types)))
+
+    job = db.session.execute(stmt).scalar_one_or_none()
+    if job is None:
+        db.session.rollback()
+        return None
+
+    job.status = 'running'
+    job.attempts += 1
+    job.locked_at = now
+    job.locked_by = worker_id
+    db.session.commit()
+    return job
+
+
+def _fail_exhausted_stale(stale_before, job_types: Optional[Iterable[str]] = None) -> None:
+    """
+    running 逾時且已用完嘗試次數的工作標記為 failed（worker 在執行中被終止，
+    _record_failure 不會執行）。
+    """
+    stmt = (
+        select(MLJob)
+        .where(
+            MLJob.status == 'running',
+            MLJob.locked_at < stale_before,
+            MLJob.attempts >= MLJob.max_attempts,
+        )
+        .with_for_update(skip_locked=True)
+    )
+    if job_types:
+        stmt = stmt.where(MLJob.job_type.in_(list(job_types)))
+
+    jobs = db.session.execute(stmt).scalars().all()
+    for job in jobs:
+        job.status = 'failed'
+        job.last_error = f'Worker {job.locked_by} stopped responding (attempt {job.attempts} of {job.max_attempts})'
+        job.locked_at = None
+        _on_job_failed(job)
+        current_app.logger.error(f'Media job {job.job_type} #{job.id} failed permanently: {job.last_error}')
+    if jobs:
+        db.session.commit()
+
+
+def touch_job(job_id: int, worker_id: str, commit: bool = True) -> bool:
+    """
+    續約：仍由 worker_id 持有的 running 工作更新 locked_at，避免執行中被視為逾時重新領取。
+    commit=False 時與呼叫端的其他變更一起 commit（工作列在 commit 前保持鎖定）。
+
+    Returns:
+        False 表示工作已不屬於此 worker（已被重新領取或重設）
+    """
+    updated = MLJob.query.filter_by(id=job_id, locked_by=worker_id, status='running').update(
+        {MLJob.locked_at: db.func.now()}, synchronize_session=False
+    )
+    if commit:
+        db.session.commit()
+    return updated > 0
+
+
+def run_job(job: MLJob) -> bool:
+    """
+    執行已領取的工作，並記錄成功 / 失敗（含重試排程）。
+
+    Returns:
+        True 表示成功
+    """
+    handler = _handlers.get(job.job_type)
+    job_id, worker_id = job.id, job.locked_by
+    try:
+        if handler is None:
+            raise PermanentJobError(f'No handler registered for job type {job.job_type!r}')
+        handler(job)
+        # 執行期間若逾時被其他 worker 重新領取，由新的持有者負責結果
+        if not touch_job(job_id, worker_id, commit=False):
+            raise JobLeaseLost(f'Job {job_id} is no longer held by {worker_id}')
+        job = db.session.get(MLJob, job_id)
+        job.status = 'done'
+        job.last_error = None
+        job.locked_at = None
+        db.session.commit()
+        return True
+    except JobLeaseLost:
+        db.session.rollback()
+        current_app.logger.warning(f'Media job {job_id} was reclaimed by another worker, stopping')
+        return False
+    except Exception as e:
+        db.session.rollback()
+        _record_failure(job_id, e)
+        return False
+
+
+def _record_failure(job_id: int, error: Exception) -> None:
+    job = db.session.get(MLJob, job_id)
+    if job is None:  # 檔案已刪除（CASCADE）
+        return
+
+    permanent = isinstance(error, PermanentJobError)
+    job.last_error = ''.join(traceback.format_exception_only(type(error), error)).strip()[:2000]
+    job.locked_at = None
+
+    if permanent or job.attempts >= job.max_attempts:
+        job.status = 'failed'
+        _on_job_failed(job)
+        current_app.logger.error(f'Media job {job.job_type} #{job.id} failed permanently: {job.last_error}')
+    else:
+        delay = min(JOB_RETRY_BASE_DELAY * 2 ** (job.attempts - 1), JOB_RETRY_MAX_DELAY)
+        job.status = 'pending'
+        job.run_after = db.func.now() + timedelta(seconds=delay)
+        current_app.logger.warning(
+            f'Media job {job.job_type} #{job.id} attempt {job.attempts} failed, retry in {delay}s: {job.last_error}'
+        )
+    db.session.commit()
+
+
+def _on_job_failed(job: MLJob) -> None:
+    """
+    工作最終失敗時，讓等待中（processing）的檔案狀態反映失敗（前端可提示重試）。
+    已是 ready 的檔案（例如焦點變更後的裁切圖工作）維持原狀，既有變體仍可使用。
+    """
+    if job.file_id is not None and job.file is not None:
+        # 共用同一原檔的重複記錄（dedup.py）等待的是同一個工作
+        for ml_file in [job.file] + sharing_files(job.file):
+            if ml_file.processing_status == 'processing':
+                ml_file.processing_status = 'failed'
+
+
+def retry_job(job: MLJob) -> None:
+    """將工作重設為可立即執行（手動重試用，不 commit）。"""
+    job.status = 'pending'
+    job.attempts = 0
+    job.run_after = db.func.now()
+    job.locked_at = None
+    job.locked_by = None
+    job.last_error = None
+
+
+# =============================================================================
+# Worker
+# =============================================================================
+
+class MediaJobWorker:
+    """輪詢並執行工作；內嵌執行緒與 CLI worker 共用。"""
+
+    def __init__(self, app: Flask, job_types: Optional[Iterable[str]] = None, name: Optional[str] = None):
+        self.app = app
+        self.job_types = list(job_types) if job_types else None
+        # 同一執行緒可能建立多個 worker（內嵌 / CLI 一次建立所有執行緒的 worker），以亂數區分
+        self.worker_id = name or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:12]}'
+        self.stop_event = threading.Event()
+
+    def run_once(self) -> bool:
+        """領取並執行一筆工作；沒有工作時回傳 False。"""
+        with self.app.app_context():
+            try:
+                job = claim_job(self.worker_id, self.job_types)
+                if job is None:
+                    return False
+                run_job(job)
+                return True
+            finally:
+                db.session.remove()
+
+    def run_forever(self) -> None:
+        poll_interval = float(self.app.config.get('MEDIA_JOBS_POLL_INTERVAL', JOB_POLL_INTERVAL))
+        while not self.stop_event.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                self.app.logger.error(f'Media job worker error: {e}')
+            _wakeup.wait(poll_interval)
+            _wakeup.clear()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        _wakeup.set()
+
+
+_embedded_workers: List[MediaJobWorker] = []
+_embedded_pid: Optional[int] = None
+_embedded_lock = threading.Lock()
+
+
+def ensure_embedded_worker(app: Flask) -> None:
+    """
+    每個 process 啟動內嵌 worker 執行緒（gunicorn fork 後各自啟動）。
+    執行緒數由 MEDIA_JOBS_WORKER_THREADS 決定；搭配 encoder pool 時多張圖片可同時編碼。
+    """
+    global _embedded_workers, _embedded_pid
+    pid = os.getpid()
+    if _embedded_pid == pid:
+        return
+    with _embedded_lock:
+        if _embedded_pid == pid:
+            return
+        threads = max(1, int(app.config.get('MEDIA_JOBS_WORKER_THREADS', 1)))
+        _embedded_workers = []
+        for i in range(threads):
+            worker = MediaJobWorker(app)
+            threading.Thread(
+                target=worker.run_forever, name=f'media-lib-jobs-{i}', daemon=True
+            ).start()
+            _embedded_workers.append(worker)
+        _embedded_pid = pid
+        app.logger.info(f'Media job worker started in process {pid} ({threads} thread(s))')
+
+
+__all__ = [
+    'PermanentJobError',
+    'JobLeaseLost',
+    'job_handler',
+    'enqueue_job',
+    'notify_workers',
+    'claim_job',
+    'touch_job',
+    'run_job',
+    'retry_job',
+    'MediaJobWorker',
+    'ensure_embedded_worker',
+]
@@ -8,6 +8,7 @@ from datetime import datetime, timezone
 from core.backend_engine.factory import db
 from sqlalchemy.dialects.postgresql import JSONB
 from packages.media_lib.config import SCHEMA_NAME
+from packages.media_lib.image_processor import source_format
 
 SCHEMA_ARGS = {'schema': SCHEMA_NAME}
 
@@ -31,7 +32,11 @@ file_tags = db.Table(
 class MLFolder(db.Model):
     """媒體庫資料夾，支援巢狀階層。"""
     __tablename__ = 'folders'
-    __table_args__ = (SCHEMA_ARGS,)
+    __table_args__ = (
+        # path 前綴查詢（LIKE 'prefix%'）用的索引，見 folders.py
+        db.Index('ix_media_lib_folders_path_pattern', 'path', postgresql_ops={'path': 'varchar_pattern_ops'}),
+        SCHEMA_ARGS,
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
@@ -60,13 +65,18 @@ class MLFolder(db.Model):
 class MLFile(db.Model):
     """媒體檔案主表，每個檔案對應 GCS 上的一個物件。"""
     __tablename__ = 'files'
-    __table_args__ = (SCHEMA_ARGS,)
+    __table_args__ = (
+        # 同一內容只有一筆原始記錄；重複上傳的記錄以 duplicate_of_id 指向它（見 dedup.py）
+        db.Index('uq_media_lib_files_content_hash', 'content_hash', unique=True,
+                 postgresql_where=db.text('duplicate_of_id IS NULL')),
+        SCHEMA_ARGS,
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
     original_filename = db.Column(db.String(255), nullable=False)
     gcs_path = db.Column(db.String(500), nullable=False, index=True)
-    public_url = db.Column(db.String(700), nullable=False)
+    public_url = db.Column(db.String(700), nullable=False, index=True)  # core 依圖片網址查詢裁切圖
     file_size = db.Column(db.Integer)
     mime_type = db.Column(db.String(100))
     width = db.Column(db.Integer)
@@ -76,13 +86,18 @@ class MLFile(db.Model):
     folder_id = db.Column(db.Integer, db.ForeignKey(f'{SCHEMA_NAME}.folders.id'))
     uploaded_by = db.Column(db.Integer, db.ForeignKey('users.id', deferrable=True))
     attributes = db.Column(JSONB, default=dict)
+    # 變體處理狀態：processing（背景工作排隊/處理中）/ ready / failed
+    processing_status = db.Column(db.String(20), nullable=False, default='ready',
+                                  server_default='ready')
+    content_hash = db.Column(db.String(64))   # 原檔 SHA-256（hex）
+    duplicate_of_id = db.Column(db.Integer, db.ForeignKey(f'{SCHEMA_NAME}.files.id'), index=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc),
                            onupdate=lambda: datetime.now(timezone.utc))
 
-    # Relationships
-    variants = db.relationship('MLFileVariant', backref='original', lazy='joined',
-                               cascade='all, delete-orphan')
+    # Relationships（列表以 selectinload 一次載入整頁的變體，見 blueprint._listing_options；
+    # 不用 lazy='joined'，以免每次查詢 / 分頁都 JOIN 所有變體列）
+    variants = db.relationship('MLFileVariant', backref='original', cascade='all, delete-orphan')
     tags = db.relationship('MLTag', secondary=file_tags, backref=db.backref('files', lazy='dynamic'))
 
     def to_dict(self):
@@ -102,13 +117,42 @@ class MLFile(db.Model):
             'folder_id': self.folder_id,
             'uploaded_by': self.uploaded_by,
             'attributes': self.attributes or {},
+            'processing_status': self.processing_status,
+            'lqip': (self.attributes or {}).get('lqip'),
+            'dominant_color': (self.attributes or {}).get('dominant_color'),
+            'srcset': (self.attributes or {}).get('srcset'),
+            'sizes': (self.attributes or {}).get('sizes'),
+            'focal_point': (self.attributes or {}).get('focal_point'),
+            'crops': (self.attributes or {}).get('crops'),
+            'content_hash': self.content_hash,
+            'duplicate_of_id': self.duplicate_of_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'tags': [tag.to_dict() for tag in self.tags],
-            'formats': {v.variant_type: v.to_dict() for v in self.variants},
+            'formats': {
+                variant_type: dict(primary.to_dict(), alternates={
+                    v.format: {'url': v.public_url, 'file_size': v.file_size} for v in alternates
+                })
+                for variant_type, (primary, alternates) in self.grouped_variants().items()
+            },
         }
         return data
 
+    def grouped_variants(self) -> dict:
+        """
+        依 variant_type 分組：{variant_type: (原圖格式的變體, [其他格式的變體])}。
+        動畫圖片的 original（原尺寸動畫 WebP）沒有原圖格式的變體，以第一筆作為代表。
+        """
+        primary_format = source_format(self.mime_type)
+        groups = {}
+        for v in self.variants:
+            groups.setdefault(v.variant_type, []).append(v)
+        result = {}
+        for variant_type, rows in groups.items():
+            primary = next((v for v in rows if v.format == primary_format), rows[0])
+            result[variant_type] = (primary, [v for v in rows if v is not primary])
+        return result
+
     # Relationships (1:1)
     file_metadata = db.relationship('MLFileMetadata', uselist=False, backref='file',
                                      cascade='all, delete-orphan')
@@ -124,7 +168,18 @@ class MLFile(db.Model):
 class MLFileMetadata(db.Model):
     """圖檔的結構化 metadata，供外部系統查詢引用。"""
     __tablename__ = 'file_metadata'
-    __table_args__ = (SCHEMA_ARGS,)
+    # 公開搜尋的 ILIKE '%x%' 以 pg_trgm GIN index 支援（見 public_queries.py）
+    __table_args__ = (
+        db.Index('ix_media_lib_file_metadata_chart_id_trgm', 'chart_id',
+                 postgresql_using='gin', postgresql_ops={'chart_id': 'gin_trgm_ops'}),
+        db.Index('ix_media_lib_file_metadata_location_trgm', 'location',
+                 postgresql_using='gin', postgresql_ops={'location': 'gin_trgm_ops'}),
+        db.Index('ix_media_lib_file_metadata_source_trgm', 'source',
+                 postgresql_using='gin', postgresql_ops={'source': 'gin_trgm_ops'}),
+        db.Index('ix_media_lib_file_metadata_license_trgm', 'license',
+                 postgresql_using='gin', postgresql_ops={'license': 'gin_trgm_ops'}),
+        SCHEMA_ARGS,
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     file_id = db.Column(db.Integer, db.ForeignKey(f'{SCHEMA_NAME}.files.id', ondelete='CASCADE'),
@@ -160,16 +215,17 @@ class MLFileMetadata(db.Model):
 # =============================================================================
 
 class MLFileVariant(db.Model):
-    """圖片的各尺寸變體（thumbnail, small, medium, large）。"""
+    """圖片的各尺寸變體（thumbnail, small, medium, large），每個尺寸有原圖格式與 WebP / AVIF。"""
     __tablename__ = 'file_variants'
     __table_args__ = (SCHEMA_ARGS,)
 
     id = db.Column(db.Integer, primary_key=True)
     file_id = db.Column(db.Integer, db.ForeignKey(f'{SCHEMA_NAME}.files.id', ondelete='CASCADE'),
                         nullable=False, index=True)
-    variant_type = db.Column(db.String(20), nullable=False)  # thumbnail, small, medium, large
-    gcs_path = db.Column(db.String(500), nullable=False)
-    public_url = db.Column(db.String(700), nullable=False)
+    variant_type = db.Column(db.String(20), nullable=False)  # thumbnail, small, medium, large, crop_16x9_1280
+    format = db.Column(db.String(10), nullable=False)        # jpeg, png, gif, webp, avif
+    gcs_path = db.Column(db.String(500), nullable=False, index=True)  # 重複上傳的記錄共用同一物件
+    public_url = db.Column(db.String(700), nullable=False, index=True)
     width = db.Column(db.Integer)
     height = db.Column(db.Integer)
     file_size = db.Column(db.Integer)
@@ -180,10 +236,157 @@ class MLFileVariant(db.Model):
             'width': self.width,
             'height': self.height,
             'file_size': self.file_size,
+            'format': self.format,
+        }
+
+    def __repr__(self):
+        return f'<MLFileVariant {self.variant_type}/{self.format} of file {self.file_id}>'
+
+
+# =============================================================================
+# MLJob - 背景工作佇列（變體產生等）
+# =============================================================================
+
+class MLJob(db.Model):
+    """
+    DB-backed 背景工作。worker 以 SELECT ... FOR UPDATE SKIP LOCKED 領取，
+    失敗時依 attempts 指數退避（run_after）重試，超過 max_attempts 標記 failed。
+    """
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_media_lib_jobs_pending', 'run_after', 'id',
+                 postgresql_where=db.text("status = 'pending'")),
+        SCHEMA_ARGS,
+    )
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)
+    file_id = db.Column(db.Integer, db.ForeignKey(f'{SCHEMA_NAME}.files.id', ondelete='CASCADE'),
+                        index=True)
+    payload = db.Column(JSONB, default=dict)
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True)  # pending/running/done/failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_after = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    locked_at = db.Column(db.DateTime)
+    locked_by = db.Column(db.String(100))
+    last_error = db.Column(db.Text)
+    progress = db.Column(JSONB)      # 長時間工作（批次匯入）的進度與個別檔案的錯誤
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc),
+                           onupdate=lambda: datetime.now(timezone.utc))
+
+    # 刪除檔案時由 DB 的 ON DELETE CASCADE 清除工作
+    file = db.relationship('MLFile', backref=db.backref('jobs', lazy='dynamic', passive_deletes=True))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_after': self.run_after.isoformat() if self.run_after else None,
+            'last_error': self.last_error,
+            'progress': self.progress,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+    def __repr__(self):
+        return f'<MLJob {self.job_type} #{self.id} {self.status}>'
+
+
+# =============================================================================
+# MLUploadSession - 可續傳上傳
+# =============================================================================
+
+class MLUploadSession(db.Model):
+    """
+    可續傳分段上傳（tus 風格）的工作階段。
+    Local 模式資料寫入 staging_path 暫存檔；GCS 模式直接寫入 resumable session。
+    逾期未完成者由 `flask media-lib gc-uploads` 清除。
+    """
+    __tablename__ = 'upload_sessions'
+    __table_args__ = (SCHEMA_ARGS,)
+
+    id = db.Column(db.String(32), primary_key=True)  # 隨機 token，作為上傳 URL 的一部分
+    filename = db.Column(db.String(255), nullable=False)   # 原始檔名
+    mime_type = db.Column(db.String(100))
+    folder_id = db.Column(db.Integer, db.ForeignKey(f'{SCHEMA_NAME}.folders.id', ondelete='SET NULL'))
+    upload_length = db.Column(db.BigInteger, nullable=False)
+    upload_offset = db.Column(db.BigInteger, nullable=False, default=0)
+    storage_path = db.Column(db.String(500), nullable=False)   # 完成後的儲存路徑
+    unique_name = db.Column(db.String(255), nullable=False)
+    staging_path = db.Column(db.String(500))    # Local：暫存檔完整路徑
+    gcs_session_url = db.Column(db.Text)        # GCS：resumable upload session URI
+    file_id = db.Column(db.Integer, db.ForeignKey(f'{SCHEMA_NAME}.files.id', ondelete='SET NULL'))
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id', deferrable=True))
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc),
+                           onupdate=lambda: datetime.now(timezone.utc))
+
+    @property
+    def is_complete(self) -> bool:
+        return self.upload_offset >= self.upload_length
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'mime_type': self.mime_type,
+            'folder_id': self.folder_id,
+            'upload_length': self.upload_length,
+            'upload_offset': self.upload_offset,
+            'file_id': self.file_id,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
+
+    def __repr__(self):
+        return f'<MLUploadSession {self.id} {self.upload_offset}/{self.upload_length}>'
+
+
+# =============================================================================
+# MLImportScan - GCS 掃描匯入的檢查點
+# =============================================================================
+
+class MLImportScan(db.Model):
+    """
+    GCS 掃描匯入的檢查點，每個 prefix 一筆（見 gcs_import.py）。
+    cursor：進行中的掃描已處理到的最後一個物件名稱，下一個 request 由此續掃（完成後清除）。
+    since：上一次完整掃描看到的最新物件更新時間，增量掃描只比對之後更新的物件。
+    """
+    __tablename__ = 'import_scans'
+    __table_args__ = (SCHEMA_ARGS,)
+
+    id = db.Column(db.Integer, primary_key=True)
+    prefix = db.Column(db.String(500), nullable=False, unique=True)
+    cursor = db.Column(db.String(1024))        # GCS 物件名稱最長 1024 bytes
+    since = db.Column(db.DateTime)             # UTC（naive）
+    high_water = db.Column(db.DateTime)        # 進行中的掃描目前看到的最新更新時間
+    scanned = db.Column(db.Integer, nullable=False, default=0)   # 進行中 / 上一次掃描的累計值
+    found = db.Column(db.Integer, nullable=False, default=0)
+    started_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc),
+                           onupdate=lambda: datetime.now(timezone.utc))
+
+    def to_dict(self):
+        return {
+            'prefix': self.prefix,
+            'cursor': self.cursor,
+            'in_progress': self.cursor is not None,
+            'since': self.since.isoformat() if self.since else None,
+            'scanned': self.scanned,
+            'found': self.found,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
         }
 
     def __repr__(self):
-        return f'<MLFileVariant {self.variant_type} of file {self.file_id}>'
+        return f'<MLImportScan {self.prefix}>'
 
 
 # =============================================================================
@@ -213,4 +416,5 @@ class MLTag(db.Model):
         return f'<MLTag {self.name}>'
 
 
-__all__ = ['MLFolder', 'MLFile', 'MLFileMetadata', 'MLFileVariant', 'MLTag', 'file_tags']
+__all__ = ['MLFolder', 'MLFile', 'MLFileMetadata', 'MLFileVariant', 'MLJob', 'MLUploadSession', 'MLImportScan',
+           'MLTag', 'file_tags']
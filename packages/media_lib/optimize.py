@@ -0,0 +1,144 @@
+"""
+Media Library - 原檔最佳化
+
+原檔原本照上傳內容保存（含 EXIF、內嵌縮圖、未最佳化的 PNG 區塊）。變體工作產生變體前
+先以 image_processor.optimize_original 處理原檔：
+
+- 只做無損處理：JPEG 移除 ICC profile / JFIF / Adobe 以外的 APPn 與註解 segment，
+  壓縮資料原封不動（不重新編碼，像素不變）；PNG 以最高壓縮等級重新存檔，解碼後像素與
+  原檔相同才採用。EXIF 方向保留為只含方向的最小 EXIF，像素不旋轉，變體等衍生圖解碼後
+  才依方向轉正。
+- 結果變小時覆寫同一路徑（public url 不變）；原檔內容只有 metadata 改變，可安全覆寫。
+- 節省量記錄於 attributes.optimization（{'original_size', 'optimized_size', 'saved_bytes'}），
+  已記錄的檔案不再處理。共用同一原檔的重複記錄（見 dedup.py）一併更新。
+- content_hash 維持上傳內容的雜湊，相同內容重新上傳時仍可比對去重。覆寫原檔時另記錄
+  新內容的摘要（attributes.optimization.digest），作為即時衍生圖（render.py）的原檔版本。
+
+既有檔案以 `flask media-lib optimize-originals` 分批處理，最佳化在多個子行程中平行執行
+（VariantEncoder.optimize_many）。
+"""
+
+import hashlib
+from typing import Iterator, Optional
+
+from flask import current_app
+
+from core.backend_engine.factory import db
+from packages.media_lib.config import OPTIMIZABLE_TYPES
+from packages.media_lib.dedup import sharing_files
+from packages.media_lib.models import MLFile
+from packages.media_lib.storage import MediaStorage
+
+
+def needs_optimization(ml_file: MLFile) -> bool:
+    """檔案類型可最佳化且尚未處理過。"""
+    return ml_file.mime_type in OPTIMIZABLE_TYPES and 'optimization' not in (ml_file.attributes or {})
+
+
+def apply_optimization(ml_file: MLFile, result: dict, storage: Optional[MediaStorage] = None) -> None:
+    """
+    寫回 optimize_original 的結果（不 commit）：有新內容時覆寫原檔物件，
+    並更新 file_size、尺寸與 attributes.optimization（共用原檔的記錄一併更新；
+    覆寫時含新內容的摘要 digest）。
+    """
+    summary = {
+        'original_size': result['original_size'],
+        'optimized_size': result['optimized_size'],
+        'saved_bytes': result['original_size'] - result['optimized_size'],
+    }
+    if result['data'] is not None:
+        storage = storage or MediaStorage.get_instance()
+        storage.upload_bytes(result['data'], ml_file.gcs_path, ml_file.mime_type)
+        # 原檔內容已改變：即時衍生圖的快取 key 與網址以此區分版本
+        summary['digest'] = hashlib.sha256(result['data']).hexdigest()[:16]
+    for target in [ml_file] + sharing_files(ml_file):
+        target.file_size = result['optimized_size']
+        target.width, target.height = result['width'], result['height']
+        # JSONB 欄位需指定新的 dict 才會寫回
+        target.attributes = {**(target.attributes or {}), 'optimization': summary}
+
+
+def mark_skipped(ml_file: MLFile) -> None:
+    """無法最佳化（解碼失敗、動畫等）的檔案同樣記錄，之後不再重試（不 commit）。"""
+    size = ml_file.file_size or 0
+    apply_optimization(ml_file, {
+        'data': None,
+        'width': ml_file.width,
+        'height': ml_file.height,
+        'original_size': size,
+        'optimized_size': size,
+    })
+
+
+def backfill_optimization(workers: int, batch_size: int = 50, limit: Optional[int] = None,
+                          dry_run: bool = False) -> Iterator[dict]:
+    """
+    最佳化尚未處理的既有原檔，每批 commit 一次（依 id 遞增，可中斷後重跑）。
+    只處理原始記錄（duplicate_of_id IS NULL），重複記錄隨原始記錄更新。
+    EXIF 方向不為 1 的檔案重新排入變體工作（舊變體產生時未依方向轉正）。
+
+    Yields:
+        每批的進度 {'processed', 'optimized', 'saved_bytes', 'reoriented', 'failed', 'last_id'}（累計值）
+    """
+    # tasks 匯入本模組（變體工作先最佳化原檔），這裡延後匯入避免循環
+    from packages.media_lib.encoder import VariantEncoder
+    from packages.media_lib.tasks import enqueue_variants
+
+    storage = MediaStorage.get_instance()
+    encoder = VariantEncoder(workers)
+    stats = {'processed': 0, 'optimized': 0, 'saved_bytes': 0, 'reoriented': 0, 'failed': 0, 'last_id': 0}
+    scanned = 0
+
+    try:
+        while limit is None or scanned < limit:
+            size = batch_size if limit is None else min(batch_size, limit - scanned)
+            batch = MLFile.query.filter(
+                MLFile.mime_type.in_(OPTIMIZABLE_TYPES),
+                MLFile.duplicate_of_id.is_(None),
+                MLFile.id > stats['last_id'],
+            ).order_by(MLFile.id).limit(size).all()
+            if not batch:
+                break
+            scanned += len(batch)
+            stats['last_id'] = batch[-1].id
+
+            files = {ml_file.id: ml_file for ml_file in batch if needs_optimization(ml_file)}
+
+            def _sources():
+                for file_id, ml_file in files.items():
+                    try:
+                        yield file_id, storage.download_bytes(ml_file.gcs_path), ml_file.mime_type
+                    except FileNotFoundError:
+                        current_app.logger.warning(
+                            f'Optimize: original of file {file_id} not found: {ml_file.gcs_path}'
+                        )
+                        stats['failed'] += 1
+
+            for file_id, result in encoder.optimize_many(_sources()):
+                ml_file = files[file_id]
+                stats['processed'] += 1
+                if result is None:
+                    if not dry_run:
+                        mark_skipped(ml_file)
+                    continue
+                if result['data'] is not None:
+                    stats['optimized'] += 1
+                    stats['saved_bytes'] += result['original_size'] - result['optimized_size']
+                if result['orientation'] != 1:
+                    stats['reoriented'] += 1
+                if dry_run:
+                    continue
+                apply_optimization(ml_file, result, storage)
+                if result['orientation'] != 1:
+                    enqueue_variants(ml_file)
+
+            if dry_run:
+                db.session.rollback()
+            else:
+                db.session.commit()
+            yield dict(stats)
+    finally:
+        encoder.shutdown()
+
+
+__all__ = ['needs_optimization', 'apply_optimization', 'mark_skipped', 'backfill_optimization']
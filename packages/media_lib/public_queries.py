@@ -0,0 +1,145 @@
+"""
+Media Library - 公開查詢（GET /public/lookup、GET /public/search）
+
+兩個端點不需登入、呼叫頻繁，這裡：
+
+- lookup 以一個查詢取得檔案與 metadata / 變體 / 標籤（原本先查 metadata 再查檔案）。
+- search 的總筆數以 count(*) OVER () 與資料一起取得，不另外執行分頁用的 COUNT 查詢；
+  location / source / license / chart_id 的 ILIKE '%x%' 由 pg_trgm GIN index 支援
+  （migration 0012）。
+- 回應（含 404）以正規化後的參數為 key 存於 Flask-Caching（正式環境為 Redis），
+  存活 PUBLIC_CACHE_TIMEOUT 秒；回應帶 ETag，If-None-Match 相符時回傳 304。
+  metadata 修改後最多延遲一個 timeout 才反映在公開結果。
+"""
+
+import hashlib
+import json
+import math
+from typing import Callable, Optional, Tuple
+
+from flask import Response, current_app, request
+from sqlalchemy import func
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
+
+from core.backend_engine.factory import cache, db
+from packages.media_lib.config import PUBLIC_CACHE_TIMEOUT
+from packages.media_lib.models import MLFile, MLFileMetadata
+from packages.media_lib.schemas import MLFileSchema
+
+
+_file_schema = MLFileSchema()
+_files_schema = MLFileSchema(many=True)
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+
+# search 可用的 metadata 篩選欄位
+SEARCH_FILTERS = ('status', 'location', 'source', 'license', 'rating', 'chart_id')
+
+
+def lookup_chart(chart_id: str) -> Optional[dict]:
+    """依命盤ID 取得檔案（一個查詢，含 metadata / 變體 / 標籤）；找不到時回傳 None。"""
+    ml_file = (
+        MLFile.query.join(MLFile.file_metadata)
+        .options(
+            contains_eager(MLFile.file_metadata),
+            joinedload(MLFile.variants),
+            joinedload(MLFile.tags),
+        )
+        .filter(MLFileMetadata.chart_id == chart_id)
+        .order_by(MLFile.id)
+        .first()
+    )
+    return _file_schema.dump(ml_file) if ml_file is not None else None
+
+
+def search_files(filters: dict, page: int, per_page: int) -> dict:
+    """
+    依 metadata 篩選已有 metadata 的檔案（依建立時間新到舊）。
+
+    Args:
+        filters: status（完全相符）、rating（>=）、location / source / license / chart_id（部分相符）
+    """
+    page = max(page, 1)
+    per_page = min(per_page, MAX_PER_PAGE) if per_page >= 1 else DEFAULT_PER_PAGE
+
+    total = func.count().over().label('total')
+    query = (
+        db.session.query(MLFile, total)
+        .join(MLFile.file_metadata)
+        .options(
+            contains_eager(MLFile.file_metadata),
+            selectinload(MLFile.variants),
+            selectinload(MLFile.tags),
+        )
+    )
+    for name, value in filters.items():
+        column = getattr(MLFileMetadata, name)
+        if name == 'status':
+            query = query.filter(column == value)
+        elif name == 'rating':
+            query = query.filter(column >= value)
+        else:
+            query = query.filter(column.ilike(f'%{value}%'))
+
+    rows = (
+        query.order_by(MLFile.created_at.desc(), MLFile.id.desc())
+        .limit(per_page)
+        .offset((page - 1) * per_page)
+        .all()
+    )
+    if rows:
+        count = rows[0].total
+    elif page > 1:
+        # 超過最後一頁時沒有資料列可取得總數
+        count = query.with_entities(func.count(MLFile.id)).order_by(None).scalar()
+    else:
+        count = 0
+
+    return {
+        'files': _files_schema.dump([row[0] for row in rows]),
+        'pagination': {
+            'page': page,
+            'pages': math.ceil(count / per_page) if count else 0,
+            'per_page': per_page,
+            'total': count,
+        },
+    }
+
+
+def parse_search_args(args) -> Tuple[dict, int, int]:
+    """由 query string 取出 search 的篩選條件（去除空值）與分頁參數。"""
+    filters = {}
+    for name in SEARCH_FILTERS:
+        value = args.get(name, type=int) if name == 'rating' else (args.get(name) or '').strip()
+        if value:
+            filters[name] = value
+    return filters, args.get('page', 1, type=int), args.get('per_page', DEFAULT_PER_PAGE, type=int)
+
+
+def cached_response(name: str, params: dict, build: Callable[[], Tuple[object, int]]) -> Response:
+    """
+    回傳快取的 JSON 回應（不存在時以 build() 產生 (資料, 狀態碼) 並快取），帶 ETag 與
+    Cache-Control；request 的 If-None-Match 相符時回傳 304。
+    """
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+    key = f'media_lib:public:{name}:{digest}'
+    timeout = int(current_app.config.get('MEDIA_PUBLIC_CACHE_TIMEOUT', PUBLIC_CACHE_TIMEOUT))
+
+    entry = cache.get(key)
+    if entry is None:
+        data, status = build()
+        body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+        entry = (status, body, hashlib.sha1(body).hexdigest())
+        cache.set(key, entry, timeout=timeout)
+
+    status, body, etag = entry
+    response = Response(body, status=status, mimetype='application/json')
+    response.headers['Cache-Control'] = f'public, max-age={timeout}'
+    if status != 200:
+        return response
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+__all__ = ['lookup_chart', 'search_files', 'parse_search_args', 'cached_response']
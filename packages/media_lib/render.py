@@ -0,0 +1,366 @@
+"""
+Media Library - 即時衍生圖（GET /render/<file_id>）
+
+以簽章的 w / h / fit / fmt 參數產生任意尺寸的衍生圖，不必為新尺寸重新產生所有變體：
+
+- 簽章：HMAC-SHA256（SECRET_KEY），防止任意參數組合耗盡 CPU 與快取空間。
+  編輯端以 GET /files/<id>/render-url 或 render_url() 取得已簽章的網址。
+- 快取：本機磁碟 LRU（以 atime 作為最近使用時間），總量超過上限時由最久未用的開始刪除。
+  快取 key 取自原檔內容（content_hash，無則 gcs_path）與參數，重複上傳的檔案共用結果。
+- 原檔版本：optimize.apply_optimization 覆寫原檔時記錄新內容的摘要
+  （attributes.optimization.digest），納入快取 key 與簽章（網址的 v 參數）。原檔移除
+  metadata 後產生新的網址與快取，舊網址轉址到新網址，不會長期提供以舊原檔產生的結果。
+- 防止 stampede：同一衍生圖以 flock 序列化首次產生，其他 request（含其他 gunicorn
+  process）等待後直接讀取快取。鎖檔固定 256 個（依 key 分配），不需清理。
+- MEDIA_RENDER_STORE_IN_BUCKET：另存一份到儲存，新機器 / 快取清空後不必重新產生。
+"""
+
+import base64
+import errno
+import fcntl
+import hashlib
+import hmac
+import os
+import tempfile
+import threading
+import time
+from typing import Optional, Tuple
+
+from flask import current_app, url_for
+
+from packages.media_lib.config import (
+    RENDER_CACHE_MAX_BYTES,
+    RENDER_FITS,
+    RENDER_FORMATS,
+    RENDER_LOCK_TIMEOUT,
+    RENDER_MAX_DIMENSION,
+    RENDER_STORAGE_PREFIX,
+)
+from packages.media_lib.image_processor import _get_output_format, render_image
+from packages.media_lib.models import MLFile
+from packages.media_lib.storage import MediaStorage
+
+
+_SIGNATURE_SALT = b'media-lib-render'
+_LOCK_STRIPES = 256
+
+
+class RenderParamsError(Exception):
+    """render 參數不合法（API 回應 400）。"""
+
+
+class RenderBusy(Exception):
+    """等待同一衍生圖的首次產生逾時（API 回應 503）。"""
+
+
+# =============================================================================
+# 參數與簽章
+# =============================================================================
+
+def parse_params(args) -> dict:
+    """
+    解析並驗證 w / h / fit / fmt（request.args 或 dict）。
+
+    Raises:
+        RenderParamsError
+    """
+    params = {}
+    for name in ('w', 'h'):
+        value = args.get(name)
+        if value in (None, ''):
+            params[name] = None
+            continue
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise RenderParamsError(f'{name} must be an integer')
+        if not 0 < value <= RENDER_MAX_DIMENSION:
+            raise RenderParamsError(f'{name} must be between 1 and {RENDER_MAX_DIMENSION}')
+        params[name] = value
+    if params['w'] is None and params['h'] is None:
+        raise RenderParamsError('w or h is required')
+
+    params['fit'] = args.get('fit') or 'contain'
+    if params['fit'] not in RENDER_FITS:
+        raise RenderParamsError(f"fit must be one of: {', '.join(RENDER_FITS)}")
+    params['fmt'] = args.get('fmt') or None
+    if params['fmt'] is not None and params['fmt'] not in RENDER_FORMATS:
+        raise RenderParamsError(f"fmt must be one of: {', '.join(RENDER_FORMATS)}")
+    return params
+
+
+# 產生方式改變（結果與先前不同）時遞增，捨棄磁碟 / 儲存中的舊結果。
+# 2：套用 EXIF 方向（先前未轉正的原檔產生的衍生圖方向錯誤）
+RENDER_REVISION = 2
+
+
+def source_version(ml_file: MLFile) -> str:
+    """原檔目前內容的版本（optimize 覆寫原檔後的摘要；未覆寫過為空字串）。"""
+    return ((ml_file.attributes or {}).get('optimization') or {}).get('digest') or ''
+
+
+def _canonical(file_id: int, params: dict, version: str = '') -> str:
+    canonical = f"{file_id}:{params['w'] or ''}:{params['h'] or ''}:{params['fit']}:{params['fmt'] or ''}"
+    # 未覆寫過的原檔維持原本的格式，既有網址的簽章仍有效
+    return f'{canonical}:{version}' if version else canonical
+
+
+def sign(file_id: int, params: dict, version: str = '') -> str:
+    key = current_app.config['SECRET_KEY'].encode()
+    digest = hmac.new(key, _SIGNATURE_SALT + _canonical(file_id, params, version).encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:16]).rstrip(b'=').decode()
+
+
+def verify(file_id: int, params: dict, signature: Optional[str], version: str = '') -> bool:
+    return bool(signature) and hmac.compare_digest(sign(file_id, params, version), signature)
+
+
+def render_url(ml_file: MLFile, w: Optional[int] = None, h: Optional[int] = None,
+               fit: str = 'contain', fmt: Optional[str] = None, external: bool = False) -> str:
+    """產生原檔目前版本的已簽章 /render 網址（參數不合法時 raise RenderParamsError）。"""
+    params = parse_params({'w': w, 'h': h, 'fit': fit, 'fmt': fmt})
+    query = {k: v for k, v in params.items() if v is not None and not (k == 'fit' and v == 'contain')}
+    version = source_version(ml_file)
+    if version:
+        query['v'] = version
+    return url_for('media_lib.render_file', file_id=ml_file.id, s=sign(ml_file.id, params, version),
+                   _external=external, **query)
+
+
+# =============================================================================
+# 磁碟 LRU 快取
+# =============================================================================
+
+class RenderCache:
+    """
+    以目錄存放衍生圖的 LRU 快取，可由多個 process 共用。
+
+    命中時更新 atime（mtime 維持建立時間，Last-Modified 不會因命中而改變）；
+    寫入後累計的大小超過上限時掃描目錄，由 atime 最舊者刪到上限的 90%。
+    各 process 的累計值只是估計，掃描時以實際大小校正。
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._approx_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, '.locks'), exist_ok=True)
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ext)
+
+    def get(self, key: str, ext: str) -> Optional[str]:
+        path = self._path(key, ext)
+        try:
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, ext: str, data: bytes) -> str:
+        path = self._path(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+        with self._lock:
+            if self._approx_bytes is None:
+                self._approx_bytes = self._scan_size()
+            else:
+                self._approx_bytes += len(data)
+            over = self._approx_bytes > self.max_bytes
+        if over:
+            self.evict()
+        return path
+
+    def _entries(self):
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir() or sub.name == '.locks':
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.is_file() and not entry.name.endswith('.part'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield entry.path, stat.st_size, stat.st_atime
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> int:
+        """刪除最久未使用的項目直到總量低於上限的 90%；其他 process 正在清理時直接略過。"""
+        with open(os.path.join(self.directory, '.locks', 'evict'), 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EACCES):
+                    return 0
+                raise
+
+            entries = sorted(self._entries(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+            target = int(self.max_bytes * 0.9)
+            removed = 0
+            for path, size, _ in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+        with self._lock:
+            self._approx_bytes = total
+        return removed
+
+    def lock(self, key: str, timeout: float = RENDER_LOCK_TIMEOUT) -> '_KeyLock':
+        return _KeyLock(os.path.join(self.directory, '.locks', f'{int(key[:2], 16) % _LOCK_STRIPES:02x}'), timeout)
+
+
+class _KeyLock:
+    """跨 process 的 flock（同一 process 的不同執行緒各自開檔，同樣互斥）。"""
+
+    def __init__(self, path: str, timeout: float):
+        self.path = path
+        self.timeout = timeout
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'a')
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return self
+            except OSError as e:
+                if e.errno not in (errno.EAGAIN, errno.EACCES):
+                    self._file.close()
+                    raise
+            if time.monotonic() >= deadline:
+                self._file.close()
+                raise RenderBusy('Timed out waiting for render')
+            time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+_cache: Optional[RenderCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> RenderCache:
+    """目前 app 設定的快取（MEDIA_RENDER_CACHE_DIR / MEDIA_RENDER_CACHE_MAX_BYTES）。"""
+    global _cache
+    directory = current_app.config.get('MEDIA_RENDER_CACHE_DIR') or os.path.join(
+        tempfile.gettempdir(), 'media-lib-render'
+    )
+    max_bytes = int(current_app.config.get('MEDIA_RENDER_CACHE_MAX_BYTES', RENDER_CACHE_MAX_BYTES))
+    with _cache_lock:
+        if _cache is None or _cache.directory != directory or _cache.max_bytes != max_bytes:
+            _cache = RenderCache(directory, max_bytes)
+        return _cache
+
+
+# =============================================================================
+# 產生
+# =============================================================================
+
+def _output(ml_file: MLFile, params: dict) -> Tuple[str, str]:
+    """(副檔名, content type)，與 render_image 的輸出格式一致。"""
+    if params['fmt']:
+        _, ext, content_type = RENDER_FORMATS[params['fmt']]
+    else:
+        _, ext, content_type = _get_output_format(ml_file.mime_type)
+    return ext, content_type
+
+
+def cache_key(ml_file: MLFile, params: dict) -> str:
+    source = ml_file.content_hash or ml_file.gcs_path
+    version = source_version(ml_file)
+    if version:
+        # content_hash 維持上傳內容的雜湊，原檔被覆寫後需區分
+        source = f'{source}@{version}'
+    raw = (f"{source}|{params['w'] or ''}|{params['h'] or ''}|{params['fit']}|{params['fmt'] or ''}"
+           f"|r{RENDER_REVISION}")
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def get_rendered(ml_file: MLFile, params: dict) -> Tuple[str, str]:
+    """
+    取得衍生圖的本機快取路徑，未快取時產生（同一衍生圖同時只產生一次）。
+
+    Returns:
+        (快取檔案路徑, content type)
+
+    Raises:
+        ValueError: 原檔無法處理
+        FileNotFoundError: 原檔不存在
+        RenderBusy: 等待其他 request 產生逾時
+    """
+    cache = get_cache()
+    key = cache_key(ml_file, params)
+    ext, content_type = _output(ml_file, params)
+
+    path = cache.get(key, ext)
+    if path:
+        return path, content_type
+
+    with cache.lock(key):
+        # 等待期間其他 request 可能已經產生
+        path = cache.get(key, ext)
+        if path:
+            return path, content_type
+
+        storage = MediaStorage.get_instance()
+        in_bucket = bool(current_app.config.get('MEDIA_RENDER_STORE_IN_BUCKET'))
+        bucket_path = f'{RENDER_STORAGE_PREFIX}/{key[:2]}/{key}{ext}'
+        if in_bucket:
+            try:
+                return cache.put(key, ext, storage.download_bytes(bucket_path)), content_type
+            except FileNotFoundError:
+                pass
+
+        result = render_image(
+            storage.download_bytes(ml_file.gcs_path),
+            ml_file.mime_type,
+            width=params['w'],
+            height=params['h'],
+            fit=params['fit'],
+            output_format=params['fmt'],
+        )
+        path = cache.put(key, ext, result['data'])
+        if in_bucket:
+            try:
+                storage.upload_bytes(result['data'], bucket_path, content_type)
+            except Exception as e:
+                current_app.logger.warning(f'Storing render {bucket_path} failed: {e}')
+        return path, content_type
+
+
+__all__ = [
+    'RenderParamsError',
+    'RenderBusy',
+    'RenderCache',
+    'parse_params',
+    'sign',
+    'verify',
+    'source_version',
+    'render_url',
+    'get_cache',
+    'cache_key',
+    'get_rendered',
+]
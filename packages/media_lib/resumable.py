@@ -0,0 +1,227 @@
+"""
+Media Library - 可續傳分段上傳（tus 風格）
+
+流程：
+1. create_session()：預先決定最終儲存路徑；Local 建立暫存檔，GCS 建立 resumable session。
+2. write_chunk()：從目前 offset 續寫一段資料，request body 以串流寫入，不讀入記憶體。
+   - Local：寫入暫存檔；連線中斷時保留已寫入的部分，offset 依實際寫入量更新。
+   - GCS：PUT 到 session URI；非最後一段必須是 256KiB 的倍數（GCS 限制），
+     中斷時向 GCS 查詢實際持久化的 offset。
+3. complete_session()：Local 以 os.replace 移到最終路徑；GCS 物件已在最終路徑。
+   兩者都不再複製資料。
+4. gc_expired_sessions()：清除逾期未完成的 session 與其暫存資料（flask media-lib gc-uploads）。
+"""
+
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO, Optional
+
+from flask import current_app
+
+from core.backend_engine.factory import db
+from packages.media_lib.config import SPOOL_CHUNK_SIZE, UPLOAD_SESSION_TTL
+from packages.media_lib.models import MLUploadSession
+from packages.media_lib.storage import MediaStorage
+from packages.media_lib.utils import SNIFF_BYTES
+
+
+GCS_CHUNK_ALIGNMENT = 256 * 1024
+
+
+class UploadChunkError(Exception):
+    """分段不符合協定要求（API 回應 400）。"""
+
+
+class _ChunkReader:
+    """包裝 request stream：限制讀取長度、計算已讀量，並保留檔頭供 MIME sniff。"""
+
+    def __init__(self, stream: BinaryIO, length: int):
+        self.stream = stream
+        self.length = length
+        self.bytes_read = 0
+        self.head = b''
+
+    def read(self, size: int = -1) -> bytes:
+        remaining = self.length - self.bytes_read
+        if remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        chunk = self.stream.read(min(size, SPOOL_CHUNK_SIZE))
+        if len(self.head) < SNIFF_BYTES:
+            self.head += chunk[:SNIFF_BYTES - len(self.head)]
+        self.bytes_read += len(chunk)
+        return chunk
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(SPOOL_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+    def __len__(self):
+        # requests 以此決定 Content-Length（串流送出而不使用 chunked encoding）
+        return self.length
+
+
+def _ttl() -> int:
+    return int(current_app.config.get('MEDIA_UPLOAD_SESSION_TTL', UPLOAD_SESSION_TTL))
+
+
+def _expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=_ttl())
+
+
+def create_session(filename: str, mime_type: Optional[str], length: int,
+                   folder_id: Optional[int] = None, user_id: Optional[int] = None) -> MLUploadSession:
+    """建立上傳 session（不 commit）。"""
+    storage = MediaStorage.get_instance()
+    token = uuid.uuid4().hex
+    storage_path, unique_name = storage.new_storage_path(filename)
+
+    session = MLUploadSession(
+        id=token,
+        filename=filename,
+        mime_type=mime_type,
+        folder_id=folder_id,
+        upload_length=length,
+        upload_offset=0,
+        storage_path=storage_path,
+        unique_name=unique_name,
+        created_by=user_id,
+        expires_at=_expiry(),
+    )
+    if storage.is_gcs:
+        session.gcs_session_url = storage.create_resumable_session(storage_path, mime_type, length)
+    else:
+        session.staging_path = storage.create_staging_file(token)
+    db.session.add(session)
+    return session
+
+
+def write_chunk(session: MLUploadSession, stream: BinaryIO, length: int) -> bytes:
+    """
+    將一段資料寫入 session（不 commit）。即使中途失敗，session.upload_offset
+    也會更新為實際已保存的位置，呼叫端應 commit 後再回應錯誤。
+
+    Returns:
+        這段資料的檔頭（offset 為 0 時用於 MIME sniff）
+
+    Raises:
+        UploadChunkError: 長度超出 Upload-Length 或 GCS 分段未對齊
+    """
+    start = session.upload_offset
+    if start + length > session.upload_length:
+        raise UploadChunkError('Chunk exceeds Upload-Length')
+
+    storage = MediaStorage.get_instance()
+    reader = _ChunkReader(stream, length)
+    session.expires_at = _expiry()
+
+    if session.gcs_session_url:
+        if start + length < session.upload_length and length % GCS_CHUNK_ALIGNMENT:
+            raise UploadChunkError(f'Chunk size must be a multiple of {GCS_CHUNK_ALIGNMENT} bytes')
+        try:
+            session.upload_offset = storage.put_resumable_chunk(
+                session.gcs_session_url, reader, start, length, session.upload_length
+            )
+        except Exception:
+            # 以 GCS 實際持久化的 offset 為準，client 以 HEAD 取得後續傳
+            session.upload_offset = storage.query_resumable_offset(
+                session.gcs_session_url, session.upload_length
+            )
+            raise
+        return reader.head
+
+    with open(session.staging_path, 'r+b') as f:
+        f.seek(start)
+        try:
+            while True:
+                chunk = reader.read(SPOOL_CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+        finally:
+            session.upload_offset = start + reader.bytes_read
+    if reader.bytes_read < length:
+        raise UploadChunkError('Request body shorter than Content-Length')
+    return reader.head
+
+
+def complete_session(session: MLUploadSession) -> str:
+    """
+    將完成的上傳移到最終路徑（不 commit），回傳 public url。
+    Local：os.replace 暫存檔；GCS：物件已由 resumable session 寫入最終路徑。
+    """
+    storage = MediaStorage.get_instance()
+    if session.gcs_session_url:
+        session.gcs_session_url = None
+    elif session.staging_path and os.path.exists(session.staging_path):
+        storage.commit_staged(session.staging_path, session.storage_path)
+    # 其餘情況：先前的完成步驟已移動檔案（之後建立記錄失敗而重試）
+    session.staging_path = None
+    return storage.public_url_for(session.storage_path)
+
+
+def local_file_path(session: MLUploadSession) -> Optional[str]:
+    """完成後的本機檔案路徑（Local 模式；用於讀取圖片尺寸）。"""
+    storage = MediaStorage.get_instance()
+    return storage.get_local_file_path(session.storage_path)
+
+
+def abort_session(session: MLUploadSession) -> None:
+    """丟棄 session 與其暫存資料（不 commit）。"""
+    storage = MediaStorage.get_instance()
+    try:
+        if session.gcs_session_url:
+            storage.cancel_resumable_session(session.gcs_session_url)
+        elif session.staging_path and os.path.exists(session.staging_path):
+            os.remove(session.staging_path)
+    except Exception as e:
+        current_app.logger.warning(f'Failed to discard upload session {session.id}: {e}')
+    db.session.delete(session)
+
+
+def gc_expired_sessions(dry_run: bool = False) -> dict:
+    """
+    清除逾期的上傳 session：未完成者連同暫存資料 / GCS session 一起丟棄，
+    已完成者只刪除記錄。Local 模式另清除 .tmp 下逾期的暫存檔
+    （例如 process 中斷遺留的 spool 檔）。
+
+    Returns:
+        {'sessions': 刪除的 session 數, 'files': 刪除的暫存檔數}
+    """
+    now = datetime.now(timezone.utc)
+    expired = MLUploadSession.query.filter(MLUploadSession.expires_at < now).all()
+    if not dry_run:
+        for session in expired:
+            abort_session(session)
+        db.session.commit()
+
+    removed_files = 0
+    storage = MediaStorage.get_instance()
+    if storage.is_local:
+        spool_dir = os.path.join(storage.base_path, '.tmp')
+        cutoff = time.time() - _ttl()
+        if os.path.isdir(spool_dir):
+            for entry in os.scandir(spool_dir):
+                if entry.is_file() and entry.name.endswith('.part') and entry.stat().st_mtime < cutoff:
+                    if not dry_run:
+                        os.remove(entry.path)
+                    removed_files += 1
+
+    return {'sessions': len(expired), 'files': removed_files}
+
+
+__all__ = [
+    'UploadChunkError',
+    'create_session',
+    'write_chunk',
+    'complete_session',
+    'local_file_path',
+    'abort_session',
+    'gc_expired_sessions',
+]
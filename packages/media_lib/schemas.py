@@ -19,6 +19,11 @@ class MLFileVariantSchema(Schema):
     width = fields.Int()
     height = fields.Int()
     file_size = fields.Int()
+    format = fields.Str()
+
+
+# 變體 schema 只建立一次（列表的每個檔案、每種變體共用）
+_variant_schema = MLFileVariantSchema()
 
 
 class MLFileMetadataSchema(Schema):
@@ -46,6 +51,17 @@ class MLFileSchema(Schema):
     folder_id = fields.Int()
     uploaded_by = fields.Int()
     attributes = fields.Dict()
+    processing_status = fields.Str()
+    # 變體工作計算後存於 attributes（處理中時為 None）
+    lqip = fields.Function(lambda obj: (obj.attributes or {}).get('lqip'))
+    dominant_color = fields.Function(lambda obj: (obj.attributes or {}).get('dominant_color'))
+    srcset = fields.Function(lambda obj: (obj.attributes or {}).get('srcset'))
+    sizes = fields.Function(lambda obj: (obj.attributes or {}).get('sizes'))
+    # 焦點（未設定為 None，裁切時以中心處理）與依焦點產生的固定比例裁切圖（見 crops.py）
+    focal_point = fields.Function(lambda obj: (obj.attributes or {}).get('focal_point'))
+    crops = fields.Function(lambda obj: (obj.attributes or {}).get('crops'))
+    content_hash = fields.Str()
+    duplicate_of_id = fields.Int()
     created_at = fields.DateTime(dump_only=True)
     updated_at = fields.DateTime(dump_only=True)
     tags = fields.List(fields.Nested(MLTagSchema))
@@ -53,8 +69,13 @@ class MLFileSchema(Schema):
     metadata = fields.Nested(MLFileMetadataSchema, attribute='file_metadata')
 
     def get_formats(self, obj):
-        if hasattr(obj, 'variants'):
-            return {v.variant_type: MLFileVariantSchema().dump(v) for v in obj.variants}
+        if hasattr(obj, 'grouped_variants'):
+            formats = {}
+            for variant_type, (primary, alternates) in obj.grouped_variants().items():
+                data = _variant_schema.dump(primary)
+                data['alternates'] = {v.format: {'url': v.public_url, 'file_size': v.file_size} for v in alternates}
+                formats[variant_type] = data
+            return formats
         return {}
 
 
@@ -83,6 +104,9 @@ class MLFolderSchema(Schema):
             return {
                 'id': thumb.id,
                 'url': thumb.public_url,
-                'formats': {v.variant_type: {'url': v.public_url, 'width': v.width, 'height': v.height} for v in thumb.variants} if hasattr(thumb, 'variants') else {}
+                'formats': {
+                    variant_type: {'url': v.public_url, 'width': v.width, 'height': v.height}
+                    for variant_type, (v, _) in thumb.grouped_variants().items()
+                } if hasattr(thumb, 'grouped_variants') else {}
             }
         return None
@@ -0,0 +1,104 @@
+"""
+Media Library - 直接上傳到儲存（signed upload）
+
+檔案內容不經過 gunicorn worker：
+
+1. issue_upload()：預先決定儲存路徑，發出上傳 URL 與 finalize token。
+   - GCS：V4 signed PUT URL，client 直接上傳到 bucket。
+   - Local：指向 PUT /uploads/signed/<token> 的 HMAC 簽章 URL（Local 模式本來就
+     由 Flask 提供檔案，這裡維持相同介面；內容以串流寫入，不讀入記憶體）。
+2. client 上傳完成後呼叫 finalize，以 load_token() 驗證 token，
+   確認物件存在、大小與內容相符後建立 MLFile 記錄。
+
+token 以 itsdangerous 與 SECRET_KEY 簽章（不需額外資料表），內容包含儲存路徑、
+原始檔名、MIME、大小上限、資料夾與上傳者。
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from flask import current_app, url_for
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+
+from packages.media_lib.config import SIGNED_UPLOAD_FINALIZE_WINDOW, SIGNED_UPLOAD_URL_EXPIRES
+from packages.media_lib.storage import MediaStorage
+
+
+_TOKEN_SALT = 'media-lib-signed-upload'
+
+
+class InvalidUploadToken(Exception):
+    """token 簽章錯誤或已逾期。"""
+
+
+def _serializer() -> URLSafeTimedSerializer:
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=_TOKEN_SALT)
+
+
+def _url_expires() -> int:
+    return int(current_app.config.get('MEDIA_SIGNED_UPLOAD_EXPIRES', SIGNED_UPLOAD_URL_EXPIRES))
+
+
+def issue_upload(filename: str, content_type: str, max_size: int,
+                 folder_id: Optional[int] = None, user_id: Optional[int] = None) -> dict:
+    """
+    發出直接上傳所需的資訊。
+
+    Returns:
+        {
+            'upload_url': 上傳目標 URL,
+            'method': 'PUT',
+            'headers': client 上傳時必須送出的 headers,
+            'token': finalize 用的 token,
+            'expires_at': 上傳 URL 到期時間（ISO 8601）,
+        }
+    """
+    storage = MediaStorage.get_instance()
+    storage_path, unique_name = storage.new_storage_path(filename)
+    expires_in = _url_expires()
+
+    token = _serializer().dumps({
+        'path': storage_path,
+        'name': unique_name,
+        'filename': filename,
+        'type': content_type,
+        'max': max_size,
+        'folder': folder_id,
+        'user': user_id,
+    })
+
+    if storage.is_gcs:
+        upload_url, headers = storage.generate_signed_upload_url(
+            storage_path, content_type, max_size, timedelta(seconds=expires_in)
+        )
+    else:
+        upload_url = url_for('media_lib.signed_upload_put', token=token)
+        headers = {'Content-Type': content_type}
+
+    return {
+        'upload_url': upload_url,
+        'method': 'PUT',
+        'headers': headers,
+        'token': token,
+        'expires_at': (datetime.now(timezone.utc) + timedelta(seconds=expires_in)).isoformat(),
+    }
+
+
+def load_token(token: str, for_finalize: bool = False) -> dict:
+    """
+    驗證並解開 token。上傳 URL 的有效期為 MEDIA_SIGNED_UPLOAD_EXPIRES；
+    finalize 另外寬限 SIGNED_UPLOAD_FINALIZE_WINDOW（大檔案上傳需要時間）。
+
+    Raises:
+        InvalidUploadToken
+    """
+    max_age = _url_expires() + (SIGNED_UPLOAD_FINALIZE_WINDOW if for_finalize else 0)
+    try:
+        return _serializer().loads(token, max_age=max_age)
+    except SignatureExpired:
+        raise InvalidUploadToken('Upload token expired')
+    except BadSignature:
+        raise InvalidUploadToken('Invalid upload token')
+
+
+__all__ = ['InvalidUploadToken', 'issue_upload', 'load_token']
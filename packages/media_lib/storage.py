@@ -5,18 +5,77 @@ Media Library - Storage Service
 透過 Flask config 中的 GCS_BUCKET_NAME 自動決定使用哪種後端：
 - 有 GCS_BUCKET_NAME → GCS 模式
 - 無 GCS_BUCKET_NAME → Local 模式（檔案存在 UPLOAD_FOLDER）
+
+批次操作（upload_many / delete_many）在 GCS 模式以有上限的 thread pool 並行，
+共用同一個 HTTP 連線池；每個物件各自回報成功或失敗。
 """
 
+import hashlib
 import os
+import shutil
+import tempfile
+import threading
 import uuid
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 from io import BytesIO
-from typing import Tuple, Optional, BinaryIO
+from typing import Callable, Iterable, Iterator, List, Tuple, Optional, BinaryIO
 
 from flask import current_app
 from werkzeug.utils import secure_filename
 
-from packages.media_lib.config import GCS_BASE_PATH
+from packages.media_lib.config import (
+    GCS_BASE_PATH,
+    GCS_UPLOAD_CHUNK_SIZE,
+    SPOOL_CHUNK_SIZE,
+    STORAGE_MAX_CONCURRENCY,
+)
+from packages.media_lib.utils import SNIFF_BYTES
+
+
+class FileTooLargeError(Exception):
+    """串流上傳超過大小上限。"""
+
+    def __init__(self, max_size: int):
+        super().__init__(f'File exceeds {max_size} bytes')
+        self.max_size = max_size
+
+
+@dataclass
+class SpooledFile:
+    """
+    已寫入暫存檔的上傳內容；大小、sha256 與檔頭在同一次讀取中取得。
+    用完後呼叫 discard()（upload_spooled 成功時暫存檔已被移走）。
+    """
+    path: str
+    size: int
+    sha256: str
+    head: bytes
+
+    def discard(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+@dataclass
+class StorageResult:
+    """批次操作中單一物件的結果。"""
+    path: str
+    ok: bool
+    url: Optional[str] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class StoredObject:
+    """list_objects 列出的物件。"""
+    name: str
+    size: int
+    content_type: Optional[str]
+    updated: Optional[datetime]   # aware datetime（UTC）
 
 
 class MediaStorage:
@@ -29,8 +88,12 @@ class MediaStorage:
 
     _instance = None
 
-    def __init__(self, backend: str, **kwargs):
+    def __init__(self, backend: str, max_concurrency: int = STORAGE_MAX_CONCURRENCY, **kwargs):
         self.backend = backend  # 'local' or 'gcs'
+        self.max_concurrency = max(1, max_concurrency)
+        self._executor = None
+        self._executor_pid = None
+        self._executor_lock = threading.Lock()
 
         if backend == 'gcs':
             from google.cloud import storage
@@ -41,6 +104,7 @@ class MediaStorage:
                 self.client = storage.Client.from_service_account_json(credentials_path)
             else:
                 self.client = storage.Client()
+            self._configure_http_pool()
             self.bucket = self.client.bucket(self.bucket_name)
 
         elif backend == 'local':
@@ -54,10 +118,12 @@ class MediaStorage:
         if cls._instance is None:
             bucket_name = current_app.config.get('GCS_BUCKET_NAME')
 
+            max_concurrency = int(current_app.config.get('MEDIA_STORAGE_CONCURRENCY', STORAGE_MAX_CONCURRENCY))
             if bucket_name:
                 credentials_path = current_app.config.get('GCS_CREDENTIALS_JSON')
                 cls._instance = cls(
                     'gcs',
+                    max_concurrency=max_concurrency,
                     bucket_name=bucket_name,
                     credentials_path=credentials_path,
                 )
@@ -73,7 +139,7 @@ class MediaStorage:
                     base_path = os.path.abspath(
                         os.path.join(current_app.instance_path, '..', uploads_folder)
                     )
-                cls._instance = cls('local', base_path=base_path)
+                cls._instance = cls('local', max_concurrency=max_concurrency, base_path=base_path)
                 current_app.logger.info(
                     f'MediaStorage initialized with Local backend (path: {base_path})'
                 )
@@ -92,10 +158,25 @@ class MediaStorage:
     def is_gcs(self) -> bool:
         return self.backend == 'gcs'
 
+    def _configure_http_pool(self):
+        """
+        GCS client 預設的 requests 連線池只有 10 條連線；放大到批次並行數，
+        讓 upload_many / delete_many 的每個執行緒都能重用 keep-alive 連線。
+        """
+        from requests.adapters import HTTPAdapter
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(10, self.max_concurrency))
+        self.client._http.mount('https://', adapter)
+
     # -------------------------------------------------------------------------
     # Path Generation
     # -------------------------------------------------------------------------
 
+    def public_url_for(self, storage_path: str) -> str:
+        """儲存路徑對應的 public url。"""
+        if self.is_gcs:
+            return f'{self.public_url_prefix}/{storage_path}'
+        return f'{self.url_prefix}/{storage_path}'
+
     def _generate_path(self, filename: str, prefix: str = '') -> Tuple[str, str]:
         """
         產生儲存路徑和唯一檔名。
@@ -141,7 +222,7 @@ class MediaStorage:
             return self._upload_local(file, storage_path, unique_name)
 
     def _upload_gcs(self, file, storage_path, unique_name, content_type):
-        blob = self.bucket.blob(storage_path)
+        blob = self.bucket.blob(storage_path, chunk_size=GCS_UPLOAD_CHUNK_SIZE)
         if hasattr(file, 'seek'):
             file.seek(0)
         if content_type is None and hasattr(file, 'content_type'):
@@ -164,14 +245,226 @@ class MediaStorage:
             file.save(full_path)
         elif hasattr(file, 'read'):
             with open(full_path, 'wb') as f:
-                f.write(file.read())
+                shutil.copyfileobj(file, f, SPOOL_CHUNK_SIZE)
         else:
-            import shutil
             shutil.copy2(file, full_path)
 
         public_url = f'{self.url_prefix}/{storage_path}'
         return public_url, storage_path, unique_name
 
+    # -------------------------------------------------------------------------
+    # Streaming Upload
+    # -------------------------------------------------------------------------
+
+    def spool(self, stream: BinaryIO, max_size: int) -> SpooledFile:
+        """
+        以固定大小區塊讀取上傳串流並寫入暫存檔，同時計算 sha256、大小並保留檔頭
+        （供 MIME sniff）；記憶體用量與檔案大小無關。
+
+        Local 模式暫存檔放在 base_path/.tmp（與目的地同一檔案系統，可直接 os.replace）。
+
+        Raises:
+            FileTooLargeError: 超過 max_size（暫存檔已刪除）
+        """
+        if self.is_local:
+            spool_dir = os.path.join(self.base_path, '.tmp')
+            os.makedirs(spool_dir, exist_ok=True)
+        else:
+            spool_dir = None
+
+        digest = hashlib.sha256()
+        size = 0
+        head = b''
+        fd, path = tempfile.mkstemp(prefix='upload-', suffix='.part', dir=spool_dir)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = stream.read(SPOOL_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_size:
+                        raise FileTooLargeError(max_size)
+                    if len(head) < SNIFF_BYTES:
+                        head += chunk[:SNIFF_BYTES - len(head)]
+                    digest.update(chunk)
+                    out.write(chunk)
+        except BaseException:
+            os.remove(path)
+            raise
+        return SpooledFile(path=path, size=size, sha256=digest.hexdigest(), head=head)
+
+    def upload_spooled(
+        self,
+        spooled: SpooledFile,
+        filename: str,
+        content_type: Optional[str] = None,
+        prefix: str = '',
+    ) -> Tuple[str, str, str]:
+        """
+        上傳 spool() 產生的暫存檔：Local 直接 os.replace 到目的地（不再複製），
+        GCS 以 resumable upload 分段上傳（每段 GCS_UPLOAD_CHUNK_SIZE）。
+
+        Returns:
+            (public_url, storage_path, unique_filename)
+        """
+        storage_path, unique_name = self._generate_path(filename, prefix)
+
+        if self.is_gcs:
+            blob = self.bucket.blob(storage_path, chunk_size=GCS_UPLOAD_CHUNK_SIZE)
+            blob.upload_from_filename(spooled.path, content_type=content_type)
+            spooled.discard()
+            return f'{self.public_url_prefix}/{storage_path}', storage_path, unique_name
+
+        full_path = os.path.join(self.base_path, storage_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        os.replace(spooled.path, full_path)
+        os.chmod(full_path, 0o644)  # mkstemp 建立的檔案為 0600
+        return f'{self.url_prefix}/{storage_path}', storage_path, unique_name
+
+    # -------------------------------------------------------------------------
+    # Resumable Upload (chunked, see resumable.py)
+    # -------------------------------------------------------------------------
+
+    def new_storage_path(self, filename: str, prefix: str = '') -> Tuple[str, str]:
+        """預先產生儲存路徑（可續傳上傳在建立 session 時決定最終路徑）。"""
+        return self._generate_path(filename, prefix)
+
+    def create_staging_file(self, token: str) -> str:
+        """Local：建立可續傳上傳的暫存檔（與目的地同一檔案系統），回傳完整路徑。"""
+        spool_dir = os.path.join(self.base_path, '.tmp')
+        os.makedirs(spool_dir, exist_ok=True)
+        path = os.path.join(spool_dir, f'resumable-{token}.part')
+        open(path, 'wb').close()
+        return path
+
+    def commit_staged(self, staging_path: str, storage_path: str) -> str:
+        """Local：將完成的暫存檔 os.replace 到最終路徑（不複製資料），回傳 public url。"""
+        full_path = os.path.join(self.base_path, storage_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        os.replace(staging_path, full_path)
+        os.chmod(full_path, 0o644)
+        return f'{self.url_prefix}/{storage_path}'
+
+    def create_resumable_session(self, storage_path: str, content_type: Optional[str], size: int) -> str:
+        """GCS：建立 resumable upload session，回傳 session URI（資料直接寫入最終物件）。"""
+        blob = self.bucket.blob(storage_path)
+        return blob.create_resumable_upload_session(content_type=content_type, size=size)
+
+    def put_resumable_chunk(self, session_url: str, body, offset: int, length: int, total: int) -> int:
+        """
+        GCS：將一段資料 PUT 到 resumable session，回傳 GCS 已持久化的 offset。
+        body 為 file-like（串流送出，不讀入記憶體）。
+        """
+        end = offset + length - 1
+        resp = self.client._http.put(
+            session_url,
+            data=body,
+            headers={
+                'Content-Length': str(length),
+                'Content-Range': f'bytes {offset}-{end}/{total}',
+            },
+        )
+        return self._resumable_offset(resp, total)
+
+    def query_resumable_offset(self, session_url: str, total: int) -> int:
+        """GCS：查詢 resumable session 目前已持久化的 offset（中斷後對齊用）。"""
+        resp = self.client._http.put(
+            session_url,
+            headers={'Content-Length': '0', 'Content-Range': f'bytes */{total}'},
+        )
+        return self._resumable_offset(resp, total)
+
+    def cancel_resumable_session(self, session_url: str) -> None:
+        """GCS：取消 resumable session（GCS 以 499 回應）。"""
+        self.client._http.delete(session_url)
+
+    @staticmethod
+    def _resumable_offset(resp, total: int) -> int:
+        if resp.status_code in (200, 201):
+            return total
+        if resp.status_code == 308:
+            # Range: bytes=0-N 表示已收到 N+1 bytes；沒有 Range 表示尚未收到任何資料
+            range_header = resp.headers.get('Range')
+            return int(range_header.rsplit('-', 1)[1]) + 1 if range_header else 0
+        raise IOError(f'GCS resumable upload error {resp.status_code}: {resp.text[:200]}')
+
+    # -------------------------------------------------------------------------
+    # Signed Direct Upload (see signed_uploads.py)
+    # -------------------------------------------------------------------------
+
+    def generate_signed_upload_url(
+        self,
+        storage_path: str,
+        content_type: str,
+        max_size: int,
+        expiration: timedelta,
+    ) -> Tuple[str, dict]:
+        """
+        GCS：產生 V4 signed PUT URL，client 直接上傳到 GCS（不經過 Flask worker）。
+
+        簽章包含以下 headers，client 上傳時必須原樣送出：
+        - Content-Type
+        - x-goog-content-length-range：GCS 端強制大小上限
+        - x-goog-if-generation-match: 0：物件已存在時拒絕（URL 不能用來覆寫檔案）
+
+        Returns:
+            (signed_url, required_headers)
+        """
+        headers = {
+            'Content-Type': content_type,
+            'x-goog-content-length-range': f'0,{max_size}',
+            'x-goog-if-generation-match': '0',
+        }
+        kwargs = {}
+        credentials = self.client._credentials
+        if not hasattr(credentials, 'signer_email'):
+            # 非 service account 金鑰（例如 Cloud Run 預設憑證）：改由 IAM signBlob 簽章
+            from google.auth.transport.requests import Request
+            if not credentials.valid:
+                credentials.refresh(Request())
+            kwargs = {
+                'service_account_email': credentials.service_account_email,
+                'access_token': credentials.token,
+            }
+        url = self.bucket.blob(storage_path).generate_signed_url(
+            version='v4',
+            expiration=expiration,
+            method='PUT',
+            content_type=content_type,
+            headers=dict(headers),  # generate_signed_url 會在傳入的 dict 加上 Host
+            **kwargs,
+        )
+        return url, headers
+
+    def object_info(self, storage_path: str) -> Optional[dict]:
+        """
+        取得已上傳物件的大小與 Content-Type，不存在時回傳 None。
+
+        Returns:
+            {'size': int, 'content_type': str or None}
+        """
+        if self.is_gcs:
+            blob = self.bucket.get_blob(storage_path)
+            if blob is None:
+                return None
+            return {'size': blob.size, 'content_type': blob.content_type}
+
+        full_path = self.get_local_file_path(storage_path)
+        if full_path is None:
+            return None
+        return {'size': os.path.getsize(full_path), 'content_type': None}
+
+    def read_head(self, storage_path: str, length: int) -> bytes:
+        """讀取物件開頭的 length bytes（MIME sniff 用，GCS 以 range request 取得）。"""
+        if self.is_gcs:
+            return self.bucket.blob(storage_path).download_as_bytes(start=0, end=length - 1)
+        full_path = self.get_local_file_path(storage_path)
+        if full_path is None:
+            raise FileNotFoundError(storage_path)
+        with open(full_path, 'rb') as f:
+            return f.read(length)
+
     # -------------------------------------------------------------------------
     # Upload Bytes (for image variants)
     # -------------------------------------------------------------------------
@@ -195,10 +488,66 @@ class MediaStorage:
         else:
             full_path = os.path.join(self.base_path, storage_path)
             os.makedirs(os.path.dirname(full_path), exist_ok=True)
-            with open(full_path, 'wb') as f:
-                f.write(data)
+            # 先寫暫存檔再 os.replace：覆寫既有物件（重試、原檔最佳化）時不會讀到寫到一半的檔案
+            tmp_path = f'{full_path}.{uuid.uuid4().hex}.part'
+            try:
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, full_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
             return f'{self.url_prefix}/{storage_path}'
 
+    # -------------------------------------------------------------------------
+    # Download
+    # -------------------------------------------------------------------------
+
+    def download_bytes(self, path_or_url: str) -> bytes:
+        """下載檔案內容（背景工作產生變體用）。找不到檔案時 raise FileNotFoundError。"""
+        if self.is_gcs:
+            from google.api_core.exceptions import NotFound
+            gcs_path = path_or_url
+            if path_or_url.startswith('http'):
+                gcs_path = path_or_url.split(f'{self.bucket_name}/')[-1]
+            try:
+                return self.bucket.blob(gcs_path).download_as_bytes()
+            except NotFound:
+                raise FileNotFoundError(gcs_path)
+
+        full_path = self.get_local_file_path(self._local_relative_path(path_or_url))
+        if full_path is None:
+            raise FileNotFoundError(path_or_url)
+        with open(full_path, 'rb') as f:
+            return f.read()
+
+    def sha256_of(self, storage_path: str) -> str:
+        """串流讀取物件並計算 SHA-256（hex），不將整個檔案讀入記憶體。找不到時 raise FileNotFoundError。"""
+        digest = hashlib.sha256()
+        if self.is_gcs:
+            from google.api_core.exceptions import NotFound
+            try:
+                with self.bucket.blob(storage_path).open('rb', chunk_size=GCS_UPLOAD_CHUNK_SIZE) as f:
+                    for chunk in iter(lambda: f.read(SPOOL_CHUNK_SIZE), b''):
+                        digest.update(chunk)
+            except NotFound:
+                raise FileNotFoundError(storage_path)
+            return digest.hexdigest()
+
+        full_path = self.get_local_file_path(storage_path)
+        if full_path is None:
+            raise FileNotFoundError(storage_path)
+        with open(full_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(SPOOL_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _local_relative_path(self, path_or_url: str) -> str:
+        if path_or_url.startswith(self.url_prefix):
+            return path_or_url[len(self.url_prefix):].lstrip('/')
+        return path_or_url.lstrip('/')
+
     # -------------------------------------------------------------------------
     # Delete
     # -------------------------------------------------------------------------
@@ -267,6 +616,97 @@ class MediaStorage:
         except Exception:
             return False
 
+    # -------------------------------------------------------------------------
+    # List (GCS import scan, see gcs_import.py)
+    # -------------------------------------------------------------------------
+
+    def list_objects(self, prefix: str, start_offset: Optional[str] = None,
+                     page_size: int = 1000) -> Iterator[StoredObject]:
+        """
+        依名稱順序列出 prefix 下的物件（GCS 模式），由 start_offset（含）開始。
+        只要求 name / size / contentType / updated 欄位，減少大量物件時的回應大小；
+        分頁由 client library 依 page_size 逐頁取得，不一次載入全部。
+        """
+        if not self.is_gcs:
+            raise RuntimeError('Object listing is only available in GCS mode')
+        blobs = self.bucket.list_blobs(
+            prefix=prefix,
+            start_offset=start_offset or None,
+            page_size=page_size,
+            fields='items(name,size,contentType,updated),nextPageToken',
+        )
+        for blob in blobs:
+            yield StoredObject(blob.name, int(blob.size or 0), blob.content_type, blob.updated)
+
+    # -------------------------------------------------------------------------
+    # Batch Operations
+    # -------------------------------------------------------------------------
+
+    def upload_many(self, items: Iterable[Tuple[bytes, str, str]]) -> List[StorageResult]:
+        """
+        批次上傳 bytes（用於圖片變體）。
+
+        Args:
+            items: (data, storage_path, content_type) 的 iterable
+
+        Returns:
+            與 items 順序相同的 StorageResult list（成功時含 public url）
+        """
+        def _upload(item):
+            data, storage_path, content_type = item
+            return StorageResult(storage_path, True, url=self.upload_bytes(data, storage_path, content_type))
+
+        return self._run_many(_upload, list(items), key=lambda item: item[1])
+
+    def delete_many(self, paths: Iterable[str]) -> List[StorageResult]:
+        """
+        批次刪除檔案。
+
+        Returns:
+            與 paths 順序相同的 StorageResult list（檔案不存在時 ok=False）
+        """
+        def _delete(path_or_url):
+            if self.is_gcs:
+                from google.api_core.exceptions import NotFound
+                try:
+                    return StorageResult(path_or_url, self._delete_gcs(path_or_url))
+                except NotFound:
+                    return StorageResult(path_or_url, False, error='not found')
+            ok = self._delete_local(path_or_url)
+            return StorageResult(path_or_url, ok, error=None if ok else 'not found or not allowed')
+
+        return self._run_many(_delete, [p for p in paths if p], key=lambda path: path)
+
+    def _run_many(self, func: Callable, items: list, key: Callable) -> List[StorageResult]:
+        """
+        對每個項目執行 func，例外轉為失敗的 StorageResult。
+        GCS 模式以 thread pool 並行（在 app context 中執行）；Local 模式直接依序執行。
+        """
+        app = current_app._get_current_object()
+
+        def _call(item):
+            with app.app_context():
+                try:
+                    return func(item)
+                except Exception as e:
+                    app.logger.error(f'Storage batch operation failed for {key(item)}: {e}')
+                    return StorageResult(key(item), False, error=str(e))
+
+        if self.is_local or len(items) <= 1:
+            return [_call(item) for item in items]
+        return list(self._get_executor().map(_call, items))
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # fork（gunicorn）後 thread pool 不可用，每個 process 各自建立
+        pid = os.getpid()
+        with self._executor_lock:
+            if self._executor is None or self._executor_pid != pid:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency, thread_name_prefix='media-storage'
+                )
+                self._executor_pid = pid
+            return self._executor
+
     # -------------------------------------------------------------------------
     # Local File Serving Helper
     # -------------------------------------------------------------------------
@@ -293,4 +733,4 @@ class MediaStorage:
         return None
 
 
-__all__ = ['MediaStorage']
+__all__ = ['MediaStorage', 'StorageResult', 'StoredObject', 'SpooledFile', 'FileTooLargeError']
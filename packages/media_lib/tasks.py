@@ -0,0 +1,346 @@
+"""
+Media Library - 背景工作處理函式
+
+- variants：下載原檔、產生圖片變體（原圖格式 + WebP / AVIF；動畫為動畫 GIF + 動畫 WebP）並上傳，
+  完成後寫入 file_variants 並將檔案狀態設為 ready。同時計算 LQIP、主色與
+  srcset / sizes 存入 attributes，前端不需再自行組合。共用同一原檔的重複記錄（見 dedup.py）一併更新。
+  依焦點裁切的固定比例衍生圖（見 crops.py）也在同一工作中產生。
+  產生變體前先無損最佳化原檔（移除 metadata，見 optimize.py）；變體依 EXIF 方向轉正。
+  原檔需完整下載到記憶體，超過圖片上傳上限（MEDIA_MAX_FILE_SIZE）者不處理。
+- crops：焦點變更後只重新產生裁切圖，取代舊的裁切記錄並刪除舊物件。
+
+編碼與上傳完成後各續約一次（jobs.touch_job），寫入變體記錄前確認工作仍由自己持有；
+大型圖片處理超過 JOB_STALE_AFTER 時不會被其他 worker 重複執行。
+"""
+
+import hashlib
+import os
+
+from flask import current_app
+
+from core.backend_engine.factory import db
+from packages.media_lib import dedup, optimize
+from packages.media_lib.crops import CROP_PREFIX, crop_attributes, focal_point, focal_token
+from packages.media_lib.encoder import encode_variants
+from packages.media_lib.config import ANIMATED_ORIGINAL, MAX_FILE_SIZE, MAX_SOURCE_PIXELS
+from packages.media_lib.image_processor import (
+    SourceTooLargeError,
+    generate_crops,
+    get_image_dimensions,
+    is_image,
+    optimize_original,
+    placeholder_info,
+    source_format,
+)
+from packages.media_lib.jobs import JobLeaseLost, PermanentJobError, enqueue_job, job_handler, touch_job
+from packages.media_lib.models import MLFile, MLFileVariant, MLJob
+from packages.media_lib.storage import MediaStorage
+
+
+JOB_VARIANTS = 'variants'
+JOB_CROPS = 'crops'
+
+
+def check_source_size(ml_file: MLFile) -> None:
+    """
+    原檔大小不可超過圖片上傳上限（下載前檢查；MAX_SOURCE_PIXELS 要解碼時才能判斷，
+    超過時 image_processor raise SourceTooLargeError，同樣視為不可重試）。
+
+    Raises:
+        PermanentJobError
+    """
+    limit = int(current_app.config.get('MEDIA_MAX_FILE_SIZE', MAX_FILE_SIZE))
+    if (ml_file.file_size or 0) > limit:
+        raise PermanentJobError(f'Original too large to process: {ml_file.file_size} bytes (max {limit})')
+
+
+def renew_lease(job_id: int, worker_id: str, commit: bool = True) -> None:
+    """
+    續約工作（commit=False 時與接下來的寫入一起 commit）。
+
+    Raises:
+        JobLeaseLost: 工作已被其他 worker 重新領取
+    """
+    if not touch_job(job_id, worker_id, commit=commit):
+        raise JobLeaseLost(f'Job {job_id} is no longer held by {worker_id}')
+
+
+def variant_storage_path(gcs_path: str, filename: str, variant_type: str, ext: str) -> str:
+    """
+    變體的儲存路徑：與原檔同目錄，檔名加上變體類型前綴；副檔名不同時替換。
+    路徑是確定性的，重試時會覆寫同一個物件。
+    """
+    base_path = os.path.dirname(gcs_path)
+    path = f'{base_path}/{variant_type}_{filename}'
+    if ext != os.path.splitext(filename)[1]:
+        path = os.path.splitext(path)[0] + ext
+    return path
+
+
+def responsive_attributes(ml_file: MLFile, uploaded: list) -> dict:
+    """
+    由已上傳的變體組出 srcset（每種格式一組，依寬度遞增）與預設 sizes。
+    沒有變體時（原圖小於縮圖規格）以原檔作為唯一來源。
+
+    Returns:
+        {'srcset': {'jpeg': 'url 60w, url 180w, ...', 'webp': ...}, 'sizes': '(max-width: 1280px) 100vw, 1280px'}
+    """
+    by_format = {}
+    for v, _, url in uploaded:
+        if 'aspect' in v:
+            continue  # 裁切圖的長寬比不同，不列入原圖的 srcset
+        by_format.setdefault(v['format'], []).append((v['width'], url))
+    if ml_file.width and any(v['variant_type'] == ANIMATED_ORIGINAL for v, _, _ in uploaded):
+        # 原尺寸的動畫 WebP 對應的原圖格式來源即原檔
+        by_format.setdefault(source_format(ml_file.mime_type), []).append((ml_file.width, ml_file.public_url))
+    if not by_format and ml_file.width:
+        by_format[source_format(ml_file.mime_type)] = [(ml_file.width, ml_file.public_url)]
+    if not by_format:
+        return {}
+
+    srcset = {
+        fmt: ', '.join(f'{url} {width}w' for width, url in sorted(entries))
+        for fmt, entries in by_format.items()
+    }
+    max_width = max(width for entries in by_format.values() for width, _ in entries)
+    return {'srcset': srcset, 'sizes': f'(max-width: {max_width}px) 100vw, {max_width}px'}
+
+
+def enqueue_variants(ml_file: MLFile) -> MLJob:
+    """標記檔案為 processing 並排入變體工作（不 commit）。"""
+    ml_file.processing_status = 'processing'
+    return enqueue_job(JOB_VARIANTS, file_id=ml_file.id)
+
+
+def enqueue_crops(ml_file: MLFile) -> MLJob:
+    """排入裁切圖工作（焦點變更後；不 commit）。"""
+    return enqueue_job(JOB_CROPS, file_id=ml_file.id)
+
+
+def variant_paths(ml_file: MLFile, variants: list) -> list:
+    """變體與裁切圖的儲存路徑。裁切圖的路徑含焦點代碼，焦點變更後網址不同（不會命中 CDN 的舊快取）。"""
+    token = focal_token(focal_point(ml_file))
+    return [
+        variant_storage_path(
+            ml_file.gcs_path, ml_file.filename,
+            f"{v['variant_type']}-{token}" if 'aspect' in v else v['variant_type'], v['ext'],
+        )
+        for v in variants
+    ]
+
+
+def upload_variants(storage: MediaStorage, variants: list, paths: list) -> list:
+    """
+    上傳變體與裁切圖（不使用 DB session，可在其他執行緒執行）。
+
+    Returns:
+        [(variant dict, 儲存路徑, public url), ...]
+    """
+    results = storage.upload_many(
+        (v['data'], path, v['content_type']) for v, path in zip(variants, paths)
+    )
+    failed = [r for r in results if not r.ok]
+    if failed:
+        # 已上傳的變體路徑固定，重試時會覆寫
+        raise RuntimeError(f'{len(failed)} variant upload(s) failed: {failed[0].path}: {failed[0].error}')
+    return [(v, r.path, r.url) for v, r in zip(variants, results)]
+
+
+def replace_variants(ml_file: MLFile, uploaded: list, computed: dict, crops_only: bool = False,
+                     commit: bool = True) -> set:
+    """
+    以新結果取代既有變體記錄（重試 / 重新處理）；共用原檔的記錄使用相同的變體物件。
+    crops_only 時只取代裁切圖。commit 時，不再被任何記錄使用的舊物件（例如舊焦點的裁切圖）
+    於 commit 後刪除；不 commit 時由呼叫端 commit 後以 delete_unused_variants 刪除。
+
+    Returns:
+        被取代的舊物件路徑
+    """
+    targets = [ml_file] + dedup.sharing_files(ml_file)
+    old_rows = MLFileVariant.query.filter(MLFileVariant.file_id.in_([f.id for f in targets]))
+    if crops_only:
+        old_rows = old_rows.filter(MLFileVariant.variant_type.startswith(CROP_PREFIX, autoescape=True))
+    stale = {path for (path,) in old_rows.with_entities(MLFileVariant.gcs_path)} - {path for _, path, _ in uploaded}
+    old_rows.delete(synchronize_session=False)
+
+    for target in targets:
+        for v, path, url in uploaded:
+            db.session.add(MLFileVariant(
+                file_id=target.id,
+                variant_type=v['variant_type'],
+                format=v['format'],
+                gcs_path=path,
+                public_url=url,
+                width=v['width'],
+                height=v['height'],
+                file_size=v['file_size'],
+            ))
+        # JSONB 欄位需指定新的 dict 才會寫回
+        target.attributes = {**(target.attributes or {}), **computed}
+        if not crops_only:
+            target.width, target.height = ml_file.width, ml_file.height
+            target.processing_status = 'ready'
+    if commit:
+        db.session.commit()
+        delete_unused_variants(stale)
+    return stale
+
+
+def delete_unused_variants(paths) -> None:
+    """刪除已 commit 後不再被任何變體記錄使用的物件。"""
+    if not paths:
+        return
+    in_use = {
+        path for (path,) in db.session.query(MLFileVariant.gcs_path).filter(MLFileVariant.gcs_path.in_(paths))
+    }
+    unused = sorted(set(paths) - in_use)
+    if unused:
+        for result in MediaStorage.get_instance().delete_many(unused):
+            if not result.ok and result.error:
+                current_app.logger.warning(f'Failed to delete stale variant {result.path}: {result.error}')
+
+
+def prepare_original(ml_file: MLFile, file_data: bytes, storage: MediaStorage) -> bytes:
+    """
+    補上尺寸與雜湊，並無損最佳化原檔（移除 metadata，見 optimize.py）。
+    原檔已覆寫時立即 commit，重試時不再處理。
+
+    Returns:
+        產生變體用的原檔內容（最佳化後）
+    """
+    if ml_file.width is None or ml_file.height is None:
+        ml_file.width, ml_file.height = get_image_dimensions(file_data)
+    # 原檔已下載，順便補上雜湊（可續傳 / 直接上傳的檔案建立時沒有計算）
+    if ml_file.content_hash is None:
+        dedup.assign_hash(ml_file, hashlib.sha256(file_data).hexdigest())
+
+    if optimize.needs_optimization(ml_file):
+        result = optimize_original(file_data, ml_file.mime_type)
+        if result is None:
+            optimize.mark_skipped(ml_file)
+        else:
+            optimize.apply_optimization(ml_file, result, storage)
+            if result['data'] is not None:
+                file_data = result['data']
+        db.session.commit()
+    return file_data
+
+
+def render_outputs(file_data: bytes, mime_type: str, point: dict, size: tuple) -> tuple:
+    """
+    產生變體、裁切圖與 LQIP / 主色（不使用 DB session，可在其他執行緒執行）。
+
+    Args:
+        size: 原圖的 (width, height)
+
+    Returns:
+        (變體 + 裁切圖, placeholder attributes)
+    """
+    variants = encode_variants(file_data, mime_type)
+    crops = generate_crops(file_data, mime_type, point)
+
+    # LQIP / 主色以最小的原圖格式變體產生；沒有變體時原圖本身已小於縮圖規格
+    primary_format = source_format(mime_type)
+    smallest = min((v for v in variants if v['format'] == primary_format),
+                   key=lambda v: v['width'] * v['height'], default=None)
+    width, height = size
+    if smallest is not None:
+        placeholder = placeholder_info(smallest['data'])
+    elif width and height and width * height <= MAX_SOURCE_PIXELS:
+        placeholder = placeholder_info(file_data)
+    else:
+        placeholder = {}
+    return variants + crops, placeholder
+
+
+def variant_attributes(ml_file: MLFile, uploaded: list, placeholder: dict) -> dict:
+    """變體上傳後寫入 attributes 的值（LQIP / 主色、srcset、裁切圖）。"""
+    return {
+        **placeholder,
+        **responsive_attributes(ml_file, uploaded),
+        'crops': crop_attributes(ml_file.mime_type, uploaded),
+    }
+
+
+@job_handler(JOB_VARIANTS)
+def process_variants(job: MLJob) -> None:
+    """產生並上傳圖片變體（可安全重試）。"""
+    job_id, worker_id = job.id, job.locked_by
+    ml_file = db.session.get(MLFile, job.file_id)
+    if ml_file is None:
+        raise PermanentJobError(f'File {job.file_id} no longer exists')
+    if not is_image(ml_file.mime_type):
+        ml_file.processing_status = 'ready'
+        db.session.commit()
+        return
+
+    check_source_size(ml_file)
+    storage = MediaStorage.get_instance()
+    try:
+        file_data = storage.download_bytes(ml_file.gcs_path)
+    except FileNotFoundError as e:
+        raise PermanentJobError(f'Original not found: {e}')
+
+    # 原檔先最佳化，變體以最佳化後的內容產生（像素相同）
+    file_data = prepare_original(ml_file, file_data, storage)
+    try:
+        outputs, placeholder = render_outputs(
+            file_data, ml_file.mime_type, focal_point(ml_file), (ml_file.width, ml_file.height)
+        )
+    except SourceTooLargeError as e:
+        raise PermanentJobError(str(e))
+    del file_data
+    renew_lease(job_id, worker_id)
+
+    uploaded = upload_variants(storage, outputs, variant_paths(ml_file, outputs))
+    renew_lease(job_id, worker_id, commit=False)
+    replace_variants(ml_file, uploaded, variant_attributes(ml_file, uploaded, placeholder))
+
+
+@job_handler(JOB_CROPS)
+def process_crops(job: MLJob) -> None:
+    """依目前的焦點重新產生裁切圖（可安全重試）。"""
+    job_id, worker_id = job.id, job.locked_by
+    ml_file = db.session.get(MLFile, job.file_id)
+    if ml_file is None:
+        raise PermanentJobError(f'File {job.file_id} no longer exists')
+    if not is_image(ml_file.mime_type):
+        return
+
+    check_source_size(ml_file)
+    storage = MediaStorage.get_instance()
+    try:
+        file_data = storage.download_bytes(ml_file.gcs_path)
+    except FileNotFoundError as e:
+        raise PermanentJobError(f'Original not found: {e}')
+
+    try:
+        crops = generate_crops(file_data, ml_file.mime_type, focal_point(ml_file))
+    except SourceTooLargeError as e:
+        raise PermanentJobError(str(e))
+    del file_data
+    renew_lease(job_id, worker_id)
+    uploaded = upload_variants(storage, crops, variant_paths(ml_file, crops))
+    renew_lease(job_id, worker_id, commit=False)
+    replace_variants(ml_file, uploaded, {'crops': crop_attributes(ml_file.mime_type, uploaded)}, crops_only=True)
+
+
+__all__ = [
+    'JOB_VARIANTS',
+    'JOB_CROPS',
+    'check_source_size',
+    'renew_lease',
+    'variant_storage_path',
+    'responsive_attributes',
+    'enqueue_variants',
+    'enqueue_crops',
+    'variant_paths',
+    'upload_variants',
+    'replace_variants',
+    'delete_unused_variants',
+    'prepare_original',
+    'render_outputs',
+    'variant_attributes',
+    'process_variants',
+    'process_crops',
+]
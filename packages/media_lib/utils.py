@@ -3,6 +3,7 @@ Media Library - Utilities
 """
 
 import re
+from typing import Optional
 
 
 def slugify(text: str) -> str:
@@ -12,3 +13,40 @@ def slugify(text: str) -> str:
     text = re.sub(r'[\s_]+', '-', text)
     text = re.sub(r'-+', '-', text)
     return text.strip('-')
+
+
+# 檔頭 magic bytes → MIME type（上傳時以實際內容驗證副檔名 / Content-Type）
+_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'%PDF-', 'application/pdf'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/msword'),  # OLE2（.doc）
+    (b'PK\x03\x04', 'application/zip'),                          # .docx 等 OOXML
+]
+
+# sniff_mime_type 需要的檔頭長度
+SNIFF_BYTES = 512
+
+
+def sniff_mime_type(head: bytes) -> Optional[str]:
+    """
+    依檔頭內容判斷 MIME type；無法辨識時回傳 None。
+
+    Args:
+        head: 檔案開頭的 bytes（至少 SNIFF_BYTES，檔案較小時為整個檔案）
+    """
+    for signature, mime_type in _SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head[:4] == b'RIFF' and head[8:12] == b'AVI ':
+        return 'video/x-msvideo'
+    if head[4:8] == b'ftyp':
+        return 'video/quicktime' if head[8:12] == b'qt  ' else 'video/mp4'
+    if head and b'\x00' not in head:
+        # 純文字（不限編碼，Big5 等也視為文字）
+        return 'text/plain'
+    return None
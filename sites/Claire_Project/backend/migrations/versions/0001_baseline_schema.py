@@ -32,6 +32,8 @@ def upgrade():
     bind = op.get_bind()
     # media_lib 資料表位於獨立 schema，需先建立 schema
     op.execute('CREATE SCHEMA IF NOT EXISTS media_lib')
+    # trigram GIN index（users 搜尋）需要 pg_trgm extension
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
     # 依 model metadata 建立全部資料表（SQLAlchemy 自動處理 FK 依賴順序）
     db.metadata.create_all(bind=bind)
 
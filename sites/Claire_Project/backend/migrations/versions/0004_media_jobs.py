@@ -0,0 +1,51 @@
+"""Media background job queue
+
+Revision ID: 0004_media_jobs
+Revises: 0003_activity_logs_partitioned
+Create Date: 2026-10-19
+
+圖片變體改由背景工作產生：
+- 新增 media_lib.jobs 工作佇列（worker 以 FOR UPDATE SKIP LOCKED 領取）。
+- media_lib.files 新增 processing_status（processing / ready / failed），既有檔案為 ready。
+"""
+from alembic import op
+
+
+revision = '0004_media_jobs'
+down_revision = '0003_activity_logs_partitioned'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        "ALTER TABLE media_lib.files "
+        "ADD COLUMN IF NOT EXISTS processing_status VARCHAR(20) NOT NULL DEFAULT 'ready'"
+    )
+    op.execute(
+        'CREATE TABLE IF NOT EXISTS media_lib.jobs ('
+        'id BIGSERIAL PRIMARY KEY, '
+        'job_type VARCHAR(50) NOT NULL, '
+        'file_id INTEGER REFERENCES media_lib.files (id) ON DELETE CASCADE, '
+        'payload JSONB, '
+        "status VARCHAR(20) NOT NULL DEFAULT 'pending', "
+        'attempts INTEGER NOT NULL DEFAULT 0, '
+        'max_attempts INTEGER NOT NULL DEFAULT 5, '
+        'run_after TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(), '
+        'locked_at TIMESTAMP WITHOUT TIME ZONE, '
+        'locked_by VARCHAR(100), '
+        'last_error TEXT, '
+        'created_at TIMESTAMP WITHOUT TIME ZONE, '
+        'updated_at TIMESTAMP WITHOUT TIME ZONE)'
+    )
+    op.execute('CREATE INDEX IF NOT EXISTS ix_media_lib_jobs_file_id ON media_lib.jobs (file_id)')
+    op.execute('CREATE INDEX IF NOT EXISTS ix_media_lib_jobs_status ON media_lib.jobs (status)')
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS ix_media_lib_jobs_pending ON media_lib.jobs (run_after, id) '
+        "WHERE status = 'pending'"
+    )
+
+
+def downgrade():
+    op.execute('DROP TABLE IF EXISTS media_lib.jobs')
+    op.execute('ALTER TABLE media_lib.files DROP COLUMN IF EXISTS processing_status')
@@ -0,0 +1,45 @@
+"""Resumable upload sessions
+
+Revision ID: 0005_upload_sessions
+Revises: 0004_media_jobs
+Create Date: 2026-10-19
+
+可續傳分段上傳（tus 風格）：新增 media_lib.upload_sessions 記錄每個上傳的
+offset、最終儲存路徑與暫存位置（Local 暫存檔 / GCS resumable session）。
+"""
+from alembic import op
+
+
+revision = '0005_upload_sessions'
+down_revision = '0004_media_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        'CREATE TABLE IF NOT EXISTS media_lib.upload_sessions ('
+        'id VARCHAR(32) PRIMARY KEY, '
+        'filename VARCHAR(255) NOT NULL, '
+        'mime_type VARCHAR(100), '
+        'folder_id INTEGER REFERENCES media_lib.folders (id) ON DELETE SET NULL, '
+        'upload_length BIGINT NOT NULL, '
+        'upload_offset BIGINT NOT NULL DEFAULT 0, '
+        'storage_path VARCHAR(500) NOT NULL, '
+        'unique_name VARCHAR(255) NOT NULL, '
+        'staging_path VARCHAR(500), '
+        'gcs_session_url TEXT, '
+        'file_id INTEGER REFERENCES media_lib.files (id) ON DELETE SET NULL, '
+        'created_by INTEGER REFERENCES users (id) DEFERRABLE, '
+        'expires_at TIMESTAMP WITHOUT TIME ZONE NOT NULL, '
+        'created_at TIMESTAMP WITHOUT TIME ZONE, '
+        'updated_at TIMESTAMP WITHOUT TIME ZONE)'
+    )
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS ix_media_lib_upload_sessions_expires_at '
+        'ON media_lib.upload_sessions (expires_at)'
+    )
+
+
+def downgrade():
+    op.execute('DROP TABLE IF EXISTS media_lib.upload_sessions')
@@ -0,0 +1,35 @@
+"""Variant output formats
+
+Revision ID: 0007_variant_formats
+Revises: 0006_content_hash
+Create Date: 2026-10-19
+
+圖片變體除原圖格式外另產生 WebP / AVIF：media_lib.file_variants 新增 format，
+既有變體依副檔名補上（原本只有原圖格式）。既有圖片以 reprocess 重新產生即會
+補上新格式。
+"""
+from alembic import op
+
+
+revision = '0007_variant_formats'
+down_revision = '0006_content_hash'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('ALTER TABLE media_lib.file_variants ADD COLUMN IF NOT EXISTS format VARCHAR(10)')
+    op.execute(
+        'UPDATE media_lib.file_variants SET format = CASE '
+        "WHEN lower(gcs_path) LIKE '%.png' THEN 'png' "
+        "WHEN lower(gcs_path) LIKE '%.webp' THEN 'webp' "
+        "WHEN lower(gcs_path) LIKE '%.gif' THEN 'gif' "
+        "WHEN lower(gcs_path) LIKE '%.avif' THEN 'avif' "
+        "ELSE 'jpeg' END "
+        'WHERE format IS NULL'
+    )
+    op.execute('ALTER TABLE media_lib.file_variants ALTER COLUMN format SET NOT NULL')
+
+
+def downgrade():
+    op.execute('ALTER TABLE media_lib.file_variants DROP COLUMN IF EXISTS format')
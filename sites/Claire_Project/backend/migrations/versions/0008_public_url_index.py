@@ -0,0 +1,30 @@
+"""Public url indexes for crop lookup
+
+Revision ID: 0008_public_url_index
+Revises: 0007_variant_formats
+Create Date: 2026-10-19
+
+內容 / 首頁 API 依圖片網址（原檔或變體的 public url）查詢依焦點產生的裁切圖
+（packages/media_lib/crops.py），為 media_lib.files 與 media_lib.file_variants
+的 public_url 建立索引，列表頁一次查詢不需掃描全表。
+"""
+from alembic import op
+
+
+revision = '0008_public_url_index'
+down_revision = '0007_variant_formats'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE INDEX IF NOT EXISTS ix_media_lib_files_public_url ON media_lib.files (public_url)')
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS ix_media_lib_file_variants_public_url '
+        'ON media_lib.file_variants (public_url)'
+    )
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS media_lib.ix_media_lib_file_variants_public_url')
+    op.execute('DROP INDEX IF EXISTS media_lib.ix_media_lib_files_public_url')
@@ -0,0 +1,37 @@
+"""GCS import scan checkpoints
+
+Revision ID: 0009_import_scans
+Revises: 0008_public_url_index
+Create Date: 2026-10-19
+
+GCS 掃描匯入改為分批比對、NDJSON 串流回傳（packages/media_lib/gcs_import.py），
+新增 media_lib.import_scans 記錄每個 prefix 的檢查點：進行中掃描的 cursor 與
+上一次完整掃描看到的最新物件更新時間（增量掃描的起點）。
+"""
+from alembic import op
+
+
+revision = '0009_import_scans'
+down_revision = '0008_public_url_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        'CREATE TABLE IF NOT EXISTS media_lib.import_scans ('
+        'id SERIAL PRIMARY KEY, '
+        'prefix VARCHAR(500) NOT NULL UNIQUE, '
+        'cursor VARCHAR(1024), '
+        'since TIMESTAMP WITHOUT TIME ZONE, '
+        'high_water TIMESTAMP WITHOUT TIME ZONE, '
+        'scanned INTEGER NOT NULL DEFAULT 0, '
+        'found INTEGER NOT NULL DEFAULT 0, '
+        'started_at TIMESTAMP WITHOUT TIME ZONE, '
+        'completed_at TIMESTAMP WITHOUT TIME ZONE, '
+        'updated_at TIMESTAMP WITHOUT TIME ZONE)'
+    )
+
+
+def downgrade():
+    op.execute('DROP TABLE IF EXISTS media_lib.import_scans')
@@ -0,0 +1,25 @@
+"""Job progress for bulk imports
+
+Revision ID: 0010_job_progress
+Revises: 0009_import_scans
+Create Date: 2026-10-19
+
+GCS 匯入改為背景工作（packages/media_lib/bulk_import.py），分批建立檔案記錄並產生變體。
+media_lib.jobs 新增 progress 欄位記錄進度與個別檔案的錯誤（GET /import/jobs/<id>），
+工作重試時由此接續。
+"""
+from alembic import op
+
+
+revision = '0010_job_progress'
+down_revision = '0009_import_scans'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('ALTER TABLE media_lib.jobs ADD COLUMN IF NOT EXISTS progress JSONB')
+
+
+def downgrade():
+    op.execute('ALTER TABLE media_lib.jobs DROP COLUMN IF EXISTS progress')
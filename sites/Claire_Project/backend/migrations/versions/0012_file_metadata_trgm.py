@@ -0,0 +1,33 @@
+"""Trigram GIN indexes for public metadata search
+
+Revision ID: 0012_file_metadata_trgm
+Revises: 0011_folder_path_pattern
+Create Date: 2026-10-19
+
+GET /media-lib/public/search 對 media_lib.file_metadata 的 chart_id / location /
+source / license 以 ILIKE '%x%' 部分比對（packages/media_lib/public_queries.py），
+改由 pg_trgm GIN index 支援。chart_id 的等值查詢（/public/lookup）沿用既有的 b-tree index。
+"""
+from alembic import op
+
+
+revision = '0012_file_metadata_trgm'
+down_revision = '0011_folder_path_pattern'
+branch_labels = None
+depends_on = None
+
+COLUMNS = ('chart_id', 'location', 'source', 'license')
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in COLUMNS:
+        op.execute(
+            f'CREATE INDEX IF NOT EXISTS ix_media_lib_file_metadata_{column}_trgm '
+            f'ON media_lib.file_metadata USING gin ({column} gin_trgm_ops)'
+        )
+
+
+def downgrade():
+    for column in reversed(COLUMNS):
+        op.execute(f'DROP INDEX IF EXISTS media_lib.ix_media_lib_file_metadata_{column}_trgm')
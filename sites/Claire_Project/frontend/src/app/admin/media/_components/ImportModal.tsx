@@ -1,9 +1,9 @@
 'use client';
 
-import { useState } from 'react';
+import { useRef, useState } from 'react';
 import Button from '@/components/ui/Button';
 import { importApi } from '@/lib/api/media';
-import type { GcsScanFile } from '@/lib/api/media';
+import type { GcsScanEvent, GcsScanFile } from '@/lib/api/media';
 import type { MediaFolder } from '@/lib/api/strapi';
 import { formatFileSize } from './utils';
 
@@ -26,19 +26,76 @@ export function ImportModal({ isOpen, folders, onClose, onImportComplete }: Impo
   const [targetFolderId, setTargetFolderId] = useState<number | null>(null);
   const [genVariants, setGenVariants] = useState(false);
   const [prefix, setPrefix] = useState('media/');
+  const [incremental, setIncremental] = useState(false);
+  const [scanProgress, setScanProgress] = useState<{ scanned: number; found: number } | null>(null);
   const [result, setResult] = useState<{ imported: number; skipped: number; errors: any[] } | null>(null);
+  const scanAbortRef = useRef<AbortController | null>(null);
 
+  // 以 NDJSON 串流掃描：每批比對完成就加入列表；done.complete 為 false（單次掃描時間上限）時由檢查點續掃
   const handleScan = async () => {
+    scanAbortRef.current?.abort();
+    const controller = new AbortController();
+    scanAbortRef.current = controller;
     setScanning(true);
     setResult(null);
+    setScannedFiles([]);
+    setSelectedFiles(new Set());
+    setScanProgress(null);
+
+    let pending: GcsScanFile[] = [];
+    const flush = () => {
+      if (pending.length === 0) return;
+      const batch = pending;
+      pending = [];
+      setScannedFiles((prev) => [...prev, ...batch]);
+      setSelectedFiles((prev) => new Set([...prev, ...batch.map((f) => f.gcs_path)]));
+    };
+    const scan = { complete: false };
+    const onEvent = (event: GcsScanEvent) => {
+      switch (event.type) {
+        case 'file':
+          pending.push({
+            gcs_path: event.gcs_path,
+            public_url: event.public_url,
+            filename: event.filename,
+            file_size: event.file_size,
+            mime_type: event.mime_type,
+            updated: event.updated,
+          });
+          break;
+        case 'progress':
+          flush();
+          setScanProgress({ scanned: event.scanned, found: event.found });
+          break;
+        case 'done':
+          flush();
+          setScanProgress({ scanned: event.scanned, found: event.found });
+          scan.complete = event.complete;
+          break;
+        case 'error':
+          throw new Error(event.error);
+      }
+    };
+
     try {
-      const data = await importApi.scan(prefix);
-      setScannedFiles(data.files);
-      setSelectedFiles(new Set(data.files.map((f) => f.gcs_path)));
+      let restart = true;
+      do {
+        // 串流中斷（沒有 done 事件）時不再續掃
+        scan.complete = true;
+        await importApi.scanStream(onEvent, { prefix, full: !incremental, restart, signal: controller.signal });
+        restart = false;
+      } while (!scan.complete && !controller.signal.aborted);
     } catch (error) {
-      alert(`掃描失敗: ${(error as Error).message}`);
+      if ((error as Error).name !== 'AbortError') {
+        alert(`掃描失敗: ${(error as Error).message}`);
+      }
     } finally {
-      setScanning(false);
+      // 已中止（關閉視窗或重新掃描）的結果不再加入列表
+      if (!controller.signal.aborted) flush();
+      if (scanAbortRef.current === controller) {
+        scanAbortRef.current = null;
+        setScanning(false);
+      }
     }
   };
 
@@ -81,6 +138,10 @@ export function ImportModal({ isOpen, folders, onClose, onImportComplete }: Impo
   };
 
   const handleClose = () => {
+    scanAbortRef.current?.abort();
+    scanAbortRef.current = null;
+    setScanning(false);
+    setScanProgress(null);
     setScannedFiles([]);
     setSelectedFiles(new Set());
     setResult(null);
@@ -111,6 +172,11 @@ export function ImportModal({ isOpen, folders, onClose, onImportComplete }: Impo
               {scanning ? '掃描中...' : '掃描 GCS'}
             </Button>
           </div>
+          <label className="flex items-center gap-2 text-sm cursor-pointer">
+            <input type="checkbox" checked={incremental} onChange={(e) => setIncremental(e.target.checked)} disabled={scanning} className="w-4 h-4 text-brand-navy-600 border-gray-300 rounded" />
+            <span>只比對上次完整掃描後更新的檔案</span>
+            <span className="text-xs text-gray-500">（較快）</span>
+          </label>
 
           {scannedFiles.length > 0 && (
             <div className="flex gap-4 items-center flex-wrap p-3 bg-cream-50 rounded-lg">
@@ -138,6 +204,9 @@ export function ImportModal({ isOpen, folders, onClose, onImportComplete }: Impo
                     找到 {scannedFiles.length} 個未匯入的檔案
                     {selectedFiles.size > 0 && ` (已選 ${selectedFiles.size})`}
                   </span>
+                  {scanning && scanProgress && (
+                    <span className="text-xs text-gray-500">掃描中，已檢查 {scanProgress.scanned} 個物件...</span>
+                  )}
                 </div>
               </div>
               <div className="max-h-60 overflow-y-auto border rounded-lg divide-y">
@@ -164,7 +233,10 @@ export function ImportModal({ isOpen, folders, onClose, onImportComplete }: Impo
           )}
 
           {scanning && scannedFiles.length === 0 && (
-            <div className="text-center py-8 text-gray-500">掃描 GCS 中...</div>
+            <div className="text-center py-8 text-gray-500">
+              掃描 GCS 中...
+              {scanProgress && <p className="text-xs mt-1">已檢查 {scanProgress.scanned} 個物件</p>}
+            </div>
           )}
 
           {!scanning && scannedFiles.length === 0 && result === null && (
@@ -189,7 +261,7 @@ export function ImportModal({ isOpen, folders, onClose, onImportComplete }: Impo
         {scannedFiles.length > 0 && (
           <div className="flex justify-end gap-2 p-4 border-t bg-gray-50">
             <Button variant="outline" onClick={handleClose}>取消</Button>
-            <Button onClick={handleImport} disabled={importing || selectedFiles.size === 0}>
+            <Button onClick={handleImport} disabled={importing || scanning || selectedFiles.size === 0}>
               {importing ? '匯入中...' : `匯入 ${selectedFiles.size} 個檔案`}
             </Button>
           </div>
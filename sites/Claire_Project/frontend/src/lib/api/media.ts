@@ -6,7 +6,7 @@
  */
 
 import { request } from './client';
-import type { MediaItem, MediaFolder, MediaTag, FileMetadata } from './strapi';
+import type { MediaItem, MediaFolder, MediaFolderTree, MediaTag, FileMetadata } from './strapi';
 
 // =============================================================================
 // Media API
@@ -14,13 +14,15 @@ import type { MediaItem, MediaFolder, MediaTag, FileMetadata } from './strapi';
 
 export const mediaApi = {
   /**
-   * 取得資料夾列表
+   * 取得資料夾列表（all: 所有資料夾，含檔案數，由 /folders/tree 一次取得）
    */
   getFolders: async (options?: { parentId?: number; all?: boolean }): Promise<MediaFolder[]> => {
     try {
+      if (options?.all) {
+        return (await request<MediaFolderTree>('/media-lib/folders/tree')).folders;
+      }
       const params: Record<string, any> = {};
-      if (options?.all) params.all = 'true';
-      else if (options?.parentId) params.parent_id = options.parentId;
+      if (options?.parentId) params.parent_id = options.parentId;
       return await request<MediaFolder[]>('/media-lib/folders', { params });
     } catch (error) {
       console.error('Failed to fetch folders:', error);
@@ -28,6 +30,13 @@ export const mediaApi = {
     }
   },
 
+  /**
+   * 資料夾樹：所有資料夾（依 path 排序）與直接 / 含子資料夾的檔案數、位元組數
+   */
+  getFolderTree: async (): Promise<MediaFolderTree> => {
+    return request<MediaFolderTree>('/media-lib/folders/tree');
+  },
+
   /**
    * 建立資料夾
    */
@@ -297,9 +306,33 @@ export interface GcsScanFile {
   updated: string | null;
 }
 
+export interface ImportJobProgress {
+  total: number;
+  next_index: number;
+  imported: number;
+  skipped: number;
+  variants_done: number;
+  failed: number;
+  errors: { gcs_path: string; error: string }[];
+}
+
+export interface ImportJob {
+  id: number;
+  status: 'pending' | 'running' | 'done' | 'failed';
+  last_error: string | null;
+  progress: ImportJobProgress | null;
+}
+
+export type GcsScanEvent =
+  | { type: 'start'; prefix: string; resumed: boolean; since: string | null }
+  | ({ type: 'file' } & GcsScanFile)
+  | { type: 'progress'; scanned: number; found: number; cursor: string | null }
+  | { type: 'done'; complete: boolean; scanned: number; found: number; cursor: string | null }
+  | { type: 'error'; error: string };
+
 export const importApi = {
   /**
-   * 掃描 GCS，列出尚未匯入的檔案
+   * 掃描 GCS，列出尚未匯入的檔案（一次回傳完整結果）
    */
   scan: async (prefix?: string): Promise<{ total_found: number; files: GcsScanFile[] }> => {
     const params: Record<string, any> = {};
@@ -308,17 +341,78 @@ export const importApi = {
   },
 
   /**
-   * 執行匯入
+   * 以 NDJSON 串流掃描 GCS：每收到一個事件就呼叫 onEvent，結果可逐步顯示。
+   * 預設只比對上一次完整掃描之後更新的物件（full: true 比對全部）；
+   * done.complete 為 false 時表示已達單次掃描時間上限，再次呼叫即由檢查點續掃。
    */
-  execute: async (data: {
-    files: GcsScanFile[];
-    folder_id?: number | null;
-    generate_variants?: boolean;
-  }): Promise<{ imported: number; skipped: number; errors: any[] }> => {
-    return request('/media-lib/import/execute', {
+  scanStream: async (
+    onEvent: (event: GcsScanEvent) => void,
+    options?: { prefix?: string; full?: boolean; restart?: boolean; signal?: AbortSignal }
+  ): Promise<void> => {
+    const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://127.0.0.1:5002/api/v1';
+    const params = new URLSearchParams({ format: 'ndjson' });
+    if (options?.prefix) params.set('prefix', options.prefix);
+    if (options?.full) params.set('full', '1');
+    if (options?.restart) params.set('restart', '1');
+
+    const response = await fetch(`${API_URL}/media-lib/import/scan?${params}`, {
+      credentials: 'include',
+      headers: { Accept: 'application/x-ndjson' },
+      signal: options?.signal,
+    });
+    if (!response.ok || !response.body) {
+      const error = await response.json().catch(() => ({}));
+      throw new Error(error.error || 'Scan failed');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (value) buffer += decoder.decode(value, { stream: !done });
+      const lines = buffer.split('\n');
+      buffer = done ? '' : lines.pop() ?? '';
+      for (const line of lines) {
+        if (line.trim()) onEvent(JSON.parse(line) as GcsScanEvent);
+      }
+      if (done) break;
+    }
+  },
+
+  /**
+   * 執行匯入：後端排入背景工作後，輪詢工作狀態直到完成
+   */
+  execute: async (
+    data: {
+      files: GcsScanFile[];
+      folder_id?: number | null;
+      generate_variants?: boolean;
+    },
+    onProgress?: (progress: ImportJobProgress) => void
+  ): Promise<{ imported: number; skipped: number; errors: any[] }> => {
+    let { job } = await request<{ job: ImportJob }>('/media-lib/import/execute', {
       method: 'POST',
       body: JSON.stringify(data),
     });
+    while (job.status === 'pending' || job.status === 'running') {
+      if (job.progress) onProgress?.(job.progress);
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      ({ job } = await importApi.getJob(job.id));
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.last_error || 'Import failed');
+    }
+    const progress = job.progress!;
+    onProgress?.(progress);
+    return { imported: progress.imported, skipped: progress.skipped, errors: progress.errors };
+  },
+
+  /**
+   * 查詢匯入工作的狀態與進度
+   */
+  getJob: async (jobId: number): Promise<{ job: ImportJob }> => {
+    return request(`/media-lib/import/jobs/${jobId}`);
   },
 };
 
@@ -0,0 +1,33 @@
+"""Trigram GIN indexes for admin user search
+
+Revision ID: 0002_users_trgm_search
+Revises: 0001_baseline_schema
+Create Date: 2026-10-19
+
+users.username / users.email 的 ILIKE '%term%' 搜尋改由 pg_trgm GIN index 支援。
+全新資料庫由 baseline 依 model 建立 index，這裡以 IF NOT EXISTS 補上既有資料庫。
+"""
+from alembic import op
+
+
+revision = '0002_users_trgm_search'
+down_revision = '0001_baseline_schema'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS ix_users_username_trgm '
+        'ON users USING gin (username gin_trgm_ops)'
+    )
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS ix_users_email_trgm '
+        'ON users USING gin (email gin_trgm_ops)'
+    )
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS ix_users_email_trgm')
+    op.execute('DROP INDEX IF EXISTS ix_users_username_trgm')
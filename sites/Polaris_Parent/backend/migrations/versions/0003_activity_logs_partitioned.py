@@ -0,0 +1,116 @@
+"""Partition activity_logs by month
+
+Revision ID: 0003_activity_logs_partitioned
+Revises: 0002_users_trgm_search
+Create Date: 2026-10-19
+
+activity_logs 改為依 created_at 按月 RANGE partition（PK 改為 (id, created_at)，
+id 改為 BIGINT），由 services.audit 背景批次寫入，舊資料可直接 DROP partition 清除。
+
+- 全新資料庫：baseline 已依 model 建立 partitioned table，這裡只補 partition。
+- 既有資料庫：舊的一般資料表改名為 activity_logs_legacy，建立新表後搬移資料再刪除。
+
+之後請定期執行 `flask audit-partitions`（可加 --prune）預先建立未來月份的 partition。
+"""
+from datetime import date
+
+from alembic import op
+from sqlalchemy import text
+
+
+revision = '0003_activity_logs_partitioned'
+down_revision = '0002_users_trgm_search'
+branch_labels = None
+depends_on = None
+
+
+def _relkind(bind, name):
+    return bind.execute(text(
+        "SELECT relkind FROM pg_class "
+        "WHERE relname = :name AND relnamespace = to_regnamespace(current_schema())"
+    ), {'name': name}).scalar()
+
+
+def upgrade():
+    from core.backend_engine.models import ActivityLog
+    from core.backend_engine.services.audit import ensure_partitions
+
+    bind = op.get_bind()
+    relkind = _relkind(bind, 'activity_logs')
+    if relkind == 'p':
+        ensure_partitions(bind, months_ahead=3)
+        return
+
+    legacy = relkind == 'r'
+    if legacy:
+        # 舊表改名，釋出 constraint / index / sequence 名稱給新表
+        op.execute('ALTER TABLE activity_logs RENAME TO activity_logs_legacy')
+        op.execute('ALTER INDEX IF EXISTS activity_logs_pkey RENAME TO activity_logs_legacy_pkey')
+        op.execute('ALTER INDEX IF EXISTS ix_activity_logs_created_at RENAME TO ix_activity_logs_legacy_created_at')
+        op.execute('ALTER SEQUENCE IF EXISTS activity_logs_id_seq RENAME TO activity_logs_legacy_id_seq')
+        op.execute('ALTER TABLE activity_logs_legacy DROP CONSTRAINT IF EXISTS activity_logs_user_id_fkey')
+
+    ActivityLog.__table__.create(bind)
+
+    # 先建好涵蓋舊資料月份的 partition，避免資料落入 default partition
+    start = date.today().replace(day=1)
+    if legacy:
+        oldest = bind.execute(text('SELECT min(created_at) FROM activity_logs_legacy')).scalar()
+        if oldest is not None:
+            start = min(start, oldest.date().replace(day=1))
+    today = date.today()
+    months = (today.year - start.year) * 12 + (today.month - start.month) + 3
+    ensure_partitions(bind, months_ahead=months, start=start)
+
+    if legacy:
+        op.execute(
+            'INSERT INTO activity_logs (id, created_at, user_id, action, table_name, record_id, '
+            'old_values, new_values, ip_address, user_agent) '
+            'SELECT id, COALESCE(created_at, now()), user_id, action, table_name, record_id, '
+            'old_values, new_values, ip_address, user_agent FROM activity_logs_legacy'
+        )
+        op.execute(
+            "SELECT setval(pg_get_serial_sequence('activity_logs', 'id'), "
+            "COALESCE((SELECT max(id) FROM activity_logs), 0) + 1, false)"
+        )
+        op.execute('DROP TABLE activity_logs_legacy')
+
+
+def downgrade():
+    bind = op.get_bind()
+    if _relkind(bind, 'activity_logs') != 'p':
+        return
+
+    op.execute('ALTER TABLE activity_logs RENAME TO activity_logs_partitioned')
+    op.execute('ALTER INDEX IF EXISTS activity_logs_pkey RENAME TO activity_logs_partitioned_pkey')
+    op.execute('ALTER INDEX IF EXISTS ix_activity_logs_created_at RENAME TO ix_activity_logs_partitioned_created_at')
+    op.execute('ALTER INDEX IF EXISTS ix_activity_logs_table_record RENAME TO ix_activity_logs_partitioned_table_record')
+    op.execute('ALTER SEQUENCE IF EXISTS activity_logs_id_seq RENAME TO activity_logs_partitioned_id_seq')
+    op.execute('ALTER TABLE activity_logs_partitioned DROP CONSTRAINT IF EXISTS activity_logs_user_id_fkey')
+
+    op.execute(
+        'CREATE TABLE activity_logs ('
+        'id SERIAL PRIMARY KEY, '
+        'user_id INTEGER REFERENCES users (id), '
+        'action VARCHAR(100) NOT NULL, '
+        'table_name VARCHAR(50), '
+        'record_id INTEGER, '
+        'old_values JSONB, '
+        'new_values JSONB, '
+        'ip_address VARCHAR(45), '
+        'user_agent TEXT, '
+        'created_at TIMESTAMP WITHOUT TIME ZONE)'
+    )
+    op.execute('CREATE INDEX ix_activity_logs_created_at ON activity_logs (created_at)')
+    op.execute(
+        'INSERT INTO activity_logs (id, user_id, action, table_name, record_id, '
+        'old_values, new_values, ip_address, user_agent, created_at) '
+        'SELECT id, user_id, action, table_name, record_id, '
+        'old_values, new_values, ip_address, user_agent, created_at '
+        'FROM activity_logs_partitioned WHERE id <= 2147483647'
+    )
+    op.execute(
+        "SELECT setval(pg_get_serial_sequence('activity_logs', 'id'), "
+        "COALESCE((SELECT max(id) FROM activity_logs), 0) + 1, false)"
+    )
+    op.execute('DROP TABLE activity_logs_partitioned CASCADE')
@@ -0,0 +1,47 @@
+"""Media content-hash deduplication
+
+Revision ID: 0006_content_hash
+Revises: 0005_upload_sessions
+Create Date: 2026-10-19
+
+media_lib.files 新增 content_hash（原檔 SHA-256）與 duplicate_of_id：
+- 同一內容只有一筆原始記錄（duplicate_of_id IS NULL 的 partial unique index），
+  重複上傳的記錄指向原始記錄並共用儲存物件與變體。
+- file_variants.gcs_path 加上索引，刪除時檢查物件是否仍被其他記錄使用。
+既有檔案的雜湊以 `flask media-lib backfill-hashes` 補上。
+"""
+from alembic import op
+
+
+revision = '0006_content_hash'
+down_revision = '0005_upload_sessions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('ALTER TABLE media_lib.files ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)')
+    op.execute(
+        'ALTER TABLE media_lib.files ADD COLUMN IF NOT EXISTS duplicate_of_id INTEGER '
+        'REFERENCES media_lib.files (id)'
+    )
+    op.execute(
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_media_lib_files_content_hash '
+        'ON media_lib.files (content_hash) WHERE duplicate_of_id IS NULL'
+    )
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS ix_media_lib_files_duplicate_of_id '
+        'ON media_lib.files (duplicate_of_id)'
+    )
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS ix_media_lib_file_variants_gcs_path '
+        'ON media_lib.file_variants (gcs_path)'
+    )
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS media_lib.ix_media_lib_file_variants_gcs_path')
+    op.execute('DROP INDEX IF EXISTS media_lib.ix_media_lib_files_duplicate_of_id')
+    op.execute('DROP INDEX IF EXISTS media_lib.uq_media_lib_files_content_hash')
+    op.execute('ALTER TABLE media_lib.files DROP COLUMN IF EXISTS duplicate_of_id')
+    op.execute('ALTER TABLE media_lib.files DROP COLUMN IF EXISTS content_hash')
@@ -0,0 +1,44 @@
+"""Folder path prefix index
+
+Revision ID: 0011_folder_path_pattern
+Revises: 0010_job_progress
+Create Date: 2026-10-19
+
+資料夾的移動 / 改名與子孫判斷改以 media_lib.folders.path 前綴查詢
+（packages/media_lib/folders.py，path LIKE 'prefix%'）。既有的 path 索引使用資料庫
+collation，非 C locale 時無法用於 LIKE，另建 varchar_pattern_ops 索引。
+
+前綴判斷的前提是名稱不含 /（path 的每一段對應一個資料夾）。先前的 create_folder 允許
+名稱含 /，例如根目錄下的「a/b」path 為 /a/b，會被誤判為資料夾 a 的子孫、隨 a 改名而被改寫。
+這裡將既有名稱中的 / 換成全形 ／，並依 parent_id 重新計算所有 path。
+"""
+from alembic import op
+
+
+revision = '0011_folder_path_pattern'
+down_revision = '0010_job_progress'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("UPDATE media_lib.folders SET name = replace(name, '/', '／') WHERE name LIKE '%/%'")
+    op.execute(
+        'WITH RECURSIVE tree (id, path) AS ('
+        "    SELECT id, '/' || name FROM media_lib.folders WHERE parent_id IS NULL"
+        '    UNION ALL'
+        "    SELECT f.id, tree.path || '/' || f.name"
+        '    FROM media_lib.folders f JOIN tree ON f.parent_id = tree.id'
+        ') '
+        'UPDATE media_lib.folders SET path = tree.path FROM tree '
+        'WHERE media_lib.folders.id = tree.id AND media_lib.folders.path IS DISTINCT FROM tree.path'
+    )
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS ix_media_lib_folders_path_pattern '
+        'ON media_lib.folders (path varchar_pattern_ops)'
+    )
+
+
+def downgrade():
+    # 名稱 / path 的修正不還原
+    op.execute('DROP INDEX IF EXISTS media_lib.ix_media_lib_folders_path_pattern')
@@ -60,9 +60,18 @@ export interface MediaFolder {
   description?: string;
   thumbnail_id?: number;
   thumbnail?: { id: number; url: string; formats?: ImageFormats };
+  total_bytes?: number;            // 以下由 /folders/tree 提供
+  recursive_file_count?: number;   // 含所有子資料夾
+  recursive_bytes?: number;
   children?: MediaFolder[];  // 前端建構樹狀結構用
 }
 
+export interface MediaFolderTree {
+  folders: MediaFolder[];
+  unfiled: { file_count: number; total_bytes: number };  // 不在任何資料夾中的檔案
+  generated_at: string;
+}
+
 export interface MediaTag {
   id: number;
   name: string;